@@ -0,0 +1,41 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from weather_api import WeatherAPI
+
+@pytest.fixture
+def legacy_dataset(tmp_path) -> str:
+    """A CSV written before validation at ingest: no manifest, and rows that fail validation"""
+    rng = np.random.default_rng(3)
+    cities = ['Bangkok', 'London', 'Tokyo']
+    dates = pd.date_range('2024-01-01', periods=200, freq='D')
+    n = len(cities) * len(dates)
+    df = pd.DataFrame({
+        'city': np.repeat(cities, len(dates)),
+        'date': np.tile(dates, len(cities)).astype('datetime64[ns]'),
+        'temperature': np.round(rng.normal(20, 6, n), 1),
+        'humidity': np.round(rng.uniform(20, 95, n), 1),
+        'rainfall': np.where(rng.random(n) < 0.3, np.round(rng.exponential(3, n), 1), 0.0),
+        'source': 'api'
+    })
+    # Implausible readings at the start of the file are dropped by the analyzer, leaving index gaps
+    df.loc[:49, 'humidity'] = 150.0
+    path = tmp_path / 'weather_data.csv'
+    df.to_csv(path, index=False)
+    return str(path)
+
+def test_stats_of_unstamped_dataset(legacy_dataset):
+    api = WeatherAPI(legacy_dataset)
+    valid = pd.read_csv(legacy_dataset).iloc[50:]
+    
+    status, _, body = api.handle('/stats')
+    assert status == 200
+    humidity = json.loads(body)['humidity_stats']
+    assert humidity['max_humidity']['humidity'] == valid['humidity'].max()
+    assert humidity['min_humidity']['humidity'] == valid['humidity'].min()
+    
+    status, _, body = api.handle('/stats?cities=London')
+    assert status == 200
+    london = valid[valid['city'] == 'London']
+    assert json.loads(body)['humidity_stats']['max_humidity']['humidity'] == london['humidity'].max()
@@ -0,0 +1,32 @@
+from datetime import date
+from weather_backfill import BackfillJob
+from weather_collector import WeatherDataCollector
+from weather_store import WeatherDataStore
+
+class StubCollector(WeatherDataCollector):
+    """Historical summaries without requests; humidity is implausible on the given days"""
+    
+    def __init__(self, bad_days=()):
+        super().__init__(api_key='test')
+        self.bad_days = set(bad_days)
+        self.requests = []
+    
+    def fetch_historical_weather(self, city: str, date: str):
+        self.requests.append((city, date))
+        return {'city': city, 'temperature': 12.0, 'humidity': 150.0 if date in self.bad_days else 70.0,
+                'rainfall': 0.0, 'date': date, 'source': 'api'}
+
+def test_rejected_days_are_refetched(tmp_path):
+    store = WeatherDataStore(str(tmp_path / 'weather_data.csv'))
+    checkpoint = str(tmp_path / 'checkpoint.jsonl')
+    job = BackfillJob(['London'], date(2024, 3, 1), date(2024, 3, 5), store=store,
+                      collector=StubCollector(bad_days={'2024-03-02'}), checkpoint_file=checkpoint, workers=1)
+    
+    stats = job.run()
+    assert (stats['stored'], stats['rejected'], stats['failed']) == (4, 1, 0)
+    
+    # A resumed run only asks for the day that was quarantined
+    collector = StubCollector()
+    BackfillJob(['London'], date(2024, 3, 1), date(2024, 3, 5), store=store, collector=collector,
+                checkpoint_file=checkpoint, workers=1).run()
+    assert collector.requests == [('London', '2024-03-02')]
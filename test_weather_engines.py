@@ -0,0 +1,119 @@
+import base64
+import numpy as np
+import pandas as pd
+import pytest
+from weather_analyzer import WeatherAnalyzer
+from weather_engines import CATEGORY_BINS, compare_engines
+
+pytest.importorskip('pyarrow')
+
+GRANULARITIES = ['Daily', 'Weekly', 'Monthly', 'Yearly']
+
+# The engines sum in different orders, so aggregates may differ in the last bits
+# and statistics rounded to 2 decimals by one unit
+RTOL = 1e-9
+ROUNDING = 0.01 + 1e-9
+
+@pytest.fixture(scope='module')
+def observations() -> pd.DataFrame:
+    """Four cities over a year boundary, with readings on every category bin edge"""
+    rng = np.random.default_rng(7)
+    cities = ['Bangkok', 'London', 'Sydney', 'Tokyo']
+    dates = pd.date_range('2023-11-20', periods=120, freq='D')
+    n = len(cities) * len(dates)
+    df = pd.DataFrame({
+        'city': np.repeat(cities, len(dates)),
+        'date': np.tile(dates, len(cities)),
+        'temperature': np.round(rng.normal(18, 9, n), 1),
+        'humidity': np.round(rng.uniform(5, 100, n), 1),
+        'rainfall': np.where(rng.random(n) < 0.3, np.round(rng.exponential(4, n), 1), 0.0),
+        'source': 'synthetic'
+    })
+    # Values exactly on the (right-inclusive) bin edges must land in the same category on both engines
+    edges = {column: [edge for edge in bins if np.isfinite(edge) and edge >= 0]
+             for column, bins, _ in CATEGORY_BINS.values()}
+    for column, values in edges.items():
+        df.loc[:len(values) - 1, column] = values
+    # Tied extremes: both engines must report the first row holding them
+    df.loc[[10, 200], 'humidity'] = 100.0
+    return df
+
+@pytest.fixture(scope='module')
+def analyzers(observations):
+    return {engine: WeatherAnalyzer(observations, engine=engine) for engine in ('pandas', 'arrow')}
+
+def decode_array(value):
+    """Plotly's base64-encoded typed arrays ({'dtype', 'bdata'}) as NumPy arrays"""
+    if isinstance(value, dict) and 'bdata' in value:
+        array = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype'])
+        return array.reshape([int(n) for n in str(value['shape']).split(',')]) if 'shape' in value else array
+    return value
+
+def assert_same_plot_data(actual, expected, path='figure'):
+    """Figures match in structure and text, and in numbers up to RTOL"""
+    actual, expected = decode_array(actual), decode_array(expected)
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys(), path
+        for key in expected:
+            assert_same_plot_data(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, (list, tuple, np.ndarray)) and not isinstance(expected, str):
+        assert len(actual) == len(expected), path
+        expected_array = np.asarray(expected)
+        if expected_array.dtype.kind in 'fiu':
+            np.testing.assert_allclose(np.asarray(actual, dtype=float), expected_array.astype(float),
+                                       rtol=RTOL, err_msg=path)
+        else:
+            for i, (a, e) in enumerate(zip(actual, expected)):
+                assert_same_plot_data(a, e, f"{path}[{i}]")
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=RTOL, nan_ok=True), path
+    else:
+        assert actual == expected, path
+
+def test_summary_statistics_match(analyzers):
+    expected = analyzers['pandas'].calculate_summary_statistics()
+    actual = analyzers['arrow'].calculate_summary_statistics()
+    
+    for group in ('temp_stats', 'humidity_stats'):
+        for key, value in expected[group].items():
+            if isinstance(value, pd.Series):
+                pd.testing.assert_series_equal(actual[group][key], value)
+            else:
+                assert actual[group][key] == pytest.approx(value, abs=ROUNDING), f"{group}.{key}"
+    for key in ('avg_temp_by_city', 'rainfall_by_month'):
+        pd.testing.assert_series_equal(actual[key], expected[key], check_exact=False, rtol=0, atol=ROUNDING)
+    pd.testing.assert_frame_equal(actual['city_statistics'], expected['city_statistics'],
+                                  check_exact=False, rtol=0, atol=ROUNDING)
+
+@pytest.mark.parametrize('granularity', GRANULARITIES)
+def test_chart_inputs_match(analyzers, granularity):
+    for cities in (None, ['London', 'Tokyo']):
+        pd.testing.assert_frame_equal(analyzers['arrow'].time_series(granularity, cities),
+                                      analyzers['pandas'].time_series(granularity, cities),
+                                      check_dtype=False, check_exact=False, rtol=RTOL)
+        for query in ('query', 'query_raw'):
+            pd.testing.assert_frame_equal(getattr(analyzers['arrow'].rollups, query)(granularity, cities),
+                                          getattr(analyzers['pandas'].rollups, query)(granularity, cities),
+                                          check_dtype=False, check_exact=False, rtol=RTOL)
+
+@pytest.mark.parametrize('granularity', GRANULARITIES)
+def test_charts_match(analyzers, granularity):
+    cities = ['Bangkok', 'London', 'Sydney']
+    for chart in ('create_temperature_line_chart', 'create_humidity_temperature_scatter'):
+        expected = getattr(analyzers['pandas'], chart)(cities, time_aggregation=granularity)
+        actual = getattr(analyzers['arrow'], chart)(cities, time_aggregation=granularity)
+        assert_same_plot_data(actual.to_plotly_json(), expected.to_plotly_json())
+    expected = analyzers['pandas'].create_rainfall_bar_chart(granularity)
+    assert_same_plot_data(analyzers['arrow'].create_rainfall_bar_chart(granularity).to_plotly_json(),
+                          expected.to_plotly_json())
+
+def test_export_matches(analyzers, tmp_path):
+    expected = analyzers['pandas'].export_processed_data(str(tmp_path / 'pandas.csv'))
+    actual = analyzers['arrow'].export_processed_data(str(tmp_path / 'arrow.csv'))
+    
+    pd.testing.assert_frame_equal(actual, expected)
+    assert (tmp_path / 'arrow.csv').read_bytes() == (tmp_path / 'pandas.csv').read_bytes()
+
+def test_compare_engines_checks_every_output(observations):
+    timings = compare_engines(observations)
+    assert set(timings) == {'pandas', 'arrow'}
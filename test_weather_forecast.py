@@ -0,0 +1,34 @@
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from weather_collector import WeatherDataCollector
+from weather_forecast import LEAD_STEP, ForecastCube
+
+@pytest.fixture
+def india_time(monkeypatch):
+    """Local time at +05:30, which is not a multiple of the 3-hour forecast step"""
+    monkeypatch.setenv('TZ', 'Asia/Kolkata')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+def test_forecast_leads_under_half_hour_offset(india_time, monkeypatch):
+    issued = pd.Timestamp.now(tz='UTC').floor(LEAD_STEP)
+    steps = [issued + LEAD_STEP * (lead + 1) for lead in range(8)]
+    response = {
+        'city': {'name': 'Mumbai', 'coord': {'lat': 19.07, 'lon': 72.88}},
+        'list': [{'dt': int(step.timestamp()), 'main': {'temp': 30.0 + i, 'humidity': 70}}
+                 for i, step in enumerate(steps)]
+    }
+    collector = WeatherDataCollector(api_key='test')
+    monkeypatch.setattr(collector, '_request', lambda url, params, city=None: response)
+    
+    points = pd.DataFrame(collector.fetch_forecast('Mumbai'))
+    # Returned as naive local times, 05:30 ahead of UTC
+    assert points['issue_time'].iloc[0] == issued.tz_localize(None) + pd.Timedelta(hours=5, minutes=30)
+    assert (points['valid_time'] - points['issue_time']).tolist() == [LEAD_STEP * (lead + 1) for lead in range(8)]
+    
+    cube = ForecastCube.from_points(points)
+    np.testing.assert_array_equal(cube.arrays['temperature'][0, 1:9, 0], 30.0 + np.arange(8))
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+from weather_analyzer import WeatherAnalyzer
+from weather_outofcore import OutOfCoreAnalyzer
+
+GRANULARITIES = ['Daily', 'Weekly', 'Monthly', 'Yearly']
+
+@pytest.fixture(scope='module')
+def partitions(tmp_path_factory):
+    """Hourly readings for three cities, one CSV per city"""
+    rng = np.random.default_rng(11)
+    directory = tmp_path_factory.mktemp('partitions')
+    frames = []
+    for city in ['Bangkok', 'London', 'Tokyo']:
+        dates = pd.date_range('2023-12-20', periods=24 * 40, freq='h')
+        df = pd.DataFrame({
+            'city': city,
+            'date': dates,
+            'temperature': np.round(rng.normal(15, 8, len(dates)), 1),
+            'humidity': np.round(rng.uniform(20, 95, len(dates)), 1),
+            'rainfall': np.where(rng.random(len(dates)) < 0.2, np.round(rng.exponential(2, len(dates)), 1), 0.0),
+            'source': 'api'
+        })
+        df.to_csv(directory / f'{city}.csv', index=False)
+        frames.append(df)
+    return str(directory), pd.concat(frames, ignore_index=True)
+
+@pytest.mark.parametrize('granularity', GRANULARITIES)
+def test_rollups_match_in_memory(partitions, granularity):
+    directory, df = partitions
+    out_of_core = OutOfCoreAnalyzer(directory, workers=1)
+    in_memory = WeatherAnalyzer(df)
+    
+    for cities in (None, ['London']):
+        pd.testing.assert_frame_equal(out_of_core.query(granularity, cities),
+                                      in_memory.rollups.query(granularity, cities or in_memory._query_cities()),
+                                      check_dtype=False, check_exact=False, rtol=1e-9)
+
+def test_backs_analyzer_charts(partitions):
+    directory, df = partitions
+    analyzer = WeatherAnalyzer(df, rollups=OutOfCoreAnalyzer(directory, workers=1))
+    in_memory = WeatherAnalyzer(df)
+    
+    for granularity in GRANULARITIES:
+        actual = analyzer.create_temperature_line_chart(['London', 'Tokyo'], time_aggregation=granularity)
+        expected = in_memory.create_temperature_line_chart(['London', 'Tokyo'], time_aggregation=granularity)
+        assert [trace.name for trace in actual.data] == [trace.name for trace in expected.data]
+        for a, e in zip(actual.data, expected.data):
+            np.testing.assert_allclose(np.asarray(a.y, dtype=float), np.asarray(e.y, dtype=float), rtol=1e-9)
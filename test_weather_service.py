@@ -0,0 +1,23 @@
+import pandas as pd
+from weather_service import WeatherCollectorService, latest_observations
+from weather_store import WeatherDataStore
+
+def observation(city: str, date: str, humidity: float = 60.0) -> dict:
+    return {'city': city, 'temperature': 20.0, 'humidity': humidity, 'rainfall': 0.0, 'date': date,
+            'lat': 51.5, 'lon': -0.1, 'source': 'api'}
+
+def test_flush_publishes_latest_stored_observations(tmp_path, monkeypatch):
+    data_file = str(tmp_path / 'observations.csv')
+    service = WeatherCollectorService(['London', 'Tokyo'], store=WeatherDataStore(data_file))
+    service._buffer = [observation('London', '2024-05-01 10:00:00'), observation('Tokyo', '2024-05-01 10:05:00')]
+    service.flush()
+    # A rejected reading is quarantined, so it must not become the latest one
+    service._buffer = [observation('London', '2024-05-01 10:10:00'),
+                       observation('Tokyo', '2024-05-01 10:15:00', humidity=150.0)]
+    service.flush()
+    
+    # Readers use the published file and never scan the store
+    monkeypatch.setattr('weather_service.get_shared_dataset', None)
+    latest = latest_observations(data_file).set_index('city')['date']
+    assert latest.to_dict() == {'Tokyo': pd.Timestamp('2024-05-01 10:05:00'),
+                                'London': pd.Timestamp('2024-05-01 10:10:00')}
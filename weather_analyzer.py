@@ -3,10 +3,19 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import seaborn as sns
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 import warnings
+import hashlib
+from weather_rollups import InMemoryRollups, combine_cities, finalize_rollup, summarize_rollups, rollup_anomalies
+from weather_engines import get_engine
+from weather_resample import SUB_DAILY_GRANULARITIES, is_sub_daily, resample, resample_rollup
+from weather_metrics import timed, increment
+from weather_validation import is_validated, validate
+from weather_spatial import CityIndex
+from weather_render import build_all
+from weather_forecast import LEAD_STEP, ForecastCube
 warnings.filterwarnings('ignore')
 
 class WeatherAnalyzer:
@@ -15,7 +24,7 @@ class WeatherAnalyzer:
     # Ultra-minimal Color Palette
     COLORS = {
         'temperature': '#F59E0B',  # Subtle orange
-        'humidity': '#3B82F6',     # Clean blue  
+        'humidity': '#3B82F6',     # Clean blue
         'rainfall': '#10B981',     # Fresh emerald
         'text': '#111827',         # Deep gray
         'grid': '#F3F4F6'          # Very light gray
@@ -24,84 +33,313 @@ class WeatherAnalyzer:
     # Clean color sequence for multiple cities
     CITY_COLORS = ['#3B82F6', '#10B981', '#F59E0B', '#6B7280', '#8B5CF6', '#EF4444']
     
-    def __init__(self, df: pd.DataFrame):
+    # Colorscales for calendar heatmaps
+    CALENDAR_COLORSCALES = {
+        'temperature': [[0, '#3B82F6'], [0.5, '#F9FAFB'], [1, '#F59E0B']],
+        'rainfall': [[0, '#F9FAFB'], [1, '#10B981']]
+    }
+    
+    # Periods finer than a day, resampled from the raw observations on request
+    SUB_DAILY_AGGREGATIONS = SUB_DAILY_GRANULARITIES
+    
+    def __init__(self, df: pd.DataFrame, rollups=None, engine='pandas', locations: Optional[CityIndex] = None):
         self.df = df.copy()
         self._validate_data()
+        self._calendar_cache = {}
+        self._fingerprint = None
+        self._sub_daily = None
+        # Execution engine ('pandas' or 'arrow') and its prepared copy of the data
+        self.engine = get_engine(engine)
+        self._native = self.engine.prepare(self.df)
+        # Persisted rollups (RollupStore) covering this dataset, or lazy in-memory ones
+        self.rollups = rollups if rollups is not None else InMemoryRollups(self.df, self.engine, self._native)
+        # Spatial index over city coordinates (e.g. WeatherDataStore.locations.index()), built from lat/lon columns if absent
+        self._locations = locations
+        increment('rows_processed', len(self.df), stage='analyzer')
     
     def _validate_data(self):
-        """Validate that required columns exist"""
+        """Validate that required columns exist and drop rows that fail validation
+        
+        Data stamped as validated at ingest (the store and its snapshot) is
+        used as is, without re-checking rows or converting dates.
+        """
+        if is_validated(self.df):
+            return
+        
         required_cols = ['date', 'city', 'temperature', 'humidity', 'rainfall']
         missing_cols = [col for col in required_cols if col not in self.df.columns]
         
         if missing_cols:
             raise ValueError(f"Missing required columns: {missing_cols}")
         
-        # Ensure date is datetime
-        if not pd.api.types.is_datetime64_any_dtype(self.df['date']):
-            self.df['date'] = pd.to_datetime(self.df['date'])
+        self.df, _, _ = validate(self.df)
     
-    def calculate_summary_statistics(self) -> Dict:
-        """Calculate comprehensive summary statistics"""
-        stats = {}
-        
-        # Average temperature per city
-        stats['avg_temp_by_city'] = self.df.groupby('city')['temperature'].mean().round(2)
-        
-        # Temperature statistics
-        stats['temp_stats'] = {
-            'overall_avg': round(self.df['temperature'].mean(), 2),
-            'overall_max': round(self.df['temperature'].max(), 2),
-            'overall_min': round(self.df['temperature'].min(), 2)
-        }
+    def fingerprint(self) -> str:
+        """Content hash of the analyzed data, for caching results derived from it"""
+        if self._fingerprint is None:
+            columns = ['city', 'date', 'temperature', 'humidity', 'rainfall']
+            hashed = pd.util.hash_pandas_object(self.df[columns], index=False).to_numpy()
+            self._fingerprint = hashlib.sha1(hashed.tobytes()).hexdigest()
+        return self._fingerprint
+    
+    def _query_cities(self, cities: Optional[List[str]] = None) -> List[str]:
+        """Cities to request from the rollups (restricted to this dataset)"""
+        return cities or self.df['city'].unique().tolist()
+    
+    @property
+    def sub_daily(self) -> bool:
+        """Whether the data has several observations per city and day (e.g. hourly readings)"""
+        if self._sub_daily is None:
+            self._sub_daily = is_sub_daily(self.df['date'])
+        return self._sub_daily
+    
+    def time_series(self, time_aggregation: str, cities: Optional[List[str]] = None) -> pd.DataFrame:
+        """Mean temperature and humidity and total rainfall per city and period
+        
+        Daily and coarser periods come from the rollups; sub-daily periods
+        ('Hourly', '10-Minute') are resampled from the raw observations.
+        """
+        if time_aggregation in self.SUB_DAILY_AGGREGATIONS:
+            df_filtered = self.df[self.df['city'].isin(cities)] if cities else self.df
+            return resample(df_filtered, time_aggregation)
+        return self.rollups.query(time_aggregation, self._query_cities(cities))
+    
+    def _aggregate(self, cities: Optional[List[str]], time_aggregation: str) -> pd.DataFrame:
+        """Per-city rows at the requested granularity
         
-        # Humidity statistics
-        stats['humidity_stats'] = {
-            'max_humidity': self.df.loc[self.df['humidity'].idxmax()],
-            'min_humidity': self.df.loc[self.df['humidity'].idxmin()],
-            'avg_humidity': round(self.df['humidity'].mean(), 2)
-        }
+        Daily views of daily data use the raw rows; everything else is
+        answered from the rollups (or resampled, for sub-daily periods)
+        instead of regrouping the raw data.
+        """
+        if time_aggregation != "Daily" or self.sub_daily:
+            return self.time_series(time_aggregation, cities)
         
-        # Rainfall statistics
-        self.df['month_year'] = self.df['date'].dt.to_period('M')
-        stats['rainfall_by_month'] = self.df.groupby('month_year')['rainfall'].sum().round(2)
+        df_filtered = self.df.copy()
+        if cities:
+            df_filtered = df_filtered[df_filtered['city'].isin(cities)]
+        return df_filtered
+    
+    def _rainfall_totals(self, time_aggregation: str, cities: Optional[List[str]] = None) -> pd.DataFrame:
+        """Total rainfall per city and period, ordered the way the bar charts expect"""
+        grouped_data = self.time_series(time_aggregation, cities)[['date', 'city', 'rainfall']]
         
-        # City-wise statistics
-        city_stats = self.df.groupby('city').agg({
-            'temperature': ['mean', 'min', 'max'],
-            'humidity': ['mean', 'min', 'max'],
-            'rainfall': ['sum', 'mean']
+        if time_aggregation == "Weekly":
+            return grouped_data.sort_values(['city', 'date']).reset_index(drop=True)
+        if time_aggregation == "Monthly":
+            grouped_data = grouped_data.assign(date=grouped_data['date'].dt.to_period('M'))
+        return grouped_data.sort_values(['date', 'city']).reset_index(drop=True)
+    
+    @timed()
+    def calculate_summary_statistics(self) -> Dict:
+        """Calculate comprehensive summary statistics"""
+        return summarize_rollups(
+            self.rollups.query_raw('Yearly', self._query_cities()),
+            self.rollups.query_raw('Monthly', self._query_cities()),
+            self.df.iloc[self.engine.extreme_position(self._native, 'humidity', 'max')],
+            self.df.iloc[self.engine.extreme_position(self._native, 'humidity', 'min')]
+        )
+    
+    @timed()
+    def detect_anomalies(self, metric: str = 'temperature', time_aggregation: str = 'Daily',
+                         threshold: float = 3.0, cities: List[str] = None) -> pd.DataFrame:
+        """Periods whose value departs from the city's usual value for that month by more than threshold std devs"""
+        if metric not in ('temperature', 'humidity', 'rainfall'):
+            raise ValueError(f"Unsupported anomaly metric: {metric}")
+        series = self.time_series(time_aggregation, cities)
+        return rollup_anomalies(series, metric, time_aggregation, threshold)
+    
+    @property
+    def locations(self) -> CityIndex:
+        """Spatial index of the cities' coordinates"""
+        if self._locations is None:
+            if not {'lat', 'lon'} <= set(self.df.columns):
+                raise ValueError("No city coordinates available; pass locations or data with lat/lon columns")
+            self._locations = CityIndex.from_frame(self.df)
+        return self._locations
+    
+    def nearest_cities(self, lat: float, lon: float, n: int = 5) -> pd.DataFrame:
+        """The n cities closest to a point, with their distance in km"""
+        return self.locations.nearest(lat, lon, n)
+    
+    def cities_within_radius(self, lat: float, lon: float, radius_km: float) -> pd.DataFrame:
+        """Cities within radius_km of a point, nearest first"""
+        return self.locations.within_radius(lat, lon, radius_km)
+    
+    def cities_in_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> pd.DataFrame:
+        """Cities inside a latitude/longitude bounding box"""
+        return self.locations.in_bbox(min_lat, min_lon, max_lat, max_lon)
+    
+    def _region_rollup(self, cities, granularity: str) -> pd.DataFrame:
+        """Mergeable rollup of the selected cities (a list, or a frame from one of the region queries)"""
+        if isinstance(cities, pd.DataFrame):
+            cities = cities['city']
+        cities = list(cities)
+        if granularity in self.SUB_DAILY_AGGREGATIONS:
+            return resample_rollup(self.df[self.df['city'].isin(cities)], granularity)
+        rollup = self.rollups.query_raw(granularity, cities)
+        # An empty selection means no cities, not all of them
+        return rollup if cities else rollup.iloc[:0]
+    
+    @timed()
+    def region_statistics(self, cities) -> Dict:
+        """Temperature and rainfall over a set of cities (e.g. from nearest_cities or cities_in_bbox)
+        
+        Reduces the cities' yearly rollup partitions, so the cost depends on
+        the number of cities and years selected, not on the raw row count.
+        """
+        yearly = self._region_rollup(cities, 'Yearly')
+        totals = yearly.groupby('city', observed=True)[['temperature_sum', 'temperature_count', 'rainfall_sum']].sum()
+        observations = int(totals['temperature_count'].sum())
+        
+        by_city = pd.DataFrame({
+            'temperature': totals['temperature_sum'] / totals['temperature_count'],
+            'rainfall': totals['rainfall_sum']
         }).round(2)
-        stats['city_statistics'] = city_stats
-        
-        return stats
+        if not observations:
+            return {'cities': 0, 'observations': 0, 'avg_temperature': None, 'min_temperature': None,
+                    'max_temperature': None, 'total_rainfall': 0.0, 'avg_rainfall_per_city': None, 'by_city': by_city}
+        return {
+            'cities': len(by_city),
+            'observations': observations,
+            'avg_temperature': round(totals['temperature_sum'].sum() / observations, 2),
+            'min_temperature': round(yearly['temperature_min'].min(), 2),
+            'max_temperature': round(yearly['temperature_max'].max(), 2),
+            'total_rainfall': round(totals['rainfall_sum'].sum(), 2),
+            'avg_rainfall_per_city': round(by_city['rainfall'].mean(), 2),
+            'by_city': by_city
+        }
+    
+    @timed()
+    def region_series(self, cities, time_aggregation: str = 'Daily', label: str = 'Region') -> pd.DataFrame:
+        """One series for a set of cities: mean temperature/humidity over all their observations, summed rainfall"""
+        return finalize_rollup(combine_cities(self._region_rollup(cities, time_aggregation), label))
+    
+    def _forecast_alignment(self, forecasts: ForecastCube, metric: str, freq: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Forecast and observed values on the forecasts' (issue, lead, city) grid
+        
+        Returns (forecast, observed, valid, leads): valid holds the start of
+        the observed period each slot is compared with. For freq='D' the
+        3-hourly points are first folded into whole days (mean temperature
+        and humidity, total rainfall); days the forecast does not fully cover
+        are left out. The observations are rolled up to the same periods and
+        scattered into a dense (period, city) array, so the join is a single
+        gather at the forecasts' valid periods.
+        """
+        if metric not in ('temperature', 'humidity', 'rainfall'):
+            raise ValueError(f"Unsupported forecast metric: {metric}")
+        freq = {'3-Hourly': '3h', 'Daily': 'D'}.get(freq, freq)
+        if freq not in ('3h', 'D'):
+            raise ValueError(f"Unsupported forecast comparison frequency: {freq}")
+        if freq == '3h' and not self.sub_daily:
+            raise ValueError("3-hourly comparison needs sub-daily observations; use freq='D'")
+        
+        step = LEAD_STEP.value
+        period = step if freq == '3h' else pd.Timedelta(days=1).value
+        issues = forecasts.issues.view(np.int64)
+        values = np.asarray(forecasts.arrays[metric], dtype=np.float64)
+        n_issues, n_leads, n_cities = values.shape
+        # Forecast rainfall is the total over the 3 hours *before* the valid time
+        shift = 1 if metric == 'rainfall' else 0
+        
+        if freq == '3h':
+            leads = np.arange(n_leads)
+            valid = issues[:, None] + (leads[None, :] - shift) * step
+        else:
+            per_day = period // step
+            # Position of each point among the 3-hour slots of the issue day and the days after it
+            slots = (issues % period // step)[:, None] + np.arange(n_leads)[None, :] - shift
+            n_days = -(-(int(slots.max()) + 1) // per_day) if slots.size else 0
+            padded = np.full((n_issues, n_days * per_day, n_cities), np.nan)
+            inside = slots >= 0
+            rows = np.broadcast_to(np.arange(n_issues)[:, None], slots.shape)
+            padded[rows[inside], slots[inside]] = values[inside]
+            
+            days = padded.reshape(n_issues, n_days, per_day, n_cities)
+            complete = np.count_nonzero(~np.isnan(days), axis=2) == per_day
+            totals = np.nansum(days, axis=2)
+            values = np.where(complete, totals if metric == 'rainfall' else totals / per_day, np.nan)
+            leads = np.arange(n_days)
+            valid = (issues // period * period)[:, None] + leads[None, :] * period
+        
+        observed = np.full(values.shape, np.nan)
+        known = set(self.df['city'].unique())
+        cities = [city for city in forecasts.cities if city in known]
+        if cities and values.size:
+            if freq == '3h':
+                series = resample(self.df[self.df['city'].isin(cities)], '3h')
+            else:
+                series = self.time_series('Daily', cities)
+            keys = series['date'].to_numpy(dtype='datetime64[ns]').view(np.int64) // period
+            first = int(keys.min())
+            grid = np.full((int(keys.max()) - first + 1, n_cities), np.nan)
+            grid[keys - first, pd.Index(forecasts.cities).get_indexer(series['city'])] = series[metric].to_numpy(dtype=np.float64)
+            
+            positions = valid // period - first
+            matched = (positions >= 0) & (positions < len(grid))
+            observed = np.where(matched[:, :, None], grid[np.clip(positions, 0, len(grid) - 1)], np.nan)
+        return values, observed, valid.view('datetime64[ns]'), leads
     
-    def create_temperature_line_chart(self, cities: List[str] = None, 
+    @timed()
+    def forecast_pairs(self, forecasts: ForecastCube, metric: str = 'temperature', freq: str = 'D') -> pd.DataFrame:
+        """Every forecast with a matching observation: issue/valid time, lead, forecast, observed and error"""
+        values, observed, valid, leads = self._forecast_alignment(forecasts, metric, freq)
+        issue_idx, lead_idx, city_idx = np.nonzero(~np.isnan(values) & ~np.isnan(observed))
+        return pd.DataFrame({
+            'city': np.asarray(forecasts.cities, dtype=object)[city_idx],
+            'issue_time': forecasts.issues[issue_idx],
+            'valid_time': valid[issue_idx, lead_idx],
+            'lead': leads[lead_idx],
+            'forecast': values[issue_idx, lead_idx, city_idx],
+            'observed': observed[issue_idx, lead_idx, city_idx],
+            'error': values[issue_idx, lead_idx, city_idx] - observed[issue_idx, lead_idx, city_idx]
+        })
+    
+    @timed()
+    def compare_forecast(self, forecasts: ForecastCube, metric: str = 'temperature', freq: str = 'D',
+                         by_city: bool = False) -> pd.DataFrame:
+        """Forecast skill per lead time (and city): matched count, bias, MAE and RMSE
+        
+        ``forecasts`` comes from ``ForecastStore.load()``. With freq='3h'
+        (needs sub-daily observations) leads are in 3-hour steps and each
+        forecast is compared with the mean (rainfall: total) observation over
+        the 3 hours it covers; with freq='D' leads are days after the issue
+        day. Errors are reduced over the issue axis (and the city axis unless
+        by_city) of the aligned arrays.
+        """
+        values, observed, _, leads = self._forecast_alignment(forecasts, metric, freq)
+        errors = values - observed
+        axes = (0,) if by_city else (0, 2)
+        count = np.count_nonzero(~np.isnan(errors), axis=axes)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bias = np.nansum(errors, axis=axes) / count
+            mae = np.nansum(np.abs(errors), axis=axes) / count
+            rmse = np.sqrt(np.nansum(errors ** 2, axis=axes) / count)
+        
+        lead_column = 'lead_hours' if freq in ('3h', '3-Hourly') else 'lead_days'
+        lead_values = leads * int(LEAD_STEP / pd.Timedelta(hours=1)) if lead_column == 'lead_hours' else leads
+        if by_city:
+            result = pd.DataFrame({
+                lead_column: np.repeat(lead_values, len(forecasts.cities)),
+                'city': np.tile(np.asarray(forecasts.cities, dtype=object), len(leads)),
+                'count': count.ravel(), 'bias': bias.ravel(), 'mae': mae.ravel(), 'rmse': rmse.ravel()
+            })
+        else:
+            result = pd.DataFrame({lead_column: lead_values, 'count': count, 'bias': bias, 'mae': mae, 'rmse': rmse})
+        result = result[result['count'] > 0].reset_index(drop=True)
+        return result.round({'bias': 3, 'mae': 3, 'rmse': 3})
+    
+    @timed()
+    def create_temperature_line_chart(self, cities: List[str] = None,
                                       time_aggregation: str = "Daily",
                                       show_trend: bool = True) -> go.Figure:
         """Create interactive line chart for temperature vs date"""
-        df_filtered = self.df.copy()
-        
-        if cities:
-            df_filtered = df_filtered[df_filtered['city'].isin(cities)]
-        
         # Apply time aggregation
-        if time_aggregation == "Weekly":
-            df_filtered = df_filtered.groupby(['city', pd.Grouper(key='date', freq='W')]).agg({
-                'temperature': 'mean',
-                'humidity': 'mean', 
-                'rainfall': 'sum'
-            }).reset_index()
-        elif time_aggregation == "Monthly":
-            df_filtered = df_filtered.groupby(['city', pd.Grouper(key='date', freq='M')]).agg({
-                'temperature': 'mean',
-                'humidity': 'mean',
-                'rainfall': 'sum'
-            }).reset_index()
+        df_filtered = self._aggregate(cities, time_aggregation)
         
         fig = px.line(
-            df_filtered, 
-            x='date', 
-            y='temperature', 
+            df_filtered,
+            x='date',
+            y='temperature',
             color='city',
             title='Temperature Trends Over Time',
             labels={'temperature': 'Temperature (°C)', 'date': 'Date'},
@@ -142,30 +380,21 @@ class WeatherAnalyzer:
         
         return fig
     
-    def create_static_temperature_chart(self, cities: List[str] = None, 
+    @timed()
+    def create_static_temperature_chart(self, cities: List[str] = None,
                                        time_aggregation: str = "Daily"):
         """Create static matplotlib chart for temperature"""
-        df_filtered = self.df.copy()
-        
-        if cities:
-            df_filtered = df_filtered[df_filtered['city'].isin(cities)]
-        
         # Apply time aggregation
-        if time_aggregation == "Weekly":
-            df_filtered = df_filtered.groupby(['city', pd.Grouper(key='date', freq='W')]).agg({
-                'temperature': 'mean'
-            }).reset_index()
-        elif time_aggregation == "Monthly":
-            df_filtered = df_filtered.groupby(['city', pd.Grouper(key='date', freq='M')]).agg({
-                'temperature': 'mean'
-            }).reset_index()
+        df_filtered = self._aggregate(cities, time_aggregation)
         
-        fig, ax = plt.subplots(figsize=(12, 6))
+        # A standalone Figure (not pyplot's global figure manager) can be built on any thread
+        fig = Figure(figsize=(12, 6))
+        ax = fig.subplots()
         
         for i, city in enumerate(df_filtered['city'].unique()):
             city_data = df_filtered[df_filtered['city'] == city]
-            ax.plot(city_data['date'], city_data['temperature'], 
-                   label=city, color=self.CITY_COLORS[i % len(self.CITY_COLORS)], 
+            ax.plot(city_data['date'], city_data['temperature'],
+                   label=city, color=self.CITY_COLORS[i % len(self.CITY_COLORS)],
                    linewidth=2)
         
         ax.set_xlabel('Date')
@@ -173,22 +402,18 @@ class WeatherAnalyzer:
         ax.set_title(f'Temperature Trends Over Time ({time_aggregation})')
         ax.legend()
         ax.grid(True, alpha=0.3)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
+        ax.tick_params(axis='x', labelrotation=45)
+        fig.tight_layout()
         
         return fig
     
+    @timed()
     def create_static_rainfall_chart(self, time_aggregation: str = "Monthly"):
         """Create static matplotlib chart for rainfall"""
-        if time_aggregation == "Daily":
-            grouped_data = self.df.groupby(['date', 'city'])['rainfall'].sum().reset_index()
-        elif time_aggregation == "Weekly":
-            grouped_data = self.df.groupby(['city', pd.Grouper(key='date', freq='W')])['rainfall'].sum().reset_index()
-        else:  # Monthly
-            grouped_data = self.df.groupby(['month_year', 'city'])['rainfall'].sum().reset_index()
-            grouped_data = grouped_data.rename(columns={'month_year': 'date'})
+        grouped_data = self._rainfall_totals(time_aggregation)
         
-        fig, ax = plt.subplots(figsize=(12, 6))
+        fig = Figure(figsize=(12, 6))
+        ax = fig.subplots()
         
         cities = grouped_data['city'].unique()
         x_pos = np.arange(len(grouped_data['date'].unique()))
@@ -196,7 +421,7 @@ class WeatherAnalyzer:
         
         for i, city in enumerate(cities):
             city_data = grouped_data[grouped_data['city'] == city]
-            ax.bar(x_pos + i * width, city_data['rainfall'], width, 
+            ax.bar(x_pos + i * width, city_data['rainfall'], width,
                   label=city, color=self.CITY_COLORS[i % len(self.CITY_COLORS)])
         
         ax.set_xlabel('Time Period')
@@ -206,36 +431,24 @@ class WeatherAnalyzer:
         ax.set_xticklabels([str(d)[:10] for d in grouped_data['date'].unique()], rotation=45)
         ax.legend()
         ax.grid(True, alpha=0.3)
-        plt.tight_layout()
+        fig.tight_layout()
         
         return fig
     
-    def create_static_humidity_scatter(self, cities: List[str] = None, 
+    @timed()
+    def create_static_humidity_scatter(self, cities: List[str] = None,
                                       time_aggregation: str = "Daily"):
         """Create static matplotlib scatter plot for humidity vs temperature"""
-        df_filtered = self.df.copy()
-        
-        if cities:
-            df_filtered = df_filtered[df_filtered['city'].isin(cities)]
-        
         # Apply time aggregation
-        if time_aggregation == "Weekly":
-            df_filtered = df_filtered.groupby(['city', pd.Grouper(key='date', freq='W')]).agg({
-                'temperature': 'mean',
-                'humidity': 'mean'
-            }).reset_index()
-        elif time_aggregation == "Monthly":
-            df_filtered = df_filtered.groupby(['city', pd.Grouper(key='date', freq='M')]).agg({
-                'temperature': 'mean',
-                'humidity': 'mean'
-            }).reset_index()
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
+        df_filtered = self._aggregate(cities, time_aggregation)
+        
+        fig = Figure(figsize=(10, 6))
+        ax = fig.subplots()
         
         for i, city in enumerate(df_filtered['city'].unique()):
             city_data = df_filtered[df_filtered['city'] == city]
-            ax.scatter(city_data['temperature'], city_data['humidity'], 
-                      label=city, color=self.CITY_COLORS[i % len(self.CITY_COLORS)], 
+            ax.scatter(city_data['temperature'], city_data['humidity'],
+                      label=city, color=self.CITY_COLORS[i % len(self.CITY_COLORS)],
                       alpha=0.7, s=50)
         
         ax.set_xlabel('Temperature (°C)')
@@ -243,22 +456,22 @@ class WeatherAnalyzer:
         ax.set_title(f'Humidity vs Temperature Correlation ({time_aggregation})')
         ax.legend()
         ax.grid(True, alpha=0.3)
-        plt.tight_layout()
+        fig.tight_layout()
         
         return fig
     
+    @timed()
     def create_rainfall_bar_chart(self, time_aggregation: str = "Monthly") -> go.Figure:
         """Create bar chart for total rainfall per time period"""
-        if time_aggregation == "Daily":
-            grouped_data = self.df.groupby(['date', 'city'])['rainfall'].sum().reset_index()
+        grouped_data = self._rainfall_totals(time_aggregation)
+        if time_aggregation in self.SUB_DAILY_AGGREGATIONS:
+            grouped_data['time_str'] = grouped_data['date'].dt.strftime('%Y-%m-%d %H:%M')
+        elif time_aggregation == "Daily":
             grouped_data['time_str'] = grouped_data['date'].dt.strftime('%Y-%m-%d')
         elif time_aggregation == "Weekly":
-            grouped_data = self.df.groupby(['city', pd.Grouper(key='date', freq='W')])['rainfall'].sum().reset_index()
             grouped_data['time_str'] = grouped_data['date'].dt.strftime('%Y-W%U')
         else:  # Monthly
-            grouped_data = self.df.groupby(['month_year', 'city'])['rainfall'].sum().reset_index()
-            grouped_data['time_str'] = grouped_data['month_year'].astype(str)
-            grouped_data = grouped_data.rename(columns={'month_year': 'date'})
+            grouped_data['time_str'] = grouped_data['date'].astype(str)
         
         fig = px.bar(
             grouped_data,
@@ -284,27 +497,12 @@ class WeatherAnalyzer:
         
         return fig
     
+    @timed()
     def create_humidity_temperature_scatter(self, cities: List[str] = None,
                                            time_aggregation: str = "Daily") -> go.Figure:
         """Create scatter plot for humidity vs temperature correlation"""
-        df_filtered = self.df.copy()
-        
-        if cities:
-            df_filtered = df_filtered[df_filtered['city'].isin(cities)]
-        
         # Apply time aggregation
-        if time_aggregation == "Weekly":
-            df_filtered = df_filtered.groupby(['city', pd.Grouper(key='date', freq='W')]).agg({
-                'temperature': 'mean',
-                'humidity': 'mean', 
-                'rainfall': 'sum'
-            }).reset_index()
-        elif time_aggregation == "Monthly":
-            df_filtered = df_filtered.groupby(['city', pd.Grouper(key='date', freq='M')]).agg({
-                'temperature': 'mean',
-                'humidity': 'mean',
-                'rainfall': 'sum'
-            }).reset_index()
+        df_filtered = self._aggregate(cities, time_aggregation)
         
         fig = px.scatter(
             df_filtered,
@@ -331,12 +529,54 @@ class WeatherAnalyzer:
         
         return fig
     
-    def create_comprehensive_dashboard(self, cities: List[str] = None) -> go.Figure:
-        """Create a comprehensive dashboard with multiple subplots"""
-        df_filtered = self.df.copy()
-        
-        if cities:
-            df_filtered = df_filtered[df_filtered['city'].isin(cities)]
+    @timed()
+    def create_comprehensive_dashboard(self, cities: List[str] = None, workers: Optional[int] = None) -> go.Figure:
+        """Create a comprehensive dashboard with multiple subplots
+        
+        The two aggregations and then the four panels' traces are built
+        concurrently on ``workers`` threads (see ``weather_render``); traces
+        are added in a fixed order, so the figure does not depend on timing.
+        """
+        # One point per city and day, even for sub-daily observations
+        inputs = build_all({
+            'daily': lambda: self._aggregate(cities, "Daily"),
+            'rainfall': lambda: self._rainfall_totals("Monthly", cities)
+        }, workers)
+        df_filtered, monthly_rainfall = inputs['daily'], inputs['rainfall']
+        
+        def temperature_traces():
+            # Temperature line chart
+            return [
+                go.Scatter(x=city_data['date'], y=city_data['temperature'], name=f'{city} Temp', mode='lines')
+                for city, city_data in df_filtered.groupby('city', sort=False, observed=True)
+            ]
+        
+        def average_traces():
+            # Average temperature by city
+            avg_temp = df_filtered.groupby('city')['temperature'].mean()
+            return [go.Bar(x=avg_temp.index, y=avg_temp.values, name='Avg Temperature', showlegend=False)]
+        
+        def scatter_traces():
+            # Humidity vs Temperature scatter
+            return [
+                go.Scatter(x=city_data['temperature'], y=city_data['humidity'], mode='markers',
+                           name=f'{city} H-T', marker=dict(size=8))
+                for city, city_data in df_filtered.groupby('city', sort=False, observed=True)
+            ]
+        
+        def rainfall_traces():
+            # Monthly rainfall
+            return [
+                go.Bar(x=city_data['date'].astype(str), y=city_data['rainfall'], name=f'{city} Rain', showlegend=False)
+                for city, city_data in monthly_rainfall.groupby('city', sort=False, observed=True)
+            ]
+        
+        panels = build_all({
+            (1, 1): temperature_traces,
+            (1, 2): average_traces,
+            (2, 1): scatter_traces,
+            (2, 2): rainfall_traces
+        }, workers)
         
         # Create subplots
         fig = make_subplots(
@@ -350,59 +590,9 @@ class WeatherAnalyzer:
             specs=[[{"secondary_y": False}, {"secondary_y": False}],
                    [{"secondary_y": False}, {"secondary_y": False}]]
         )
-        
-        # Temperature line chart
-        for city in df_filtered['city'].unique():
-            city_data = df_filtered[df_filtered['city'] == city]
-            fig.add_trace(
-                go.Scatter(
-                    x=city_data['date'],
-                    y=city_data['temperature'],
-                    name=f'{city} Temp',
-                    mode='lines'
-                ),
-                row=1, col=1
-            )
-        
-        # Average temperature by city
-        avg_temp = df_filtered.groupby('city')['temperature'].mean()
-        fig.add_trace(
-            go.Bar(
-                x=avg_temp.index,
-                y=avg_temp.values,
-                name='Avg Temperature',
-                showlegend=False
-            ),
-            row=1, col=2
-        )
-        
-        # Humidity vs Temperature scatter
-        for city in df_filtered['city'].unique():
-            city_data = df_filtered[df_filtered['city'] == city]
-            fig.add_trace(
-                go.Scatter(
-                    x=city_data['temperature'],
-                    y=city_data['humidity'],
-                    mode='markers',
-                    name=f'{city} H-T',
-                    marker=dict(size=8)
-                ),
-                row=2, col=1
-            )
-        
-        # Monthly rainfall
-        monthly_rainfall = df_filtered.groupby(['month_year', 'city'])['rainfall'].sum().reset_index()
-        for city in monthly_rainfall['city'].unique():
-            city_data = monthly_rainfall[monthly_rainfall['city'] == city]
-            fig.add_trace(
-                go.Bar(
-                    x=city_data['month_year'].astype(str),
-                    y=city_data['rainfall'],
-                    name=f'{city} Rain',
-                    showlegend=False
-                ),
-                row=2, col=2
-            )
+        for (row, col), traces in panels.items():
+            for trace in traces:
+                fig.add_trace(trace, row=row, col=col)
         
         fig.update_layout(
             height=800,
@@ -412,28 +602,111 @@ class WeatherAnalyzer:
         
         return fig
     
-    def export_processed_data(self, filename: str = 'processed_weather_data.csv'):
-        """Export processed data with additional columns"""
-        export_df = self.df.copy()
-        
-        # Add additional calculated columns
-        export_df['temperature_category'] = pd.cut(
-            export_df['temperature'], 
-            bins=[-np.inf, 10, 20, 30, np.inf], 
-            labels=['Cold', 'Cool', 'Warm', 'Hot']
-        )
+    def build_calendar_array(self, metric: str = 'temperature') -> Tuple[np.ndarray, List[str], pd.Timestamp]:
+        """Build a dense (city, day) array of daily values for calendar views
+        
+        Rows are cities, columns are integer day offsets from the first date in
+        the dataset. Temperature is averaged and rainfall summed per day; days
+        without observations are NaN. The array is built once per metric with
+        bincount over flat (city, day) indices and reused for every render.
+        """
+        if metric not in ('temperature', 'rainfall'):
+            raise ValueError(f"Unsupported calendar metric: {metric}")
+        
+        if metric in self._calendar_cache:
+            increment('cache_requests', cache='calendar', result='hit')
+            return self._calendar_cache[metric]
+        increment('cache_requests', cache='calendar', result='miss')
+        
+        days = self.df['date'].values.astype('datetime64[D]')
+        start = days.min()
+        n_days = int((days.max() - start).astype(np.int64)) + 1
+        
+        city_codes, city_names = pd.factorize(self.df['city'], sort=True)
+        n_cities = len(city_names)
+        
+        values = self.df[metric].to_numpy(dtype=np.float64)
+        valid = np.isfinite(values)
+        flat_idx = city_codes[valid] * n_days + (days[valid] - start).astype(np.int64)
+        
+        size = n_cities * n_days
+        totals = np.bincount(flat_idx, weights=values[valid], minlength=size)
+        counts = np.bincount(flat_idx, minlength=size)
+        
+        grid = np.full(size, np.nan)
+        observed = counts > 0
+        if metric == 'rainfall':
+            grid[observed] = totals[observed]
+        else:
+            grid[observed] = totals[observed] / counts[observed]
+        
+        result = (grid.reshape(n_cities, n_days), list(city_names), pd.Timestamp(start))
+        self._calendar_cache[metric] = result
+        return result
+    
+    @timed()
+    def create_calendar_heatmap(self, city: str, metric: str = 'temperature',
+                                layout: str = 'year') -> go.Figure:
+        """Create calendar heatmap for one city (day-of-year x year or week x weekday)"""
+        grid, city_names, start = self.build_calendar_array(metric)
+        
+        if city not in city_names:
+            raise ValueError(f"No data available for city: {city}")
+        
+        series = grid[city_names.index(city)]
+        dates = pd.date_range(start, periods=len(series), freq='D')
+        
+        if layout == 'year':
+            # Rows are years, columns are day of year (1-366)
+            years = dates.year.to_numpy()
+            first_year = years[0]
+            z = np.full((years[-1] - first_year + 1, 366), np.nan)
+            z[years - first_year, dates.dayofyear.to_numpy() - 1] = series
+            x = np.arange(1, 367)
+            y = [str(year) for year in range(first_year, years[-1] + 1)]
+            xaxis_title, yaxis_title = "Day of Year", "Year"
+        elif layout == 'week':
+            # Rows are weekdays, columns are Monday-aligned weeks since the start
+            weekday = dates.weekday.to_numpy()
+            week = (np.arange(len(series)) + weekday[0]) // 7
+            z = np.full((7, week[-1] + 1), np.nan)
+            z[weekday, week] = series
+            x = (dates[0] - pd.Timedelta(days=int(weekday[0])) +
+                 pd.to_timedelta(np.arange(week[-1] + 1) * 7, unit='D')).strftime('%Y-%m-%d')
+            y = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+            xaxis_title, yaxis_title = "Week Starting", "Weekday"
+        else:
+            raise ValueError(f"Unsupported calendar layout: {layout}")
+        
+        unit = '°C' if metric == 'temperature' else 'mm'
+        
+        fig = go.Figure(go.Heatmap(
+            z=np.round(z, 1),
+            x=x,
+            y=y,
+            colorscale=self.CALENDAR_COLORSCALES[metric],
+            colorbar=dict(title=unit),
+            hoverongaps=False,
+            hovertemplate=f'%{{y}} • %{{x}}<br>{metric.title()}: %{{z}}{unit}<extra></extra>'
+        ))
         
-        export_df['humidity_category'] = pd.cut(
-            export_df['humidity'], 
-            bins=[0, 30, 60, 80, 100], 
-            labels=['Low', 'Moderate', 'High', 'Very High']
+        fig.update_layout(
+            title=f'{city} Daily {metric.title()} Calendar',
+            xaxis_title=xaxis_title,
+            yaxis_title=yaxis_title,
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            font_color=self.COLORS['text'],
+            yaxis=dict(autorange='reversed')
         )
         
-        export_df['rainfall_category'] = pd.cut(
-            export_df['rainfall'], 
-            bins=[-0.1, 0, 2, 10, np.inf], 
-            labels=['None', 'Light', 'Moderate', 'Heavy']
-        )
+        return fig
+    
+    @timed()
+    def export_processed_data(self, filename: str = 'processed_weather_data.csv'):
+        """Export processed data with additional columns"""
+        # Add additional calculated columns
+        export_df = self.engine.categorize(self.df)
         
         export_df.to_csv(filename, index=False)
         print(f"Processed data exported to {filename}")
@@ -472,4 +745,4 @@ class WeatherAnalyzer:
         for month, rainfall in stats['rainfall_by_month'].items():
             print(f"{month}: {rainfall:.1f}mm")
         
-        print("=" * 60)
\ No newline at end of file
+        print("=" * 60)
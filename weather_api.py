@@ -0,0 +1,379 @@
+import pandas as pd
+import numpy as np
+import argparse
+import gzip
+import hashlib
+import http.client
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import logging
+from weather_analyzer import WeatherAnalyzer
+from weather_rollups import ROLLUP_ORDER, summarize_rollups
+from weather_resample import SUB_DAILY_GRANULARITIES
+from weather_shared import get_shared_dataset
+import weather_metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+# The store is checked for new data at most this often (seconds)
+VERSION_CHECK_INTERVAL = 1.0
+
+# Responses smaller than this are sent uncompressed
+GZIP_MIN_BYTES = 512
+
+SERIES_METRICS = ['temperature', 'humidity', 'rainfall']
+
+GRANULARITIES = SUB_DAILY_GRANULARITIES + ROLLUP_ORDER
+
+class BadRequest(ValueError):
+    pass
+
+def _jsonable(value):
+    """Plain JSON types for the pandas objects in summary statistics"""
+    if isinstance(value, pd.DataFrame):
+        frame = value.copy()
+        if isinstance(frame.columns, pd.MultiIndex):
+            frame.columns = ['_'.join(column) for column in frame.columns]
+        return {str(index): _jsonable(row.to_dict()) for index, row in frame.iterrows()}
+    if isinstance(value, pd.Series):
+        return {str(index): _jsonable(item) for index, item in value.items()}
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (pd.Timestamp, pd.Period)):
+        return str(value.date()) if isinstance(value, pd.Timestamp) and value == value.normalize() else str(value)
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+class WeatherAPI:
+    """Summary statistics, per-city series and anomalies as JSON, for other services
+    
+    Answers come from the dataset's rollups (the persisted ones when they
+    are current) over the shared, memory-mapped dataset. Encoded responses
+    are cached per dataset version with an ETag derived from that version,
+    so repeated requests are served from memory and revalidations with
+    If-None-Match cost a 304 without a body.
+    """
+    
+    def __init__(self, data_file: str = 'weather_data.csv', max_cached_responses: int = 1024):
+        self.shared = get_shared_dataset(data_file)
+        self.max_cached_responses = max_cached_responses
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._responses: 'OrderedDict[tuple, Tuple[str, bytes, Optional[bytes]]]' = OrderedDict()
+        self._state: Optional[Dict] = None
+        self._version_checked = 0.0
+    
+    def _current(self) -> Dict:
+        """Analyzer and per-city humidity extremes for the current dataset version"""
+        with self._lock:
+            if self._state is not None and time.monotonic() - self._version_checked < VERSION_CHECK_INTERVAL:
+                return self._state
+        
+        # One request rebuilds at a time; the others wait and then reuse its result
+        with self._build_lock:
+            version = self.shared.store.version()
+            self._version_checked = time.monotonic()
+            if self._state is not None and self._state['version'] == version:
+                return self._state
+            return self._build(version)
+    
+    def _build(self, version: str) -> Dict:
+        df = self.shared.frame()
+        store = self.shared.store
+        rollups = store.rollups if store.rollups_current() else None
+        analyzer = WeatherAnalyzer(df, rollups=rollups)
+        # Position of the first row holding each city's humidity extremes; a subset's extreme is the best of its cities'.
+        # Rows dropped by validation leave gaps in the index, so labels are mapped to positions
+        by_city = analyzer.df.groupby('city', observed=True)['humidity']
+        max_labels, min_labels = by_city.idxmax().dropna(), by_city.idxmin().dropna()
+        state = {
+            'version': version,
+            'analyzer': analyzer,
+            'max_humidity': pd.Series(analyzer.df.index.get_indexer(max_labels), index=max_labels.index),
+            'min_humidity': pd.Series(analyzer.df.index.get_indexer(min_labels), index=min_labels.index)
+        }
+        with self._lock:
+            self._state = state
+            self._responses.clear()
+        logger.info(f"API serving dataset version {version[:12]} ({len(df):,} rows)")
+        return state
+    
+    @staticmethod
+    def _cities(params: Dict) -> Optional[List[str]]:
+        value = params.get('cities')
+        return [city.strip() for city in value.split(',') if city.strip()] if value else None
+    
+    @staticmethod
+    def _choice(params: Dict, name: str, options: List[str], default: str) -> str:
+        value = params.get(name, default)
+        if value not in options:
+            raise BadRequest(f"{name} must be one of {options}")
+        return value
+    
+    def _extreme(self, state: Dict, key: str, cities: Optional[List[str]]) -> Optional[pd.Series]:
+        positions = state[key]
+        if cities:
+            positions = positions[positions.index.isin(cities)]
+        if positions.empty:
+            return None
+        candidates = state['analyzer'].df.iloc[np.sort(positions.to_numpy())]
+        humidity = candidates['humidity'].to_numpy()
+        best = np.argmax(humidity) if key == 'max_humidity' else np.argmin(humidity)
+        return candidates.iloc[best]
+    
+    def stats(self, params: Dict) -> Dict:
+        state = self._current()
+        cities = self._cities(params)
+        rollups = state['analyzer'].rollups
+        yearly = rollups.query_raw('Yearly', cities)
+        if yearly.empty:
+            raise BadRequest(f"No data for cities {cities}")
+        stats = summarize_rollups(
+            yearly, rollups.query_raw('Monthly', cities),
+            self._extreme(state, 'max_humidity', cities), self._extreme(state, 'min_humidity', cities)
+        )
+        return _jsonable(stats)
+    
+    def series(self, params: Dict) -> Dict:
+        state = self._current()
+        granularity = self._choice(params, 'granularity', GRANULARITIES, 'Monthly')
+        metric = self._choice(params, 'metric', SERIES_METRICS, 'temperature')
+        series = state['analyzer'].time_series(granularity, self._cities(params))
+        if params.get('start'):
+            series = series[series['date'] >= pd.Timestamp(params['start'])]
+        if params.get('end'):
+            series = series[series['date'] <= pd.Timestamp(params['end'])]
+        date_format = '%Y-%m-%dT%H:%M' if granularity in SUB_DAILY_GRANULARITIES else '%Y-%m-%d'
+        
+        return {
+            'granularity': granularity,
+            'metric': metric,
+            'series': {
+                str(city): {
+                    'dates': rows['date'].dt.strftime(date_format).tolist(),
+                    'values': [None if np.isnan(v) else v for v in rows[metric].round(2).tolist()]
+                }
+                for city, rows in series.groupby('city', observed=True, sort=True)
+            }
+        }
+    
+    def anomalies(self, params: Dict) -> Dict:
+        state = self._current()
+        granularity = self._choice(params, 'granularity', GRANULARITIES, 'Daily')
+        metric = self._choice(params, 'metric', SERIES_METRICS, 'temperature')
+        try:
+            threshold = float(params.get('threshold', 3.0))
+            limit = int(params.get('limit', 100))
+        except ValueError:
+            raise BadRequest("threshold must be a number and limit an integer")
+        
+        anomalies = state['analyzer'].detect_anomalies(metric, granularity, threshold, self._cities(params))
+        date_format = '%Y-%m-%dT%H:%M' if granularity in SUB_DAILY_GRANULARITIES else '%Y-%m-%d'
+        rows = anomalies.head(limit).assign(date=lambda frame: frame['date'].dt.strftime(date_format))
+        rows['city'] = rows['city'].astype(str)
+        return {
+            'granularity': granularity,
+            'metric': metric,
+            'threshold': threshold,
+            'total': len(anomalies),
+            'anomalies': rows.to_dict(orient='records')
+        }
+    
+    def health(self, params: Dict) -> Dict:
+        state = self._current()
+        return {'status': 'ok', 'version': state['version'], 'rows': len(state['analyzer'].df)}
+    
+    ROUTES = {'/stats': 'stats', '/series': 'series', '/anomalies': 'anomalies', '/health': 'health'}
+    
+    def handle(self, target: str, if_none_match: Optional[str] = None,
+               accept_gzip: bool = False) -> Tuple[int, Dict[str, str], bytes]:
+        """Status, headers and body for a GET of ``target`` (path and query string)"""
+        url = urlsplit(target)
+        if url.path not in self.ROUTES:
+            return self._error(404, f"Unknown endpoint {url.path}; try {sorted(self.ROUTES)}")
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        
+        version = self._current()['version']
+        key = (version, url.path, tuple(sorted(params.items())))
+        with self._lock:
+            cached = self._responses.get(key)
+            if cached is not None:
+                self._responses.move_to_end(key)
+        metrics.increment('cache_requests', cache='api', result='hit' if cached else 'miss')
+        
+        if cached is None:
+            try:
+                with metrics.span(f'api{url.path}'):
+                    payload = getattr(self, self.ROUTES[url.path])(params)
+            except (BadRequest, ValueError) as e:
+                return self._error(400, str(e))
+            body = json.dumps(payload, separators=(',', ':')).encode()
+            compressed = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+            # Weak, since the gzip and identity encodings are different bytes of the same content
+            etag = 'W/"' + hashlib.sha1(repr(key).encode()).hexdigest()[:20] + '"'
+            cached = (etag, body, compressed)
+            with self._lock:
+                self._responses[key] = cached
+                if len(self._responses) > self.max_cached_responses:
+                    self._responses.popitem(last=False)
+        
+        etag, body, compressed = cached
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return 304, headers, b''
+        headers['Content-Type'] = 'application/json'
+        if accept_gzip and compressed is not None:
+            headers['Content-Encoding'] = 'gzip'
+            body = compressed
+        return 200, headers, body
+    
+    @staticmethod
+    def _error(status: int, message: str) -> Tuple[int, Dict[str, str], bytes]:
+        return status, {'Content-Type': 'application/json'}, json.dumps({'error': message}).encode()
+
+def make_server(api: WeatherAPI, host: str = '127.0.0.1', port: int = 8600) -> ThreadingHTTPServer:
+    """HTTP server for the API (call ``serve_forever`` on it)"""
+    class APIHandler(BaseHTTPRequestHandler):
+        # Keep-alive, so clients are not charged a TCP handshake per request; headers and
+        # body are separate writes, which Nagle's algorithm would hold back for a delayed ACK
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+        
+        def do_GET(self):
+            try:
+                status, headers, body = api.handle(
+                    self.path, self.headers.get('If-None-Match'),
+                    'gzip' in self.headers.get('Accept-Encoding', '')
+                )
+            except Exception as e:
+                logger.exception(f"API request {self.path} failed")
+                status, headers, body = WeatherAPI._error(500, str(e))
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer((host, port), APIHandler)
+    server.daemon_threads = True
+    return server
+
+def load_test(host: str, port: int, paths: List[str], clients: int = 16, requests_per_client: int = 200,
+              revalidate: bool = False) -> Dict:
+    """Drive the API with concurrent keep-alive clients and report throughput and latency
+    
+    Each client cycles through ``paths``. With ``revalidate`` clients send
+    If-None-Match with the ETag they last saw, like a caching consumer.
+    """
+    latencies = [[] for _ in range(clients)]
+    statuses: Dict[int, int] = {}
+    errors = []
+    status_lock = threading.Lock()
+    start_barrier = threading.Barrier(clients + 1)
+    
+    def client(index: int):
+        connection = http.client.HTTPConnection(host, port, timeout=30)
+        etags = {}
+        start_barrier.wait()
+        for i in range(requests_per_client):
+            path = paths[(index + i) % len(paths)]
+            headers = {'Accept-Encoding': 'gzip'}
+            if revalidate and path in etags:
+                headers['If-None-Match'] = etags[path]
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as e:
+                errors.append(str(e))
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=30)
+                continue
+            latencies[index].append(time.perf_counter() - started)
+            etags[path] = response.getheader('ETag', etags.get(path))
+            with status_lock:
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+        connection.close()
+    
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    
+    samples = np.concatenate([np.asarray(client_latencies) for client_latencies in latencies]) * 1000
+    return {
+        'clients': clients,
+        'requests': int(len(samples)),
+        'errors': len(errors),
+        'statuses': statuses,
+        'seconds': round(elapsed, 2),
+        'requests_per_second': round(len(samples) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(samples, 50)), 2) if len(samples) else None,
+        'p99_ms': round(float(np.percentile(samples, 99)), 2) if len(samples) else None,
+        'max_ms': round(float(samples.max()), 2) if len(samples) else None
+    }
+
+DEFAULT_LOAD_TEST_PATHS = [
+    '/stats',
+    '/series?granularity=Monthly&metric=temperature',
+    '/series?granularity=Weekly&metric=rainfall',
+    '/anomalies?granularity=Daily&metric=temperature&threshold=3'
+]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless JSON API for weather analytics")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    serve_parser = subparsers.add_parser('serve', help="Serve /stats, /series, /anomalies and /health")
+    serve_parser.add_argument('--data-file', default='weather_data.csv')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8600)
+    
+    test_parser = subparsers.add_parser('loadtest', help="Measure requests/second and latency under concurrent clients")
+    test_parser.add_argument('--data-file', default='weather_data.csv',
+                             help="Dataset for an in-process server (when --port is not given)")
+    test_parser.add_argument('--host', default='127.0.0.1')
+    test_parser.add_argument('--port', type=int, help="Port of a running API server")
+    test_parser.add_argument('--clients', type=int, default=16)
+    test_parser.add_argument('--requests', type=int, default=200, help="Requests per client")
+    test_parser.add_argument('--revalidate', action='store_true', help="Send If-None-Match like a caching client")
+    test_parser.add_argument('--path', action='append', dest='paths', help="Request path (repeatable)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    
+    if args.command == 'serve':
+        server = make_server(WeatherAPI(args.data_file), args.host, args.port)
+        logger.info(f"Weather API listening on http://{args.host}:{server.server_address[1]}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        server = None
+        port = args.port
+        if port is None:
+            server = make_server(WeatherAPI(args.data_file), args.host, 0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            port = server.server_address[1]
+        report = load_test(args.host, port, args.paths or DEFAULT_LOAD_TEST_PATHS,
+                           args.clients, args.requests, args.revalidate)
+        print(json.dumps(report, indent=2))
+        if server:
+            server.shutdown()
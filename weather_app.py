@@ -0,0 +1,21 @@
+from contextlib import asynccontextmanager
+import streamlit as st
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from weather_warmup import get_warmup
+
+# Launch with `streamlit run weather_app.py`: the dashboard's caches start warming
+# when the server starts, before the first session connects
+
+@asynccontextmanager
+async def lifespan(app):
+    warmup = get_warmup().start()
+    yield {'warmup': warmup}
+
+async def ready(request: Request) -> JSONResponse:
+    """Readiness probe: 200 once the default view is precomputed, 503 while warming up"""
+    warmup = get_warmup()
+    return JSONResponse(warmup.status(), status_code=200 if warmup.ready else 503)
+
+app = st.App("weather_dashboard.py", lifespan=lifespan, routes=[Route("/ready", ready)])
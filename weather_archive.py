@@ -0,0 +1,296 @@
+import pandas as pd
+import numpy as np
+import argparse
+import glob
+import json
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+import logging
+from weather_snapshot import NUMERIC_COLUMNS
+from weather_validation import is_validated, stamp
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = ['city', 'date'] + NUMERIC_COLUMNS
+
+# Metrics are stored as integers at the finest of these precisions that holds every value exactly
+# (readings are recorded to 0.1; API values may carry two decimals); anything else is kept as float64
+QUANTIZE_SCALES = [10, 100]
+
+# Date deltas are stored in the coarsest of these units that divides every timestamp
+DATE_UNITS = {'D': 86_400_000_000_000, 'h': 3_600_000_000_000, 'min': 60_000_000_000, 's': 1_000_000_000, 'ns': 1}
+
+# Encoding per column; metrics fall back to 'raw' when they cannot be quantized
+COLUMN_ENCODINGS = {
+    'city': 'dictionary_rle',
+    'date': 'delta_rle',
+    'temperature': 'delta',
+    'humidity': 'delta',
+    'rainfall': 'rle'
+}
+
+def _narrow(values: np.ndarray) -> np.ndarray:
+    """Integer values in the smallest dtype that holds their range"""
+    if not len(values):
+        return values.astype(np.int8)
+    low, high = int(values.min()), int(values.max())
+    for dtype in (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values.astype(np.int64)
+
+def _quantize(values: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[int]]:
+    """Integer multiples of 1/scale that reproduce every value exactly, or (None, None)"""
+    for scale in QUANTIZE_SCALES:
+        quantized = np.rint(values * scale)
+        if np.array_equal(quantized / scale, values) and np.abs(quantized).max(initial=0) < 2 ** 53:
+            return quantized.astype(np.int64), scale
+    return None, None
+
+def _encode_rle(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """Run values and run lengths"""
+    if not len(values):
+        return {'values': _narrow(values), 'lengths': _narrow(values)}
+    starts = np.flatnonzero(np.concatenate([[True], values[1:] != values[:-1]]))
+    lengths = np.diff(np.append(starts, len(values)))
+    return {'values': _narrow(values[starts]), 'lengths': _narrow(lengths)}
+
+def _decode_rle(parts: Dict[str, np.ndarray]) -> np.ndarray:
+    return np.repeat(parts['values'].astype(np.int64), parts['lengths'].astype(np.int64))
+
+def _encode_delta(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """Differences between consecutive values, patched: a narrow base array plus the outliers
+    
+    Slowly varying series have small steps, so most deltas fit one byte;
+    the few that do not (e.g. where one city's series ends and the next
+    begins) are stored separately with their positions. The base width is
+    the one that minimizes the total size.
+    """
+    deltas = np.diff(values, prepend=0)
+    best = None
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        # The minimum marks a patched position
+        outside = (deltas <= info.min) | (deltas > info.max)
+        size = len(deltas) * np.dtype(dtype).itemsize + np.count_nonzero(outside) * 12
+        if best is None or size < best[0]:
+            best = (size, dtype, outside)
+    _, dtype, outside = best
+    base = np.where(outside, np.iinfo(dtype).min, deltas).astype(dtype)
+    positions = np.flatnonzero(outside)
+    return {'base': base, 'positions': _narrow(positions), 'patches': _narrow(deltas[positions])}
+
+def _decode_delta(parts: Dict[str, np.ndarray]) -> np.ndarray:
+    deltas = parts['base'].astype(np.int64)
+    deltas[parts['positions'].astype(np.int64)] = parts['patches']
+    return np.cumsum(deltas)
+
+def encode_columns(df: pd.DataFrame) -> Tuple[Dict[str, Dict[str, np.ndarray]], Dict[str, Dict]]:
+    """Encode city-then-date ordered rows; returns each column's arrays and its decoding parameters"""
+    parts, params = {}, {}
+    
+    # Rows are ordered by city, so the city codes are one run per city
+    codes, categories = pd.factorize(df['city'], sort=True)
+    parts['city'] = _encode_rle(codes)
+    params['city'] = {'encoding': 'dictionary_rle', 'categories': [str(city) for city in categories]}
+    
+    timestamps = df['date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    unit = next(name for name, ns in DATE_UNITS.items() if not (timestamps % ns).any())
+    # Regular sampling turns into a few runs of one constant step
+    parts['date'] = _encode_rle(np.diff(timestamps // DATE_UNITS[unit], prepend=0))
+    params['date'] = {'encoding': 'delta_rle', 'unit': unit}
+    
+    for column in NUMERIC_COLUMNS:
+        values = df[column].to_numpy(dtype=np.float64)
+        quantized, scale = _quantize(values)
+        if quantized is None:
+            parts[column] = {'values': values}
+            params[column] = {'encoding': 'raw'}
+            continue
+        encode = _encode_rle if COLUMN_ENCODINGS[column] == 'rle' else _encode_delta
+        parts[column] = encode(quantized)
+        params[column] = {'encoding': COLUMN_ENCODINGS[column], 'scale': scale}
+    return parts, params
+
+def decode_column(parts: Dict[str, np.ndarray], params: Dict) -> np.ndarray:
+    """One column as a NumPy array: city codes (int), dates (datetime64[ns]) or float64 metrics"""
+    encoding = params['encoding']
+    if encoding == 'raw':
+        return parts['values']
+    if encoding == 'dictionary_rle':
+        return _decode_rle(parts)
+    if encoding == 'delta_rle':
+        return (np.cumsum(_decode_rle(parts)) * DATE_UNITS[params['unit']]).view('datetime64[ns]')
+    decoded = _decode_rle(parts) if encoding == 'rle' else _decode_delta(parts)
+    return decoded / params['scale']
+
+class ColumnarArchive:
+    """Compressed columnar archive of a weather dataset (``<base>_archive/``)
+    
+    Rows are ordered by city and date. Cities are dictionary-encoded and
+    stored as one run per city, dates as run-length encoded steps,
+    temperature and humidity as patched deltas of their values at stored
+    precision (0.1) and rainfall, mostly zero, as runs. Each column is one
+    file of concatenated parts described by ``header.json``, which is
+    written last; decoding reads the parts straight into NumPy arrays and
+    expands them with ``repeat``/``cumsum``, without parsing text. Like the
+    snapshot, the archive keeps the fixed columns only.
+    """
+    
+    def __init__(self, data_file: str):
+        base, _ = os.path.splitext(data_file)
+        self.archive_dir = f"{base}_archive"
+        self.header_file = os.path.join(self.archive_dir, 'header.json')
+    
+    def _column_path(self, column: str, generation: str) -> str:
+        return os.path.join(self.archive_dir, f"{column}-{generation}.bin")
+    
+    def exists(self) -> bool:
+        return os.path.exists(self.header_file)
+    
+    def header(self) -> Optional[Dict]:
+        """The current header, or None if no archive has been written"""
+        try:
+            with open(self.header_file) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def write(self, df: pd.DataFrame, store_version: Optional[str] = None) -> Dict:
+        """Encode deduplicated rows into a new archive generation and make it current"""
+        df = df.sort_values(['city', 'date'], kind='stable')
+        parts, params = encode_columns(df)
+        generation = uuid.uuid4().hex[:12]
+        os.makedirs(self.archive_dir, exist_ok=True)
+        
+        columns = {}
+        for column in ARCHIVE_COLUMNS:
+            layout, offset = [], 0
+            with open(self._column_path(column, generation), 'wb') as f:
+                for name, values in parts[column].items():
+                    values.tofile(f)
+                    layout.append({'name': name, 'dtype': values.dtype.str, 'count': len(values), 'offset': offset})
+                    offset += values.nbytes
+                f.flush()
+                os.fsync(f.fileno())
+            columns[column] = dict(params[column], parts=layout, bytes=offset)
+        
+        header = {
+            'generation': generation,
+            'store_version': store_version,
+            'rows': len(df),
+            'order': ['city', 'date'],
+            'columns': columns,
+            'validated': is_validated(df)
+        }
+        tmp_path = f"{self.header_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(header, f, indent=2)
+        os.replace(tmp_path, self.header_file)
+        
+        for path in glob.glob(os.path.join(self.archive_dir, '*.bin')):
+            if not path.endswith(f"-{generation}.bin"):
+                os.remove(path)
+        logger.info(f"Archived {len(df):,} records to {self.archive_dir} ({self.size_bytes(header):,} bytes)")
+        return header
+    
+    def _read_parts(self, column: str, header: Dict) -> Dict[str, np.ndarray]:
+        spec = header['columns'][column]
+        with open(self._column_path(column, header['generation']), 'rb') as f:
+            return {part['name']: np.fromfile(f, dtype=part['dtype'], count=part['count'])
+                    for part in spec['parts']}
+    
+    def arrays(self, columns: Optional[List[str]] = None, header: Optional[Dict] = None) -> Dict[str, np.ndarray]:
+        """Decode columns (all by default) into NumPy arrays; city is integer codes into header['columns']['city']['categories']"""
+        header = header or self.header()
+        if header is None:
+            raise FileNotFoundError(f"No archive found in {self.archive_dir}")
+        return {column: decode_column(self._read_parts(column, header), header['columns'][column])
+                for column in (columns or ARCHIVE_COLUMNS)}
+    
+    def load(self, header: Optional[Dict] = None) -> pd.DataFrame:
+        """The archived rows as a DataFrame (city categorical, ordered by city and date)"""
+        header = header or self.header()
+        data = self.arrays(header=header)
+        data['city'] = pd.Categorical.from_codes(data['city'], categories=header['columns']['city']['categories'])
+        df = pd.DataFrame(data, copy=False)
+        return stamp(df) if header.get('validated', False) else df
+    
+    def size_bytes(self, header: Optional[Dict] = None) -> int:
+        """Bytes of column data plus the header"""
+        header = header or self.header()
+        return sum(spec['bytes'] for spec in header['columns'].values()) + os.path.getsize(self.header_file)
+    
+    def report(self, csv_files: List[str]) -> Dict:
+        """Compression ratio and decode throughput against reading the same data from CSV"""
+        header = self.header()
+        csv_bytes = sum(os.path.getsize(path) for path in csv_files)
+        start = time.perf_counter()
+        self.arrays(header=header)
+        decode_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for path in csv_files:
+            pd.read_csv(path, usecols=ARCHIVE_COLUMNS, parse_dates=['date'])
+        csv_seconds = time.perf_counter() - start
+        
+        archive_bytes = self.size_bytes(header)
+        rows = header['rows']
+        return {
+            'rows': rows,
+            'csv_bytes': csv_bytes,
+            'archive_bytes': archive_bytes,
+            'compression_ratio': round(csv_bytes / archive_bytes, 1),
+            'column_bytes': {column: spec['bytes'] for column, spec in header['columns'].items()},
+            'encodings': {column: spec['encoding'] for column, spec in header['columns'].items()},
+            'decode_seconds': round(decode_seconds, 4),
+            'decode_rows_per_second': round(rows / decode_seconds) if decode_seconds else None,
+            'csv_seconds': round(csv_seconds, 4),
+            'csv_rows_per_second': round(rows / csv_seconds) if csv_seconds else None
+        }
+
+def _check_round_trip(df: pd.DataFrame, archive: ColumnarArchive) -> bool:
+    """Whether the archive decodes to exactly the archived rows"""
+    expected = df.sort_values(['city', 'date'], kind='stable').reset_index(drop=True)
+    decoded = archive.load()
+    return (np.array_equal(decoded['city'].astype(str).to_numpy(), expected['city'].astype(str).to_numpy())
+            and all(np.array_equal(decoded[column].to_numpy(), expected[column].to_numpy()) for column in ARCHIVE_COLUMNS[1:]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive a weather dataset in compressed columnar form")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    export_parser = subparsers.add_parser('export', help="Archive a dataset store and compare it with its CSV files")
+    export_parser.add_argument('--data-file', default='weather_data.csv')
+    
+    benchmark_parser = subparsers.add_parser('benchmark', help="Archive synthetic daily data and compare it with CSV")
+    benchmark_parser.add_argument('--cities', type=int, default=100)
+    benchmark_parser.add_argument('--days', type=int, default=3650)
+    benchmark_parser.add_argument('--data-file', default='archive_benchmark.csv')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    
+    if args.command == 'export':
+        from weather_store import WeatherDataStore
+        store = WeatherDataStore(args.data_file)
+        df = store.read()
+        store.export_archive()
+        csv_files = [path for path in [store.data_file] + store._segment_files() if os.path.exists(path)]
+    else:
+        from weather_benchmark import synthetic_weather
+        df = synthetic_weather(args.cities, args.days)
+        df.to_csv(args.data_file, index=False)
+        ColumnarArchive(args.data_file).write(df)
+        csv_files = [args.data_file]
+    
+    archive = ColumnarArchive(args.data_file)
+    report = archive.report(csv_files)
+    print(f"{report['rows']:,} rows: CSV {report['csv_bytes'] / 1e6:.1f} MB, archive {report['archive_bytes'] / 1e6:.2f} MB "
+          f"({report['compression_ratio']}x smaller)")
+    for column, size in report['column_bytes'].items():
+        print(f"  {column}: {report['encodings'][column]}, {size:,} bytes ({size / max(report['rows'], 1):.2f} bytes/row)")
+    print(f"Decode {report['decode_rows_per_second'] or 0:,.0f} rows/s ({report['decode_seconds'] * 1000:.1f} ms), "
+          f"CSV {report['csv_rows_per_second'] or 0:,.0f} rows/s ({report['csv_seconds'] * 1000:.1f} ms)")
+    print(f"Round trip exact: {_check_round_trip(df, archive)}")
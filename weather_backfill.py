@@ -0,0 +1,168 @@
+import pandas as pd
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Optional, Set, Tuple
+import logging
+from weather_collector import WeatherDataCollector, RateController, load_city_list
+from weather_store import WeatherDataStore
+
+logger = logging.getLogger(__name__)
+
+class BackfillJob:
+    """Resumable, checkpointed historical backfill for many cities
+    
+    The (city, date range) request is split into work units of ``chunk_days``
+    consecutive days per city. Units run in parallel on a thread pool that
+    shares one collector, so all workers draw from the same rate budget.
+    Every stored day is recorded in an append-only checkpoint file; an
+    interrupted backfill resumes by skipping checkpointed days. Days whose
+    rows fail validation are quarantined, not checkpointed, so a later run
+    fetches them again. Rows are appended straight into the dataset store
+    (which dedupes on (city, date), so a crash between storing and
+    checkpointing only costs a refetch).
+    """
+    
+    def __init__(self, cities: List[str], start_date: date, end_date: date,
+                 store: Optional[WeatherDataStore] = None,
+                 collector: Optional[WeatherDataCollector] = None,
+                 checkpoint_file: str = 'backfill_checkpoint.jsonl',
+                 workers: int = 4, chunk_days: int = 30, requests_per_second: float = 5.0):
+        self.cities = list(cities)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.store = store or WeatherDataStore()
+        self.collector = collector or WeatherDataCollector(
+            rate_controller=RateController(min_interval=1.0 / requests_per_second)
+        )
+        self.checkpoint_file = checkpoint_file
+        self.workers = workers
+        self.chunk_days = chunk_days
+        self._lock = threading.Lock()
+        self._done = self._load_checkpoint()
+    
+    def _load_checkpoint(self) -> Set[Tuple[str, str]]:
+        """Days already stored by previous runs"""
+        done = set()
+        if os.path.exists(self.checkpoint_file):
+            with open(self.checkpoint_file) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from an interrupted run; that day is simply refetched
+                        continue
+                    done.add((entry['city'], entry['date']))
+        return done
+    
+    def _record_checkpoint(self, stored: pd.DataFrame):
+        keys = list(zip(stored['city'], stored['date'].dt.strftime('%Y-%m-%d')))
+        with open(self.checkpoint_file, 'a') as f:
+            for city, day in keys:
+                f.write(json.dumps({'city': city, 'date': day}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._done.update(keys)
+    
+    def work_units(self) -> List[Tuple[str, List[str]]]:
+        """Split the backfill into (city, days) units, skipping checkpointed days"""
+        all_days = pd.date_range(self.start_date, self.end_date, freq='D').strftime('%Y-%m-%d').tolist()
+        units = []
+        for city in self.cities:
+            pending = [day for day in all_days if (city, day) not in self._done]
+            for i in range(0, len(pending), self.chunk_days):
+                units.append((city, pending[i:i + self.chunk_days]))
+        return units
+    
+    def _run_unit(self, city: str, days: List[str]) -> Dict:
+        rows = []
+        failed = []
+        for i, day in enumerate(days):
+            if self.collector.key_rejected() or not self.collector.circuit_breaker.allow(city):
+                # The key or the city keeps failing; leave the rest of the unit for a later run
+                failed.extend(days[i:])
+                break
+            try:
+                rows.append(self.collector.fetch_historical_weather(city, day))
+            except Exception as e:
+                logger.error(f"❌ Backfill failed for {city} on {day}: {e}")
+                failed.append(day)
+        
+        stored = 0
+        if rows:
+            with self._lock:
+                rows_stored = self.store.append(self.collector.clean_data(pd.DataFrame(rows), self.store.quarantine))
+                if not rows_stored.empty:
+                    self._record_checkpoint(rows_stored)
+            stored = len(rows_stored)
+        return {'city': city, 'stored': stored, 'rejected': len(rows) - stored, 'failed': len(failed)}
+    
+    def run(self) -> Dict:
+        """Run all pending work units; returns progress statistics"""
+        units = self.work_units()
+        total_days = sum(len(days) for _, days in units)
+        requested_days = len(self.cities) * ((self.end_date - self.start_date).days + 1)
+        logger.info(f"🔄 Backfilling {total_days} city-days in {len(units)} units "
+                    f"({requested_days - total_days} already checkpointed)")
+        
+        start = time.perf_counter()
+        stored = rejected = failed = 0
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self._run_unit, city, days) for city, days in units]
+            for future in as_completed(futures):
+                result = future.result()
+                stored += result['stored']
+                rejected += result['rejected']
+                failed += result['failed']
+                logger.info(f"Backfill progress: {stored + rejected + failed}/{total_days} city-days")
+        
+        elapsed = time.perf_counter() - start
+        stats = {
+            'units': len(units),
+            'stored': stored,
+            'rejected': rejected,
+            'failed': failed,
+            'skipped_checkpointed': requested_days - total_days,
+            'elapsed_seconds': round(elapsed, 2),
+            'days_per_second': round(stored / elapsed, 2) if elapsed else None
+        }
+        logger.info(f"✅ Backfill finished: {stats}")
+        return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill historical weather data")
+    parser.add_argument('--cities', help="Comma-separated list of cities")
+    parser.add_argument('--city-file', help="File with one city per line")
+    parser.add_argument('--start', required=True, help="First date (YYYY-MM-DD)")
+    parser.add_argument('--end', default=(date.today() - timedelta(days=1)).isoformat(), help="Last date (YYYY-MM-DD)")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--chunk-days', type=int, default=30)
+    parser.add_argument('--rate', type=float, default=5.0, help="Request budget (requests per second)")
+    parser.add_argument('--checkpoint', default='backfill_checkpoint.jsonl')
+    parser.add_argument('--output', default='weather_data.csv')
+    parser.add_argument('--api-root', default="http://api.openweathermap.org", help="API root (e.g. a local stub server)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    
+    cities = load_city_list(args.city_file) if args.city_file else [c.strip() for c in args.cities.split(',')]
+    collector = WeatherDataCollector(
+        rate_controller=RateController(min_interval=1.0 / args.rate),
+        api_root=args.api_root
+    )
+    
+    job = BackfillJob(
+        cities,
+        datetime.strptime(args.start, '%Y-%m-%d').date(),
+        datetime.strptime(args.end, '%Y-%m-%d').date(),
+        store=WeatherDataStore(args.output),
+        collector=collector,
+        checkpoint_file=args.checkpoint,
+        workers=args.workers,
+        chunk_days=args.chunk_days
+    )
+    job.run()
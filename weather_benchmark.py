@@ -0,0 +1,266 @@
+import pandas as pd
+import numpy as np
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Synthetic dataset scales: name -> (cities, days)
+SCALES = {
+    'xs': (6, 90),
+    's': (50, 365),
+    'm': (200, 5 * 365),
+    'l': (2000, 10 * 365)
+}
+DEFAULT_SCALES = ['xs', 's']
+
+# A benchmark regresses when it is this much slower (or larger) than its baseline...
+REGRESSION_THRESHOLD = 1.25
+# ...and the difference is bigger than timer/allocator noise
+MIN_REGRESSION_SECONDS = 0.005
+MIN_REGRESSION_MB = 1.0
+
+# Injected per-request latency of the stub API for collector benchmarks
+STUB_LATENCY = 0.02
+
+def synthetic_weather(n_cities: int, days: int, seed: int = 0) -> pd.DataFrame:
+    """Deterministic daily observations for n_cities over the given number of days"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2015-01-01', periods=days, freq='D')
+    n = len(dates) * n_cities
+    # Seasonal cycle plus noise, so charts and categories see realistic shapes
+    season = np.tile(10 * np.sin(2 * np.pi * dates.dayofyear.to_numpy() / 365.25), n_cities)
+    return pd.DataFrame({
+        'city': np.repeat([f'City{i:04d}' for i in range(n_cities)], len(dates)),
+        'date': np.tile(dates, n_cities),
+        'temperature': np.round(20 + season + rng.normal(0, 4, n), 1),
+        'humidity': np.round(rng.uniform(10, 100, n), 1),
+        'rainfall': np.where(rng.random(n) < 0.3, np.round(rng.exponential(4, n), 1), 0.0)
+    })
+
+def _release(result):
+    """Free what a benchmarked call returned (matplotlib keeps figures open otherwise)"""
+    if type(result).__module__.startswith('matplotlib'):
+        import matplotlib.pyplot as plt
+        plt.close(result)
+
+def measure(fn: Callable, setup: Optional[Callable] = None, repeat: int = 3) -> Dict:
+    """Wall time (best and median of ``repeat`` runs) and peak traced allocation of one call
+    
+    ``setup`` builds fresh arguments for every run outside the timed region.
+    Memory is measured on a separate run, since tracing slows allocation down.
+    """
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        gc.collect()
+        start = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - start)
+        _release(result)
+        del args, result
+    
+    args = setup() if setup else ()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        _release(fn(*args))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    return {
+        'seconds': round(min(times), 6),
+        'median_seconds': round(float(np.median(times)), 6),
+        'peak_mb': round(peak / 1024 / 1024, 3),
+        'repeat': repeat
+    }
+
+def _analyzer_benchmarks(df: pd.DataFrame, workdir: str) -> Dict[str, Callable]:
+    """Every public WeatherAnalyzer computation, with the dashboard's default arguments"""
+    cities = sorted(df['city'].unique())[:3]
+    export_file = os.path.join(workdir, 'processed.csv')
+    
+    def quiet_export(analyzer):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return analyzer.export_processed_data(export_file)
+    
+    return {
+        'calculate_summary_statistics': lambda a: a.calculate_summary_statistics(),
+        'create_temperature_line_chart': lambda a: a.create_temperature_line_chart(cities, 'Daily'),
+        'create_temperature_line_chart_monthly': lambda a: a.create_temperature_line_chart(cities, 'Monthly'),
+        'create_rainfall_bar_chart': lambda a: a.create_rainfall_bar_chart('Monthly'),
+        'create_humidity_temperature_scatter': lambda a: a.create_humidity_temperature_scatter(cities, 'Daily'),
+        'create_comprehensive_dashboard': lambda a: a.create_comprehensive_dashboard(cities),
+        'create_calendar_heatmap': lambda a: a.create_calendar_heatmap(cities[0]),
+        'create_static_temperature_chart': lambda a: a.create_static_temperature_chart(cities, 'Daily'),
+        'create_static_rainfall_chart': lambda a: a.create_static_rainfall_chart('Monthly'),
+        'create_static_humidity_scatter': lambda a: a.create_static_humidity_scatter(cities, 'Daily'),
+        'export_processed_data': quiet_export
+    }
+
+def run_scale(scale: str, repeat: int = 3, collector: bool = True) -> Dict[str, Dict]:
+    """Run every benchmark on one synthetic dataset scale"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from weather_analyzer import WeatherAnalyzer
+    from weather_collector import WeatherDataCollector
+    from weather_shared import SharedDataset
+    from weather_store import WeatherDataStore
+    
+    n_cities, days = SCALES[scale]
+    df = synthetic_weather(n_cities, days)
+    results = {}
+    logger.info(f"Benchmarking scale {scale}: {n_cities} cities x {days} days ({len(df):,} rows)")
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, call in _analyzer_benchmarks(df, workdir).items():
+            # A fresh analyzer per run, so lazily built rollups are charged to the first call as in a session
+            results[f'analyzer.{name}'] = measure(call, lambda: (WeatherAnalyzer(df),), repeat)
+        
+        # Raw rows as the collector receives them, with ISO date strings
+        raw = df.assign(date=df['date'].dt.strftime('%Y-%m-%d'))
+        clean = WeatherDataCollector(api_key='benchmark').clean_data
+        results['collector.clean_data'] = measure(clean, lambda: (raw.copy(),), repeat)
+        
+        # The two ways load_or_generate_data can get the dataset: parsing the store's CSV
+        # (first start, or after the snapshot fell behind) and mapping the snapshot
+        data_file = os.path.join(workdir, 'weather_data.csv')
+        WeatherDataStore(data_file).write(df)
+        results['load.csv'] = measure(lambda: WeatherDataStore(data_file).read(), repeat=repeat)
+        results['load.snapshot'] = measure(lambda: SharedDataset(data_file).frame(), repeat=repeat)
+    
+    if collector:
+        results.update(_collector_benchmarks(min(n_cities, 20), repeat))
+    return results
+
+def _collector_benchmarks(n_cities: int, repeat: int) -> Dict[str, Dict]:
+    """Collector round trips against the local stub API with injected latency"""
+    from weather_collector import WeatherDataCollector, RateController
+    from weather_stub_server import StubWeatherServer
+    
+    cities = [f'City{i:04d}' for i in range(n_cities)]
+    results = {}
+    with StubWeatherServer(latency=STUB_LATENCY) as server:
+        def make_collector():
+            # No client-side pacing, so the numbers reflect request handling and latency only
+            return (WeatherDataCollector(api_key='stub', api_root=server.api_root,
+                                         rate_controller=RateController(min_interval=0.0)),)
+        
+        results['collector.collect_current_weather_all_cities'] = measure(
+            lambda c: c.collect_current_weather_all_cities(cities), make_collector, repeat
+        )
+        results['collector.collect_historical_data'] = measure(
+            lambda c: c.collect_historical_data(cities[:3], days=7), make_collector, repeat
+        )
+    for name in ('collect_current_weather_all_cities', 'collect_historical_data'):
+        results[f'collector.{name}']['stub_latency'] = STUB_LATENCY
+    return results
+
+def run_benchmarks(scales: List[str] = DEFAULT_SCALES, repeat: int = 3, collector: bool = True) -> Dict:
+    """Benchmark results for each scale, with enough metadata to judge comparability"""
+    import matplotlib
+    import plotly
+    
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'plotly': plotly.__version__,
+            'matplotlib': matplotlib.__version__,
+            'repeat': repeat
+        },
+        'scales': {},
+        'results': {}
+    }
+    for scale in scales:
+        n_cities, days = SCALES[scale]
+        report['scales'][scale] = {'cities': n_cities, 'days': days, 'rows': n_cities * days}
+        # Collector runs do not depend on the dataset, so they are measured once
+        report['results'][scale] = run_scale(scale, repeat, collector and scale == scales[0])
+    return report
+
+def compare(report: Dict, baseline: Dict, threshold: float = REGRESSION_THRESHOLD) -> List[Dict]:
+    """Benchmarks that got slower or allocate more than the baseline allows"""
+    regressions = []
+    for scale, results in report['results'].items():
+        for name, result in results.items():
+            reference = baseline.get('results', {}).get(scale, {}).get(name)
+            if reference is None:
+                continue
+            for key, floor in (('seconds', MIN_REGRESSION_SECONDS), ('peak_mb', MIN_REGRESSION_MB)):
+                current, previous = result[key], reference[key]
+                if current > previous * threshold and current - previous > floor:
+                    regressions.append({
+                        'scale': scale, 'benchmark': name, 'measure': key,
+                        'baseline': previous, 'current': current,
+                        'ratio': round(current / previous, 2) if previous else float('inf')
+                    })
+    return regressions
+
+def format_report(report: Dict, baseline: Optional[Dict] = None) -> str:
+    """Plain-text table of the results, with the change against a baseline when given"""
+    lines = []
+    for scale, results in report['results'].items():
+        info = report['scales'][scale]
+        lines.append(f"\n{scale}: {info['cities']} cities x {info['days']} days ({info['rows']:,} rows)")
+        for name, result in results.items():
+            line = f"  {name:<48} {result['seconds'] * 1000:>10.1f} ms {result['peak_mb']:>9.1f} MB"
+            reference = (baseline or {}).get('results', {}).get(scale, {}).get(name)
+            if reference and reference['seconds']:
+                line += f"  ({result['seconds'] / reference['seconds']:.2f}x baseline)"
+            lines.append(line)
+    return '\n'.join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the collector, analyzer and dashboard data paths")
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=DEFAULT_SCALES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-collector', action='store_true', help="Skip the stub API collector benchmarks")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default='benchmark_baseline.json',
+                        help="Results to compare against (skipped if the file does not exist)")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    
+    report = run_benchmarks(args.scales, args.repeat, collector=not args.no_collector)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+    print(f"\nResults written to {args.output}")
+    
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif baseline:
+        regressions = compare(report, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['scale']} {regression['benchmark']} {regression['measure']}: "
+                  f"{regression['baseline']} -> {regression['current']} ({regression['ratio']}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (threshold {args.threshold}x)")
@@ -4,9 +4,15 @@ import numpy as np
 from datetime import datetime, timedelta
 import time
 import os
-from typing import List, Dict, Optional
+import threading
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Optional, Tuple
 import logging
 from dotenv import load_dotenv
+from weather_store import WeatherDataStore
+from weather_metrics import span, increment
+from weather_validation import QuarantineStore, validate
+from weather_forecast import FORECAST_COLUMNS, issue_time, to_local
 
 # Load environment variables
 load_dotenv()
@@ -15,79 +21,307 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class CircuitOpenError(ConnectionError):
+    """Raised when a city is skipped because its circuit breaker is open"""
+
+class RateController:
+    """Adaptive client-side rate control that backs off on HTTP 429 and Retry-After"""
+    
+    def __init__(self, min_interval: float = 0.2, max_interval: float = 30.0,
+                 backoff: float = 2.0, recovery: float = 0.9):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.recovery = recovery
+        self.interval = min_interval
+        self._next_allowed = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until the next request may be sent"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._next_allowed - now)
+            self._next_allowed = max(now, self._next_allowed) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+    
+    def record_success(self):
+        """Gradually speed back up after successful requests"""
+        with self._lock:
+            self.interval = max(self.min_interval, self.interval * self.recovery)
+    
+    def record_throttle(self, retry_after: Optional[float] = None):
+        """Slow down after a 429, pausing for Retry-After when the server sends one"""
+        with self._lock:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+            pause = retry_after if retry_after is not None else self.interval
+            self._next_allowed = max(self._next_allowed, time.monotonic() + pause)
+        logger.warning(f"⚠️ Rate limited by API, request interval now {self.interval:.2f}s")
+
+class CircuitBreaker:
+    """Per-city circuit breaker for cities that keep returning 404s or timing out"""
+    
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 3600):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._state: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+    
+    def allow(self, city: str) -> bool:
+        """Whether a request for the city may be attempted (closed or cooled down)"""
+        with self._lock:
+            state = self._state.get(city)
+            return state is None or state['open_until'] <= time.monotonic()
+    
+    def record_success(self, city: str):
+        with self._lock:
+            self._state.pop(city, None)
+    
+    def record_failure(self, city: str):
+        with self._lock:
+            state = self._state.setdefault(city, {'failures': 0, 'open_until': 0.0})
+            state['failures'] += 1
+            # After the cooldown a single further failure re-opens the circuit
+            if state['failures'] >= self.failure_threshold:
+                state['open_until'] = time.monotonic() + self.cooldown
+                logger.warning(f"⚠️ Circuit open for {city} after {state['failures']} failures, "
+                               f"skipping for {self.cooldown:.0f}s")
+    
+    def trip(self, city: str):
+        """Open the circuit immediately (e.g. the city does not exist)"""
+        with self._lock:
+            self._state[city] = {'failures': self.failure_threshold, 'open_until': time.monotonic() + self.cooldown}
+        logger.warning(f"⚠️ Circuit open for {city}, skipping for {self.cooldown:.0f}s")
+    
+    def open_cities(self) -> List[str]:
+        """Cities currently being skipped"""
+        now = time.monotonic()
+        with self._lock:
+            return [city for city, state in self._state.items() if state['open_until'] > now]
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(retry_at.tzinfo)).total_seconds())
+
+# Responses meaning the API key itself is rejected (as opposed to throttling or server errors)
+AUTH_FAILURE_STATUSES = (401, 403)
+
 class WeatherDataCollector:
     """Collect weather data from OpenWeatherMap API or generate sample data"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    # API key health shared by all collectors in the process: api_key -> (valid, checked_at)
+    _api_health: Dict[str, Tuple[bool, float]] = {}
+    
+    def __init__(self, api_key: Optional[str] = None, rate_controller: Optional[RateController] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None, max_retries: int = 3,
+                 api_health_ttl: float = 300, api_root: str = "http://api.openweathermap.org",
+                 forecast_ttl: float = 1800):
         # Load API key from environment if not provided
         self.api_key = api_key or os.getenv('OPENWEATHER_API_KEY')
-        self.base_url = "http://api.openweathermap.org/data/2.5"
+        self.api_root = api_root
+        self.base_url = f"{api_root}/data/2.5"
+        self._coordinates: Dict[str, Tuple[float, float]] = {}
+        self.rate_controller = rate_controller or RateController()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.api_health_ttl = api_health_ttl
+        # Forecasts are only re-issued every few hours: city -> (fetched_at, issue time, points)
+        self.forecast_ttl = forecast_ttl
+        self._forecasts: Dict[str, Tuple[float, pd.Timestamp, List[Dict]]] = {}
+    
+    def _set_api_health(self, valid: bool):
+        if self.api_key:
+            WeatherDataCollector._api_health[self.api_key] = (valid, time.monotonic())
+    
+    def key_rejected(self) -> bool:
+        """Whether the API rejected this key within the last api_health_ttl seconds (no request made)"""
+        cached = WeatherDataCollector._api_health.get(self.api_key)
+        return bool(cached) and not cached[0] and time.monotonic() - cached[1] < self.api_health_ttl
     
-    def test_api_connection(self) -> bool:
-        """Test if the API key is valid"""
+    def test_api_connection(self, force: bool = False) -> bool:
+        """Test if the API key is valid (cached for api_health_ttl seconds)"""
         if not self.api_key:
             return False
-            
+        
+        cached = WeatherDataCollector._api_health.get(self.api_key)
+        if cached and not force and time.monotonic() - cached[1] < self.api_health_ttl:
+            return cached[0]
+        
         try:
             # Test with a simple city
-            response = requests.get(
+            self._request(
                 f"{self.base_url}/weather",
                 params={'q': 'London', 'appid': self.api_key, 'units': 'metric'},
                 timeout=5
             )
-            return response.status_code == 200
-        except:
+            return True
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code in AUTH_FAILURE_STATUSES:
+                self._set_api_health(False)
+            # Throttling (429 after retries) and server errors say nothing about the key; don't cache them
             return False
+        except requests.exceptions.RequestException:
+            # Network problems say nothing about the key; don't cache them
+            return False
+    
+    def _request(self, url: str, params: Dict, city: Optional[str] = None, timeout: float = 10) -> Dict:
+        """GET a JSON endpoint with adaptive rate control and per-city circuit breaking"""
+        if city and not self.circuit_breaker.allow(city):
+            raise CircuitOpenError(f"Skipping {city}: circuit open after repeated failures")
         
+        for attempt in range(self.max_retries + 1):
+            self.rate_controller.acquire()
+            try:
+                with span('collector.http'):
+                    response = requests.get(url, params=params, timeout=timeout)
+            except requests.exceptions.Timeout:
+                increment('http_requests', status='timeout')
+                if city:
+                    self.circuit_breaker.record_failure(city)
+                raise
+            increment('http_requests', status=response.status_code)
+            
+            if response.status_code == 429 and attempt < self.max_retries:
+                self.rate_controller.record_throttle(_parse_retry_after(response.headers.get('Retry-After')))
+                continue
+            
+            if response.status_code in AUTH_FAILURE_STATUSES:
+                self._set_api_health(False)
+            elif response.status_code == 404 and city:
+                self.circuit_breaker.record_failure(city)
+            response.raise_for_status()
+            
+            self.rate_controller.record_success()
+            self._set_api_health(True)
+            if city:
+                self.circuit_breaker.record_success(city)
+            return response.json()
+    
     def fetch_current_weather(self, city: str) -> Dict:
         """Fetch current weather data for a city - API ONLY"""
         if not self.api_key:
             raise ValueError(f"❌ No API key provided. Cannot fetch data for {city}")
-            
+        
         url = f"{self.base_url}/weather"
         params = {
-            'q': city,
             'appid': self.api_key,
             'units': 'metric'
         }
+        # Numeric entries are OpenWeatherMap city IDs, anything else is a city name
+        if city.isdigit():
+            params['id'] = city
+        else:
+            params['q'] = city
         
         try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self._request(url, params, city=city)
+            
+            # Every response carries the station's coordinates; keep them so later lookups need no geocoding
+            coord = data.get('coord', {})
+            if 'lat' in coord and 'lon' in coord:
+                self._coordinates[city] = (coord['lat'], coord['lon'])
             
             logger.info(f"✅ Real API data fetched for {city}")
             return {
-                'city': city,
+                'city': data.get('name', city) if city.isdigit() else city,
                 'temperature': data['main']['temp'],
                 'humidity': data['main']['humidity'],
                 'rainfall': data.get('rain', {}).get('1h', 0),  # mm in last hour
                 'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'lat': coord.get('lat'),
+                'lon': coord.get('lon'),
                 'source': 'api'  # Mark as real API data
             }
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ API failed for {city}: {str(e)}")
             raise ConnectionError(f"Failed to fetch weather data for {city}: {str(e)}")
     
-
+    def geocode_city(self, city: str) -> Tuple[float, float]:
+        """Look up (lat, lon) for a city name (cached per collector)"""
+        if city not in self._coordinates:
+            results = self._request(
+                f"{self.api_root}/geo/1.0/direct",
+                params={'q': city, 'limit': 1, 'appid': self.api_key},
+                city=city
+            )
+            if not results:
+                self.circuit_breaker.trip(city)
+                raise ConnectionError(f"City not found: {city}")
+            self._coordinates[city] = (results[0]['lat'], results[0]['lon'])
+        return self._coordinates[city]
     
-    def collect_current_weather_all_cities(self, cities: List[str]) -> pd.DataFrame:
-        """Collect current weather data for all cities from API - API ONLY"""
+    def fetch_historical_weather(self, city: str, date: str) -> Dict:
+        """Fetch the daily summary for a past date (One Call 3.0 day_summary) - API ONLY"""
+        if not self.api_key:
+            raise ValueError(f"❌ No API key provided. Cannot fetch historical data for {city}")
+        
+        try:
+            lat, lon = self.geocode_city(city)
+            data = self._request(
+                f"{self.api_root}/data/3.0/onecall/day_summary",
+                params={'lat': lat, 'lon': lon, 'date': date, 'appid': self.api_key, 'units': 'metric'},
+                city=city
+            )
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ Historical API failed for {city} on {date}: {str(e)}")
+            raise ConnectionError(f"Failed to fetch historical weather for {city} on {date}: {str(e)}")
+        
+        temperatures = data['temperature']
+        return {
+            'city': city,
+            'temperature': round(float(np.mean([temperatures[part] for part in ('morning', 'afternoon', 'evening', 'night')])), 1),
+            'humidity': data['humidity']['afternoon'],
+            'rainfall': data.get('precipitation', {}).get('total', 0),
+            'date': date,
+            'lat': lat,
+            'lon': lon,
+            'source': 'api_backfill'  # Real historical API data
+        }
+    
+    def collect_current_weather_all_cities(self, cities: List[str], time_budget: Optional[float] = None) -> pd.DataFrame:
+        """Collect current weather data for all cities from API - API ONLY
+        
+        Cities whose circuit breaker is open are skipped without a request.
+        With a time budget (seconds), collection stops once it is used up.
+        """
         if not self.api_key:
             raise ValueError("❌ No API key provided. Cannot collect current weather data")
         
         current_data = []
         failed_cities = []
+        skipped_cities = []
+        deadline = time.monotonic() + time_budget if time_budget else None
         
         logger.info("🌤️ Fetching current weather data from API...")
         
-        for city in cities:
+        for i, city in enumerate(cities):
+            if deadline and time.monotonic() >= deadline:
+                logger.warning(f"⚠️ Time budget exhausted, {len(cities) - i} cities not fetched")
+                break
+            
+            # A rejected key fails for every city; don't spend the budget proving it
+            if self.key_rejected():
+                logger.error(f"❌ API key rejected, {len(cities) - i} cities not fetched")
+                break
+            
+            if not self.circuit_breaker.allow(city):
+                skipped_cities.append(city)
+                continue
+            
             try:
                 weather_data = self.fetch_current_weather(city)
                 current_data.append(weather_data)
-                
-                # Small delay to be respectful to API
-                time.sleep(0.2)
             except Exception as e:
                 logger.error(f"❌ Failed to fetch data for {city}: {e}")
                 failed_cities.append(city)
@@ -99,8 +333,106 @@ class WeatherDataCollector:
         if failed_cities:
             logger.warning(f"⚠️ Failed to fetch data for cities: {', '.join(failed_cities)}")
         
+        if skipped_cities:
+            logger.info(f"Skipped cities with open circuit: {', '.join(skipped_cities)}")
+        
+        increment('rows_processed', len(current_data), stage='collector')
         return pd.DataFrame(current_data)
     
+    def fetch_forecast(self, city: str) -> List[Dict]:
+        """Fetch the 5-day/3-hour forecast for a city (cached for forecast_ttl seconds) - API ONLY
+        
+        Returns one point per 3-hour step with its issue time (the fetch time
+        floored to 3 hours) and valid time. Both are computed in UTC, where
+        the forecast steps fall, and returned as naive local times like
+        observation dates.
+        """
+        if not self.api_key:
+            raise ValueError(f"❌ No API key provided. Cannot fetch forecast for {city}")
+        
+        issued = issue_time(pd.Timestamp.now(tz='UTC'))
+        cached = self._forecasts.get(city)
+        # A new forecast run also invalidates the cache, so issue times are never mislabelled
+        if cached and time.monotonic() - cached[0] < self.forecast_ttl and cached[1] == issued:
+            increment('forecast_cache', result='hit')
+            return cached[2]
+        
+        params = {'appid': self.api_key, 'units': 'metric'}
+        if city.isdigit():
+            params['id'] = city
+        else:
+            params['q'] = city
+        try:
+            data = self._request(f"{self.base_url}/forecast", params, city=city)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ Forecast API failed for {city}: {str(e)}")
+            raise ConnectionError(f"Failed to fetch forecast for {city}: {str(e)}")
+        
+        coord = data.get('city', {}).get('coord', {})
+        if 'lat' in coord and 'lon' in coord:
+            self._coordinates[city] = (coord['lat'], coord['lon'])
+        
+        name = data.get('city', {}).get('name', city) if city.isdigit() else city
+        entries = data.get('list', [])
+        valid_times = to_local(pd.to_datetime([entry['dt'] for entry in entries], unit='s', utc=True))
+        points = [{
+            'city': name,
+            'issue_time': to_local(issued),
+            'valid_time': valid_time,
+            'temperature': entry['main']['temp'],
+            'humidity': entry['main']['humidity'],
+            'rainfall': entry.get('rain', {}).get('3h', 0)  # mm over the 3 hours
+        } for entry, valid_time in zip(entries, valid_times)]
+        self._forecasts[city] = (time.monotonic(), issued, points)
+        increment('forecast_cache', result='miss')
+        return points
+    
+    def collect_forecasts(self, cities: List[str], time_budget: Optional[float] = None) -> pd.DataFrame:
+        """Collect forecasts for all cities in one pass (FORECAST_COLUMNS) - API ONLY
+        
+        Cities with a cached forecast cost no request; cities whose circuit
+        breaker is open are skipped, and with a time budget (seconds)
+        collection stops once it is used up.
+        """
+        if not self.api_key:
+            raise ValueError("❌ No API key provided. Cannot collect forecasts")
+        
+        points = []
+        failed_cities = []
+        skipped_cities = []
+        deadline = time.monotonic() + time_budget if time_budget else None
+        
+        for i, city in enumerate(cities):
+            if deadline and time.monotonic() >= deadline:
+                logger.warning(f"⚠️ Time budget exhausted, {len(cities) - i} forecasts not fetched")
+                break
+            
+            if self.key_rejected():
+                logger.error(f"❌ API key rejected, {len(cities) - i} forecasts not fetched")
+                break
+            
+            if not self.circuit_breaker.allow(city):
+                skipped_cities.append(city)
+                continue
+            
+            try:
+                points.extend(self.fetch_forecast(city))
+            except Exception as e:
+                logger.error(f"❌ Failed to fetch forecast for {city}: {e}")
+                failed_cities.append(city)
+        
+        if not points:
+            raise ConnectionError("❌ Failed to fetch forecasts for any city. Please check your API key and internet connection")
+        
+        if failed_cities:
+            logger.warning(f"⚠️ Failed to fetch forecasts for cities: {', '.join(failed_cities)}")
+        
+        if skipped_cities:
+            logger.info(f"Skipped cities with open circuit: {', '.join(skipped_cities)}")
+        
+        increment('rows_processed', len(points), stage='forecast')
+        return pd.DataFrame(points, columns=FORECAST_COLUMNS)
+    
     def collect_historical_data(self, cities: List[str], days: int = 30) -> pd.DataFrame:
         """Collect historical weather data - API ONLY"""
         if not self.api_key:
@@ -110,7 +442,15 @@ class WeatherDataCollector:
         
         logger.info("🔄 Fetching current weather data from API to generate historical data...")
         
-        for city in cities:
+        for i, city in enumerate(cities):
+            if self.key_rejected():
+                logger.error(f"❌ API key rejected, {len(cities) - i} cities not fetched")
+                break
+            
+            if not self.circuit_breaker.allow(city):
+                logger.info(f"Skipping {city}: circuit open after repeated failures")
+                continue
+            
             logger.info(f"Generating historical data for {city} based on API data...")
             
             try:
@@ -121,8 +461,8 @@ class WeatherDataCollector:
                 base_rainfall = current_weather['rainfall']
                 
                 # Generate historical variations based on real API data
-                for i in range(days):
-                    date = datetime.now() - timedelta(days=i)
+                for day in range(days):
+                    date = datetime.now() - timedelta(days=day)
                     
                     # Add realistic seasonal and daily variations
                     temp_variation = np.random.normal(0, 3)  # ±3°C variation
@@ -135,10 +475,12 @@ class WeatherDataCollector:
                         'humidity': round(max(min(base_humidity + humidity_variation, 100), 0), 1),
                         'rainfall': round(max(0, base_rainfall + rainfall_variation), 1),
                         'date': date.strftime('%Y-%m-%d'),
+                        'lat': current_weather['lat'],
+                        'lon': current_weather['lon'],
                         'source': 'api_derived'  # Based on real API data
                     }
                     data.append(weather_data)
-                    
+            
             except Exception as e:
                 logger.error(f"❌ Failed to fetch API data for {city}: {e}")
                 # Don't add any data if API fails - API ONLY mode
@@ -149,23 +491,20 @@ class WeatherDataCollector:
         
         df = pd.DataFrame(data)
         logger.info(f"✅ Generated {len(df)} historical data points from API data for {len(cities)} cities")
-        return self._clean_data(df)
+        return self.clean_data(df)
     
-    def _clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Clean and process the weather data"""
-        # Convert date to datetime
-        df['date'] = pd.to_datetime(df['date'])
-        
-        # Ensure numeric types
-        df['temperature'] = pd.to_numeric(df['temperature'], errors='coerce')
-        df['humidity'] = pd.to_numeric(df['humidity'], errors='coerce')
-        df['rainfall'] = pd.to_numeric(df['rainfall'], errors='coerce')
+    def clean_data(self, df: pd.DataFrame, quarantine: Optional[QuarantineStore] = None) -> pd.DataFrame:
+        """Clean and process the weather data
         
-        # Handle missing rainfall values (fill with 0)
-        df['rainfall'] = df['rainfall'].fillna(0)
-        
-        # Remove any rows with missing temperature or humidity
-        df = df.dropna(subset=['temperature', 'humidity'])
+        Rows failing validation (missing or implausible readings, bad dates,
+        duplicates) are dropped and, when a quarantine is given, kept there
+        with their reasons. The result is stamped as validated. This is the
+        entry point for callers that fetch rows themselves (e.g. backfills).
+        """
+        # One vectorized pass types the columns and checks every rule
+        df, rejected, _ = validate(df)
+        if quarantine is not None:
+            quarantine.append(rejected)
         
         # Add derived columns
         df['month'] = df['date'].dt.month
@@ -175,19 +514,37 @@ class WeatherDataCollector:
         # Sort by date
         df = df.sort_values('date').reset_index(drop=True)
         
+        increment('rows_processed', len(df), stage='clean')
         logger.info(f"Cleaned data: {len(df)} records for {df['city'].nunique()} cities")
         return df
     
+    def save_data(self, df: pd.DataFrame, filename: str = 'weather_data.csv', append: bool = False) -> WeatherDataStore:
+        """Save weather data and keep its daily/weekly/monthly/yearly rollups in sync"""
+        store = WeatherDataStore(filename)
+        
+        if append:
+            # Only the new rows are written (as a sealed segment) and folded into the rollups
+            store.append(df)
+        else:
+            store.write(df)
+        
+        return store
+    
     def generate_sample_csv(self, filename: str = 'sample_weather_data.csv', cities: List[str] = None, days: int = 90):
         """Generate a comprehensive sample CSV file"""
         if cities is None:
             cities = ['Bangkok', 'Tokyo', 'London', 'New York', 'Sydney', 'Mumbai']
         
         df = self.collect_historical_data(cities, days)
-        df.to_csv(filename, index=False)
+        self.save_data(df, filename)
         logger.info(f"Sample data saved to {filename}")
         return df
 
+def load_city_list(path: str) -> List[str]:
+    """Load city names or IDs from a file (one per line, '#' comments allowed)"""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
 if __name__ == "__main__":
     # Example usage
     collector = WeatherDataCollector()  # No API key = sample data
@@ -198,6 +555,6 @@ if __name__ == "__main__":
     print(f"Collected {len(df)} weather records")
     print(df.head())
     
-    # Save to CSV
-    df.to_csv('weather_data.csv', index=False)
-    print("Data saved to weather_data.csv")
\ No newline at end of file
+    # Save to CSV (rollups are written alongside)
+    collector.save_data(df, 'weather_data.csv')
+    print("Data saved to weather_data.csv")
@@ -6,6 +6,21 @@ from datetime import datetime, timedelta
 import os
 from weather_collector import WeatherDataCollector
 from weather_analyzer import WeatherAnalyzer
+from weather_store import WeatherDataStore
+from weather_service import LiveObservationCache
+from weather_figures import FigureCache
+from weather_sql import SQLiteWeatherBackend
+from weather_shared import get_shared_dataset
+from weather_validation import stamp
+from weather_render import as_built, render_png
+from weather_warmup import DEFAULT_CITY_COUNT, DEFAULT_SHOW_TREND, DEFAULT_TIME_AGGREGATION, QUERY_BACKEND, get_warmup
+import weather_metrics as metrics
+
+# Seconds between refreshes of the live conditions panel
+LIVE_REFRESH_SECONDS = float(os.getenv('WEATHER_LIVE_REFRESH', '30'))
+
+# Longest a session waits for a running warm-up before computing the view itself
+WARMUP_WAIT_SECONDS = float(os.getenv('WEATHER_WARMUP_WAIT', '60'))
 
 # Page configuration
 st.set_page_config(
@@ -305,40 +320,62 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def load_or_generate_data():
-    """Load existing data or generate new weather data"""
-    data_file = 'weather_data.csv'
+def ensure_data(data_file: str = 'weather_data.csv') -> WeatherDataStore:
+    """The dataset store, generated with API data on first use"""
+    store = WeatherDataStore(data_file)
     
-    if os.path.exists(data_file):
-        df = pd.read_csv(data_file)
-        df['date'] = pd.to_datetime(df['date'])
-        return df
-    else:
+    if not store.exists():
         # Generate new data with API if available
         collector = WeatherDataCollector()
         cities = ['Bangkok', 'Tokyo', 'London', 'New York', 'Sydney', 'Mumbai']
         df = collector.collect_historical_data(cities, days=90)
-        df.to_csv(data_file, index=False)
-        return df
-
-def get_current_weather_data():
-    """Fetch current weather data from API"""
-    collector = WeatherDataCollector()
-    if collector.api_key:
-        cities = ['Bangkok', 'Tokyo', 'London', 'New York', 'Sydney', 'Mumbai']
-        return collector.collect_current_weather_all_cities(cities)
-    return None
+        collector.save_data(df, data_file)
+    return store
 
-def main():
-    # Clean modern header
-    st.markdown("""
-    <div class="clean-header">
-        <h1>🌤️ Weather Dashboard</h1>
-        <p>Clean Weather Analytics & Insights</p>
-    </div>
-    """, unsafe_allow_html=True)
+@metrics.timed('dashboard.load_or_generate_data')
+def load_or_generate_data():
+    """Load existing data or generate new weather data"""
+    store = ensure_data()
     
-    # Simple API status
+    # Every session reads the same read-only, memory-mapped copy of the dataset
+    df = get_shared_dataset(store.data_file).frame()
+    metrics.increment('rows_processed', len(df), stage='load')
+    return df
+
+def load_rollups(df: pd.DataFrame):
+    """Rollups for the dataset (persisted, or in memory until compaction repairs them), loaded once per store version for all sessions"""
+    return get_warmup('weather_data.csv').rollups(df)
+
+@metrics.timed('dashboard.load_sql_backend')
+def load_sql_backend() -> SQLiteWeatherBackend:
+    """SQLite backend mirroring the dataset store, synced whenever the store version changes"""
+    ensure_data()
+    return get_warmup('weather_data.csv').sql_backend()
+
+def filtered_totals(df: pd.DataFrame) -> dict:
+    """Row count, date range, humidity range and rainfall totals of filtered rows (as SQLiteWeatherBackend.totals)"""
+    return {
+        'rows': len(df),
+        'start_date': df['date'].min(),
+        'end_date': df['date'].max(),
+        'humidity_min': df['humidity'].min(),
+        'humidity_max': df['humidity'].max(),
+        'rainfall_total': df['rainfall'].sum(),
+        'rainy_rows': int((df['rainfall'] > 0).sum())
+    }
+
+def get_figure_cache() -> FigureCache:
+    """Compacted, serialized chart figures shared by all sessions viewing the same data (pre-filled by the warm-up)"""
+    return get_warmup('weather_data.csv').figure_cache
+
+@st.cache_resource
+def get_live_cache() -> LiveObservationCache:
+    """One background-refreshed observation cache shared by all sessions"""
+    return LiveObservationCache(refresh_interval=LIVE_REFRESH_SECONDS)
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_weather_panel():
+    """API status and live conditions, re-rendered on their own every refresh interval"""
     collector = WeatherDataCollector()
     
     if collector.api_key:
@@ -347,32 +384,6 @@ def main():
             <strong>✅ API Connected</strong> • Key: {collector.api_key[:8]}...
         </div>
         """, unsafe_allow_html=True)
-        
-        # Enhanced refresh button
-        if st.button("🔄 Fetch Live Weather Data", type="primary", use_container_width=True):
-            with st.spinner("Fetching real-time weather data from API..."):
-                current_data = get_current_weather_data()
-                if current_data is not None and not current_data.empty:
-                    st.success("✅ Live weather data updated successfully!")
-                    
-                    # Display current weather in a nice format
-                    st.markdown("### 🌍 Current Weather Conditions")
-                    
-                    # Create metrics for current weather
-                    cols = st.columns(len(current_data))
-                    for idx, (_, row) in enumerate(current_data.iterrows()):
-                        with cols[idx]:
-                            st.metric(
-                                label=f"🏙️ {row['city']}",
-                                value=f"{row['temperature']:.1f}°C",
-                                delta=f"💧 {row['humidity']:.0f}% humidity"
-                            )
-                            if row['rainfall'] > 0:
-                                st.write(f"🌧️ {row['rainfall']:.1f}mm rain")
-                            else:
-                                st.write("☀️ No rain")
-                else:
-                    st.error("❌ Failed to fetch current weather data")
     else:
         st.markdown("""
         <div class="status-warning">
@@ -380,9 +391,303 @@ def main():
         </div>
         """, unsafe_allow_html=True)
     
+    # Never blocks: shows the cached values while a background refresh runs
+    live = get_live_cache().get()
+    current_data = live['observations']
+    if current_data is None or current_data.empty:
+        if live['refreshing']:
+            st.info("📡 Fetching latest observations...")
+        else:
+            st.info("📡 No live observations available yet. Start the collector service with `python weather_service.py`.")
+        return
+    
+    health = live['health']
+    last_observed = current_data['date'].max()
+    if live['source'] == 'api':
+        st.success(f"✅ Live from API • Last observation: {last_observed:%Y-%m-%d %H:%M:%S}")
+    elif health and health.get('running'):
+        lag = health.get('max_lag_seconds') or 0
+        st.success(f"✅ Collector running • Last observation: {last_observed:%Y-%m-%d %H:%M:%S} • Max lag: {lag:.1f}s")
+    else:
+        st.warning(f"⚠️ Collector service not running • Showing observations from {last_observed:%Y-%m-%d %H:%M:%S}")
+    
+    # Display current weather in a nice format
+    st.markdown("### 🌍 Current Weather Conditions")
+    st.caption(f"Updated {live['age_seconds']:.0f}s ago • refreshes every {LIVE_REFRESH_SECONDS:g}s"
+               + (" • refreshing..." if live['refreshing'] else ""))
+    
+    # Create metrics for current weather
+    cols = st.columns(len(current_data))
+    for idx, (_, row) in enumerate(current_data.iterrows()):
+        with cols[idx]:
+            st.metric(
+                label=f"🏙️ {row['city']}",
+                value=f"{row['temperature']:.1f}°C",
+                delta=f"💧 {row['humidity']:.0f}% humidity"
+            )
+            if row['rainfall'] > 0:
+                st.write(f"🌧️ {row['rainfall']:.1f}mm rain")
+            else:
+                st.write("☀️ No rain")
+
+def filter_form(overview: dict):
+    """City and date filters, applied together when the form is submitted"""
+    with st.form("filters", border=False):
+        filter_col1, filter_col2, filter_col3 = st.columns([2, 2, 1])
+        
+        with filter_col1:
+            # City selection
+            available_cities = overview['cities']
+            selected_cities = st.multiselect(
+                "Select Cities for Analysis:",
+                available_cities,
+                default=available_cities[:DEFAULT_CITY_COUNT],
+                help="Choose which cities to include in the analysis"
+            )
+        
+        with filter_col2:
+            # Date range selection
+            min_date = pd.Timestamp(overview['start_date']).date()
+            max_date = pd.Timestamp(overview['end_date']).date()
+            
+            date_range = st.date_input(
+                "Select Date Range:",
+                value=(min_date, max_date),
+                min_value=min_date,
+                max_value=max_date,
+                help="Filter data by date range"
+            )
+        
+        with filter_col3:
+            st.form_submit_button("Apply Filters", type="primary", use_container_width=True)
+    
+    return selected_cities, date_range
+
+@st.fragment
+def analytics_panel(analyzer: WeatherAnalyzer, selected_cities: list):
+    """Chart controls and chart tabs; only the selected tab's charts are computed"""
+    # Chart control panel
+    chart_col1, chart_col2, chart_col3 = st.columns([2, 2, 1])
+    
+    with chart_col1:
+        chart_type = st.selectbox(
+            "Chart Display Mode:",
+            ["Interactive", "Static", "Both"],
+            help="Choose how to display the charts"
+        )
+    
+    with chart_col2:
+        # Hourly views are offered when there are several observations per day
+        aggregations = (["Hourly"] if analyzer.sub_daily else []) + ["Daily", "Weekly", "Monthly"]
+        time_aggregation = st.selectbox(
+            "Time Aggregation:",
+            aggregations,
+            index=aggregations.index(DEFAULT_TIME_AGGREGATION),
+            help="How to group the time-series data"
+        )
+    
+    with chart_col3:
+        show_trend = st.checkbox("Show Trend Lines", value=DEFAULT_SHOW_TREND)
+    
+    # Switching tabs reruns this fragment, so hidden tabs are never computed
+    tab1, tab2, tab3 = st.tabs(
+        ["🌡️ Temperature", "💧 Rainfall & Humidity", "🏙️ City Analysis"],
+        key="chart_tab",
+        on_change="rerun"
+    )
+    
+    if tab1.open:
+        with tab1:
+            temperature_tab(analyzer, selected_cities, chart_type, time_aggregation, show_trend)
+    
+    if tab2.open:
+        with tab2:
+            rainfall_tab(analyzer, chart_type, time_aggregation)
+    
+    if tab3.open:
+        with tab3:
+            city_analysis_tab(analyzer, selected_cities, chart_type, time_aggregation)
+
+def render_charts(builders: dict, slots: dict):
+    """Build charts concurrently and draw each into its slot (a container) as soon as it completes
+    
+    Builders return a Plotly figure dict or pre-rendered PNG bytes of a
+    static chart; the slots keep the page order independent of which
+    chart finishes first.
+    """
+    for name, chart in as_built(builders):
+        with slots[name]:
+            if isinstance(chart, bytes):
+                st.image(chart, use_container_width=True)
+            else:
+                st.plotly_chart(chart, use_container_width=True)
+
+def chart_slots(chart_type: str, static_label: bool = True) -> dict:
+    """Containers for the interactive and static charts of a tab, in display order"""
+    slots = {}
+    if chart_type in ["Interactive", "Both"]:
+        slots['interactive'] = st.container()
+    if chart_type in ["Static", "Both"]:
+        slots['static'] = st.container()
+        if static_label:
+            slots['static'].markdown("**Static View:**")
+    return slots
+
+@st.fragment
+def temperature_tab(analyzer: WeatherAnalyzer, selected_cities: list, chart_type: str,
+                    time_aggregation: str, show_trend: bool):
+    if selected_cities:
+        slots = chart_slots(chart_type)
+        builders = {
+            'interactive': lambda: get_figure_cache().figure(
+                analyzer, 'create_temperature_line_chart',
+                cities=selected_cities,
+                time_aggregation=time_aggregation,
+                show_trend=show_trend
+            ),
+            'static': lambda: render_png(analyzer.create_static_temperature_chart(
+                cities=selected_cities,
+                time_aggregation=time_aggregation
+            ))
+        }
+        render_charts({name: build for name, build in builders.items() if name in slots}, slots)
+    else:
+        st.info("📊 Select cities and ensure data is available to view temperature charts.")
+
+@st.fragment
+def rainfall_tab(analyzer: WeatherAnalyzer, chart_type: str, time_aggregation: str):
+    slots = chart_slots(chart_type, static_label=chart_type == "Both")
+    builders = {
+        'interactive': lambda: get_figure_cache().figure(
+            analyzer, 'create_rainfall_bar_chart', time_aggregation=time_aggregation
+        ),
+        'static': lambda: render_png(analyzer.create_static_rainfall_chart(time_aggregation=time_aggregation))
+    }
+    render_charts({name: build for name, build in builders.items() if name in slots}, slots)
+
+@st.fragment
+def city_analysis_tab(analyzer: WeatherAnalyzer, selected_cities: list, chart_type: str, time_aggregation: str):
+    if not selected_cities:
+        st.info("📊 Select cities and ensure data is available to view scatter plots.")
+        return
+    
+    slots = chart_slots(chart_type, static_label=chart_type == "Both")
+    builders = {
+        'interactive': lambda: get_figure_cache().figure(
+            analyzer, 'create_humidity_temperature_scatter',
+            cities=selected_cities,
+            time_aggregation=time_aggregation
+        ),
+        'static': lambda: render_png(analyzer.create_static_humidity_scatter(
+            cities=selected_cities,
+            time_aggregation=time_aggregation
+        ))
+    }
+    builders = {name: build for name, build in builders.items() if name in slots}
+    
+    # Simple stats table
+    st.markdown("### 📈 City Statistics Summary")
+    city_stats = analyzer.df.groupby('city').agg({
+        'temperature': 'mean',
+        'humidity': 'mean',
+        'rainfall': 'sum'
+    }).round(1)
+    st.dataframe(city_stats, use_container_width=True)
+    
+    # Calendar heatmap
+    st.markdown("### 📅 Calendar Heatmap")
+    cal_col1, cal_col2, cal_col3 = st.columns(3)
+    
+    with cal_col1:
+        calendar_city = st.selectbox("City:", selected_cities)
+    
+    with cal_col2:
+        calendar_metric = st.selectbox(
+            "Metric:",
+            ["temperature", "rainfall"],
+            format_func=str.title
+        )
+    
+    with cal_col3:
+        calendar_layout = st.selectbox(
+            "Layout:",
+            ["year", "week"],
+            format_func=lambda layout: "Day of Year × Year" if layout == "year" else "Week × Weekday"
+        )
+    
+    slots['calendar'] = st.container()
+    builders['calendar'] = lambda: get_figure_cache().figure(
+        analyzer, 'create_calendar_heatmap',
+        city=calendar_city,
+        metric=calendar_metric,
+        layout=calendar_layout
+    )
+    
+    # The scatter charts and the heatmap are built together once every control above is read
+    render_charts(builders, slots)
+
+def debug_panel():
+    """Timing spans, counters and chart payload sizes recorded in this process (WEATHER_METRICS=1)"""
+    with st.expander("🛠️ Debug: timings and counters", expanded=False):
+        spans = metrics.registry.spans()
+        if spans:
+            span_table = pd.DataFrame.from_dict(spans, orient='index')
+            timings = pd.DataFrame({
+                'calls': span_table['count'],
+                'total_ms': span_table['seconds'] * 1000,
+                'mean_ms': span_table['seconds'] / span_table['count'] * 1000,
+                'max_ms': span_table['max_seconds'] * 1000,
+                'last_ms': span_table['last_seconds'] * 1000
+            })
+            if 'allocated_bytes' in span_table:
+                timings['allocated_mb'] = span_table['allocated_bytes'] / 1024 / 1024
+            st.dataframe(timings.sort_values('total_ms', ascending=False).round(2))
+        
+        counters = metrics.registry.counters()
+        if counters:
+            st.dataframe(pd.Series(counters, name='value').to_frame())
+        
+        warmup = get_warmup('weather_data.csv').status()
+        st.caption(f"Warm-up: {warmup['state']}" + (f" in {warmup['seconds']:.2f}s" if warmup['seconds'] is not None else ""))
+        st.dataframe(pd.DataFrame.from_dict(warmup['steps'], orient='index'))
+        
+        payloads = get_figure_cache().payload_report()
+        if payloads:
+            st.dataframe(pd.DataFrame.from_dict(payloads, orient='index'))
+        
+        st.download_button("Download metrics (Prometheus text)", metrics.registry.render_prometheus(),
+                           file_name='weather_metrics.prom', mime='text/plain')
+
+def main():
+    # Clean modern header
+    st.markdown("""
+    <div class="clean-header">
+        <h1>🌤️ Weather Dashboard</h1>
+        <p>Clean Weather Analytics & Insights</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Live conditions rerun on their own, without recomputing the analytics below
+    live_weather_panel()
+    
+    # Started at server start by weather_app.py; otherwise the first session starts it
+    warmup = get_warmup('weather_data.csv').start()
+    if not warmup.finished:
+        # Let the warm-up finish the default view rather than computing it twice
+        with st.spinner("Warming up caches..."):
+            warmup.wait(WARMUP_WAIT_SECONDS)
+    
     # Load data
     with st.spinner("Loading weather data..."):
-        df = load_or_generate_data()
+        # Overview figures come from the snapshot header (or SQL) and rollups, not from scanning rows
+        if QUERY_BACKEND == 'sqlite':
+            # Only aggregated rows leave SQLite
+            rollups = load_sql_backend()
+            overview = rollups.overview()
+        else:
+            rollups = load_rollups(load_or_generate_data())
+            overview = get_shared_dataset('weather_data.csv').header()
+        yearly = rollups.query_raw('Yearly')
     
     # Clean overview section
     st.markdown('<div class="section-title">📊 Dataset Overview</div>', unsafe_allow_html=True)
@@ -398,10 +703,10 @@ def main():
                 <div class="metric-label">Total Records</div>
             </div>
         </div>
-        """.format(len(df)), unsafe_allow_html=True)
+        """.format(overview['rows']), unsafe_allow_html=True)
     
     with col2:
-        cities_count = df['city'].nunique()
+        cities_count = len(overview['cities'])
         st.markdown("""
         <div class="simple-card">
             <div class="metric-display">
@@ -412,7 +717,7 @@ def main():
         """.format(cities_count), unsafe_allow_html=True)
     
     with col3:
-        date_range = (df['date'].max() - df['date'].min()).days
+        date_range = (pd.Timestamp(overview['end_date']) - pd.Timestamp(overview['start_date'])).days
         st.markdown("""
         <div class="simple-card">
             <div class="metric-display">
@@ -423,7 +728,7 @@ def main():
         """.format(date_range), unsafe_allow_html=True)
     
     with col4:
-        temp_avg = df['temperature'].mean()
+        temp_avg = yearly['temperature_sum'].sum() / yearly['temperature_count'].sum()
         st.markdown("""
         <div class="simple-card">
             <div class="metric-display">
@@ -433,64 +738,45 @@ def main():
         </div>
         """.format(temp_avg), unsafe_allow_html=True)
     
-    # Initialize analyzer with full dataset
-    analyzer = WeatherAnalyzer(df)
-    
     # Section divider
     st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
     
     # Data Filtering Section
     st.markdown('<h2 class="section-header">🔍 Data Filters & Analysis</h2>', unsafe_allow_html=True)
     
-    # Create filter columns for better layout
-    filter_col1, filter_col2, filter_col3 = st.columns([2, 2, 1])
-    
-    with filter_col1:
-        # City selection
-        available_cities = df['city'].unique().tolist()
-        selected_cities = st.multiselect(
-            "Select Cities for Analysis:",
-            available_cities,
-            default=available_cities[:3],
-            help="Choose which cities to include in the analysis"
-        )
-    
-    with filter_col2:
-        # Date range selection
-        min_date = df['date'].min().date()
-        max_date = df['date'].max().date()
-        
-        date_range = st.date_input(
-            "Select Date Range:",
-            value=(min_date, max_date),
-            min_value=min_date,
-            max_value=max_date,
-            help="Filter data by date range"
-        )
-    
-    with filter_col3:
-        # Apply filters button for better UX
-        apply_filters = st.button("Apply Filters", type="primary", use_container_width=True)
+    # Filters are only committed when the form is submitted
+    selected_cities, date_range = filter_form(overview)
+    min_date = pd.Timestamp(overview['start_date']).date()
+    max_date = pd.Timestamp(overview['end_date']).date()
     
     # Filter data based on selections
-    filtered_df = df.copy()
-    
-    if selected_cities:
-        filtered_df = filtered_df[filtered_df['city'].isin(selected_cities)]
-    
-    if len(date_range) == 2:
-        start_date, end_date = date_range
-        filtered_df = filtered_df[
-            (filtered_df['date'].dt.date >= start_date) & 
-            (filtered_df['date'].dt.date <= end_date)
-        ]
+    with metrics.span('dashboard.filter'):
+        if QUERY_BACKEND == 'sqlite':
+            # Filtering and aggregations are pushed down to SQLite
+            start_date, end_date = date_range if len(date_range) == 2 else (min_date, max_date)
+            filtered_rollups = rollups.view(selected_cities, start_date, end_date)
+            # Charts are drawn from the daily aggregates; metrics come from SQL aggregations over the raw rows
+            filtered_df = stamp(filtered_rollups.query('Daily'))
+            stats = filtered_rollups.calculate_summary_statistics()
+            totals = filtered_rollups.totals()
+        else:
+            start_date, end_date = date_range if len(date_range) == 2 else (None, None)
+            full_range = start_date is None or (start_date <= min_date and end_date >= max_date)
+            # Only the matching rows are copied out of the shared dataset
+            filtered_df = get_shared_dataset('weather_data.csv').view(selected_cities, start_date, end_date)
+            
+            # Persisted rollups only describe the full date range
+            filtered_rollups = rollups if full_range else None
+            stats = None
+            totals = filtered_totals(filtered_df)
+    metrics.increment('rows_processed', len(filtered_df), stage='filter')
     
-    # Update analyzer with filtered data
+    # Analyzer for the committed filters
     if not filtered_df.empty:
-        analyzer = WeatherAnalyzer(filtered_df)
+        analyzer = WeatherAnalyzer(filtered_df, rollups=filtered_rollups)
         
         # Show filter results
-        st.success(f"✅ Filtered data: {len(filtered_df):,} records from {len(selected_cities)} cities")
+        st.success(f"✅ Filtered data: {totals['rows']:,} records from {len(selected_cities)} cities")
     else:
         st.warning("⚠️ No data available for selected filters. Please adjust your selection.")
         return
@@ -498,7 +784,8 @@ def main():
     # Enhanced Key Metrics Section
     st.markdown('<h3 class="section-header">📊 Key Metrics</h3>', unsafe_allow_html=True)
     
-    stats = analyzer.calculate_summary_statistics()
+    if stats is None:
+        stats = analyzer.calculate_summary_statistics()
     
     # Create enhanced metric cards
     metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
@@ -513,31 +800,31 @@ def main():
         )
     
     with metric_col2:
-        humidity_range = filtered_df['humidity'].max() - filtered_df['humidity'].min()
+        humidity_range = totals['humidity_max'] - totals['humidity_min']
         st.metric(
             "Average Humidity",
             f"{stats['humidity_stats']['avg_humidity']}%",
             delta=f"Range: {humidity_range:.0f}%",
-            help=f"Min: {filtered_df['humidity'].min():.0f}%, Max: {filtered_df['humidity'].max():.0f}%"
+            help=f"Min: {totals['humidity_min']:.0f}%, Max: {totals['humidity_max']:.0f}%"
         )
     
     with metric_col3:
-        total_rainfall = filtered_df['rainfall'].sum()
-        rainy_days = (filtered_df['rainfall'] > 0).sum()
+        total_rainfall = totals['rainfall_total']
+        rainy_days = totals['rainy_rows']
         st.metric(
             "Total Rainfall",
             f"{total_rainfall:.1f}mm",
             delta=f"Rainy days: {rainy_days}",
-            help=f"Average per day: {total_rainfall/len(filtered_df):.2f}mm"
+            help=f"Average per day: {total_rainfall/totals['rows']:.2f}mm"
         )
     
     with metric_col4:
-        date_span = (filtered_df['date'].max() - filtered_df['date'].min()).days
+        date_span = (totals['end_date'] - totals['start_date']).days
         st.metric(
             "Dataset Span",
             f"{date_span} days",
             delta=f"{len(selected_cities)} cities",
-            help=f"Total records: {len(filtered_df):,}"
+            help=f"Total records: {totals['rows']:,}"
         )
     
     # Section divider
@@ -546,94 +833,11 @@ def main():
     # Clean charts section
     st.markdown('<div class="section-title">📈 Weather Analytics</div>', unsafe_allow_html=True)
     
-    # Chart control panel
-    chart_col1, chart_col2, chart_col3 = st.columns([2, 2, 1])
-    
-    with chart_col1:
-        chart_type = st.selectbox(
-            "Chart Display Mode:",
-            ["Interactive", "Static", "Both"],
-            help="Choose how to display the charts"
-        )
-    
-    with chart_col2:
-        time_aggregation = st.selectbox(
-            "Time Aggregation:",
-            ["Daily", "Weekly", "Monthly"],
-            help="How to group the time-series data"
-        )
-    
-    with chart_col3:
-        show_trend = st.checkbox("Show Trend Lines", value=True)
-    
-    # Simple chart tabs
-    tab1, tab2, tab3 = st.tabs(["🌡️ Temperature", "💧 Rainfall & Humidity", "🏙️ City Analysis"])
+    # Chart controls and tabs rerun as fragments; only the open tab is rendered
+    analytics_panel(analyzer, selected_cities)
     
-    with tab1:
-        if selected_cities and not filtered_df.empty:
-            temp_chart = analyzer.create_temperature_line_chart(
-                cities=selected_cities,
-                time_aggregation=time_aggregation,
-                show_trend=show_trend
-            )
-            
-            if chart_type in ["Interactive", "Both"]:
-                st.plotly_chart(temp_chart, use_container_width=True)
-            
-            if chart_type in ["Static", "Both"]:
-                st.markdown("**Static View:**")
-                fig_static = analyzer.create_static_temperature_chart(
-                    cities=selected_cities,
-                    time_aggregation=time_aggregation
-                )
-                st.pyplot(fig_static)
-        else:
-            st.info("📊 Select cities and ensure data is available to view temperature charts.")
-    
-    with tab2:
-        if not filtered_df.empty:
-            if chart_type in ["Interactive", "Both"]:
-                rainfall_chart = analyzer.create_rainfall_bar_chart(time_aggregation=time_aggregation)
-                st.plotly_chart(rainfall_chart, use_container_width=True)
-            
-            if chart_type in ["Static", "Both"]:
-                if chart_type == "Both":
-                    st.markdown("**Static View:**")
-                static_rainfall = analyzer.create_static_rainfall_chart(time_aggregation=time_aggregation)
-                st.pyplot(static_rainfall)
-        else:
-            st.info("📊 Ensure data is available to view rainfall charts.")
-
-    
-    with tab3:
-        if selected_cities and not filtered_df.empty:
-            if chart_type in ["Interactive", "Both"]:
-                humidity_scatter = analyzer.create_humidity_temperature_scatter(
-                    cities=selected_cities,
-                    time_aggregation=time_aggregation
-                )
-                st.plotly_chart(humidity_scatter, use_container_width=True)
-            
-            if chart_type in ["Static", "Both"]:
-                if chart_type == "Both":
-                    st.markdown("**Static View:**")
-                static_scatter = analyzer.create_static_humidity_scatter(
-                    cities=selected_cities,
-                    time_aggregation=time_aggregation
-                )
-                st.pyplot(static_scatter)
-        else:
-            st.info("📊 Select cities and ensure data is available to view scatter plots.")
-        
-        # Simple stats table
-        if selected_cities and not filtered_df.empty:
-            st.markdown("### 📈 City Statistics Summary")
-            city_stats = filtered_df.groupby('city').agg({
-                'temperature': 'mean',
-                'humidity': 'mean',
-                'rainfall': 'sum'
-            }).round(1)
-            st.dataframe(city_stats, use_container_width=True)
+    if metrics.ENABLED:
+        debug_panel()
     
     # Clean footer
     st.markdown(f"""
@@ -645,4 +849,4 @@ def main():
     """, unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,153 @@
+import pandas as pd
+import numpy as np
+import argparse
+import time
+from typing import Dict, Tuple
+from weather_rollups import ROLLUP_COLUMNS, METRICS, bucket_dates, compute_rollup
+
+# Category bins shared by every engine's export (right-inclusive, like pd.cut)
+CATEGORY_BINS = {
+    'temperature_category': ('temperature', [-np.inf, 10, 20, 30, np.inf], ['Cold', 'Cool', 'Warm', 'Hot']),
+    'humidity_category': ('humidity', [0, 30, 60, 80, 100], ['Low', 'Moderate', 'High', 'Very High']),
+    'rainfall_category': ('rainfall', [-0.1, 0, 2, 10, np.inf], ['None', 'Light', 'Moderate', 'Heavy'])
+}
+
+class PandasEngine:
+    """Default execution engine: single-threaded pandas groupby"""
+    
+    name = 'pandas'
+    
+    def prepare(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df
+    
+    def rollup(self, data: pd.DataFrame, granularity: str) -> pd.DataFrame:
+        return compute_rollup(data, granularity)
+    
+    def extreme_position(self, data: pd.DataFrame, column: str, how: str) -> int:
+        """Position of the first row holding the column's max/min"""
+        values = data[column].to_numpy()
+        return int(np.nanargmax(values) if how == 'max' else np.nanargmin(values))
+    
+    def categorize(self, df: pd.DataFrame) -> pd.DataFrame:
+        export_df = df.copy()
+        for name, (column, bins, labels) in CATEGORY_BINS.items():
+            export_df[name] = pd.cut(export_df[column], bins=bins, labels=labels)
+        return export_df
+
+class ArrowEngine:
+    """Multi-threaded columnar engine on Apache Arrow compute
+    
+    Group-by aggregations run on Arrow's thread pool (all cores by default,
+    see ``pyarrow.set_cpu_count``). The DataFrame is converted to an Arrow
+    table once per analyzer and reused for every query.
+    """
+    
+    name = 'arrow'
+    
+    # Arrow's temporal floor unit for each granularity; the final bucket label is
+    # derived from the (small) aggregated result with weather_rollups.bucket_dates
+    FLOOR_UNITS = {'Daily': 'day', 'Weekly': 'week', 'Monthly': 'month', 'Yearly': 'year'}
+    
+    def __init__(self):
+        import pyarrow
+        import pyarrow.compute
+        self.pa = pyarrow
+        self.pc = pyarrow.compute
+    
+    def prepare(self, df: pd.DataFrame):
+        columns = ['city', 'date'] + METRICS
+        return self.pa.Table.from_pandas(df[columns], preserve_index=False)
+    
+    def rollup(self, table, granularity: str) -> pd.DataFrame:
+        if table.num_rows == 0:
+            return pd.DataFrame(columns=ROLLUP_COLUMNS)
+        
+        bucket = self.pc.floor_temporal(table['date'], 1, self.FLOOR_UNITS[granularity],
+                                        week_starts_monday=True)
+        grouped = table.append_column('bucket', bucket).group_by(['city', 'bucket']).aggregate(
+            [(metric, agg) for metric in METRICS for agg in ('sum', 'count', 'min', 'max')]
+        )
+        
+        rollup = grouped.to_pandas()
+        rollup['date'] = bucket_dates(rollup['bucket'], granularity)
+        rollup = rollup.sort_values(['city', 'date']).reset_index(drop=True)
+        return rollup[ROLLUP_COLUMNS]
+    
+    def extreme_position(self, table, column: str, how: str) -> int:
+        extremes = self.pc.min_max(table[column])
+        return self.pc.index(table[column], extremes[how]).as_py()
+    
+    def categorize(self, df: pd.DataFrame) -> pd.DataFrame:
+        export_df = df.copy()
+        for name, (column, bins, labels) in CATEGORY_BINS.items():
+            # NaN becomes null and compares as below every edge
+            values = self.pa.array(export_df[column].to_numpy(dtype=np.float64), from_pandas=True)
+            # The number of edges below a value is its right-inclusive interval code plus one, like pd.cut
+            below = self.pa.array(np.zeros(len(values), dtype=np.int8))
+            for edge in bins:
+                above_edge = self.pc.fill_null(self.pc.greater(values, edge), False)
+                below = self.pc.add(below, self.pc.cast(above_edge, self.pa.int8()))
+            in_range = self.pc.and_(self.pc.greater(below, 0), self.pc.less(below, len(bins)))
+            codes = self.pc.if_else(in_range, self.pc.subtract(below, 1), -1)
+            export_df[name] = pd.Categorical.from_codes(codes.to_numpy(), categories=labels, ordered=True)
+        return export_df
+
+ENGINES = {
+    'pandas': PandasEngine,
+    'arrow': ArrowEngine
+}
+
+def get_engine(engine='pandas'):
+    """Resolve an engine name (or pass through an engine instance)"""
+    if not isinstance(engine, str):
+        return engine
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown execution engine: {engine}. Choose from {list(ENGINES)}")
+    return ENGINES[engine]()
+
+def compare_engines(df: pd.DataFrame, engines: Tuple[str, ...] = ('pandas', 'arrow')) -> Dict:
+    """Time the analyzer's aggregations and export on each engine and check results match pandas"""
+    from weather_analyzer import WeatherAnalyzer
+    
+    results = {}
+    reference = None
+    for name in engines:
+        analyzer = WeatherAnalyzer(df, engine=name)
+        start = time.perf_counter()
+        stats = analyzer.calculate_summary_statistics()
+        monthly = analyzer.rollups.query('Monthly')
+        weekly = analyzer.rollups.query('Weekly')
+        export = analyzer.engine.categorize(analyzer.df)
+        elapsed = time.perf_counter() - start
+        
+        if reference is None:
+            reference = (stats, monthly, weekly, export)
+        else:
+            ref_stats, ref_monthly, ref_weekly, ref_export = reference
+            pd.testing.assert_series_equal(stats['avg_temp_by_city'], ref_stats['avg_temp_by_city'])
+            pd.testing.assert_series_equal(stats['rainfall_by_month'], ref_stats['rainfall_by_month'])
+            pd.testing.assert_frame_equal(stats['city_statistics'], ref_stats['city_statistics'])
+            assert stats['temp_stats'] == ref_stats['temp_stats']
+            pd.testing.assert_frame_equal(monthly, ref_monthly, check_dtype=False)
+            pd.testing.assert_frame_equal(weekly, ref_weekly, check_dtype=False)
+            pd.testing.assert_frame_equal(export, ref_export)
+        results[name] = round(elapsed, 3)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare WeatherAnalyzer execution engines")
+    parser.add_argument('--cities', type=int, default=2000)
+    parser.add_argument('--years', type=int, default=10)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    days = pd.date_range('2015-01-01', periods=args.years * 365, freq='D')
+    n = len(days) * args.cities
+    df = pd.DataFrame({
+        'city': np.repeat([f'City{i:04d}' for i in range(args.cities)], len(days)),
+        'date': np.tile(days, args.cities),
+        'temperature': np.round(rng.normal(20, 8, n), 1),
+        'humidity': np.round(rng.uniform(10, 100, n), 1),
+        'rainfall': np.where(rng.random(n) < 0.3, np.round(rng.exponential(4, n), 1), 0.0)
+    })
+    print(f"{n:,} rows: {compare_engines(df)} (seconds, results match)")
@@ -0,0 +1,137 @@
+import pandas as pd
+import numpy as np
+import base64
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict
+import logging
+import plotly.graph_objects as go
+from plotly.io.json import to_json_plotly
+import weather_metrics
+from weather_metrics import increment
+
+logger = logging.getLogger(__name__)
+
+# Decimal places kept for plotted values (inputs are recorded to one decimal)
+DISPLAY_PRECISION = 2
+
+# Above this many points per figure, hover-only columns (customdata) are dropped
+HOVER_POINT_BUDGET = 5000
+
+# Hover template lines that show customdata columns
+_CUSTOMDATA_LINE = re.compile(r'(<br>)?[^<]*%\{customdata\[\d+\][^}]*\}')
+
+def _as_array(values) -> np.ndarray:
+    """NumPy view of a trace array, decoding Plotly's base64 typed-array form"""
+    if isinstance(values, dict) and 'bdata' in values:
+        array = np.frombuffer(base64.b64decode(values['bdata']), dtype=values['dtype'])
+        if 'shape' in values:
+            array = array.reshape([int(dim) for dim in str(values['shape']).split(',')])
+        return array
+    return np.asarray(values)
+
+def _compact_array(values, precision: int):
+    """Round numbers to display precision and shorten midnight timestamps to dates"""
+    array = _as_array(values)
+    if array.dtype.kind == 'f':
+        # Short decimal JSON numbers are smaller than base64-encoded float64 buffers
+        return np.round(array, precision).tolist()
+    if array.dtype.kind == 'M':
+        timestamps = pd.DatetimeIndex(array.ravel())
+        if (timestamps == timestamps.normalize()).all():
+            return timestamps.strftime('%Y-%m-%d').to_numpy().reshape(array.shape).tolist()
+    if array.dtype.kind == 'O' and array.ndim == 1 and len(array) and isinstance(array[0], pd.Timestamp):
+        return _compact_array(pd.DatetimeIndex(array).to_numpy(), precision)
+    return values
+
+def compact_figure(fig: go.Figure, precision: int = DISPLAY_PRECISION,
+                   hover_point_budget: int = HOVER_POINT_BUDGET) -> Dict:
+    """Plain figure dict with rounded values, short dates and hover data trimmed to the budget"""
+    figure = fig.to_plotly_json()
+    points = sum(len(_as_array(trace.get('x', trace.get('z', ())))) for trace in figure['data'])
+    trim_hover = points > hover_point_budget
+    
+    for trace in figure['data']:
+        for key in ('x', 'y', 'z'):
+            if key in trace and trace[key] is not None:
+                trace[key] = _compact_array(trace[key], precision)
+        marker = trace.get('marker') or {}
+        if 'size' in marker and not np.isscalar(marker['size']):
+            marker['size'] = _compact_array(marker['size'], precision)
+        
+        if 'customdata' in trace:
+            if trim_hover:
+                del trace['customdata']
+                if 'hovertemplate' in trace:
+                    trace['hovertemplate'] = _CUSTOMDATA_LINE.sub('', trace['hovertemplate'])
+            else:
+                customdata = _as_array(trace['customdata'])
+                if customdata.dtype.kind == 'f':
+                    trace['customdata'] = np.round(customdata, precision).tolist()
+    return figure
+
+def _freeze(value):
+    """Hashable form of a chart parameter"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+class FigureCache:
+    """Serialized Plotly figures keyed by (data fingerprint, chart function, parameters)
+    
+    Figures are compacted before serialization (see ``compact_figure``) and
+    kept as JSON in a bounded LRU, shared by every session that views the
+    same data. Payload sizes are recorded per chart as cached and, with
+    metrics enabled, as built (serializing the uncompacted figure again), so
+    chart payloads can be budgeted.
+    """
+    
+    def __init__(self, max_entries: int = 128, precision: int = DISPLAY_PRECISION,
+                 hover_point_budget: int = HOVER_POINT_BUDGET):
+        self.max_entries = max_entries
+        self.precision = precision
+        self.hover_point_budget = hover_point_budget
+        self._entries: 'OrderedDict[tuple, str]' = OrderedDict()
+        self._payloads: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+    
+    def figure(self, analyzer, chart: str, **params) -> Dict:
+        """Figure dict for ``analyzer.<chart>(**params)``, built only on a cache miss"""
+        key = (analyzer.fingerprint(), chart, _freeze(params))
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self._payloads[chart]['hits'] += 1
+                increment('cache_requests', cache='figures', result='hit')
+                return json.loads(payload)
+        
+        increment('cache_requests', cache='figures', result='miss')
+        fig = getattr(analyzer, chart)(**params)
+        payload = to_json_plotly(compact_figure(fig, self.precision, self.hover_point_budget))
+        # Measuring the figure as built costs a second serialization, so only when profiling
+        raw_bytes = len(fig.to_json()) if weather_metrics.ENABLED else None
+        
+        with self._lock:
+            self._entries[key] = payload
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            stats = self._payloads.setdefault(chart, {'hits': 0, 'misses': 0})
+            stats['misses'] += 1
+            stats['bytes'] = len(payload)
+            if raw_bytes is not None:
+                stats['raw_bytes'] = raw_bytes
+        if raw_bytes is not None:
+            logger.info(f"Figure {chart}: {raw_bytes / 1024:.1f} KB built, {len(payload) / 1024:.1f} KB sent")
+        else:
+            logger.info(f"Figure {chart}: {len(payload) / 1024:.1f} KB sent")
+        return json.loads(payload)
+    
+    def payload_report(self) -> Dict[str, Dict]:
+        """Latest payload size (as sent, and as built with metrics enabled) and hit/miss counts per chart"""
+        with self._lock:
+            return {chart: dict(stats) for chart, stats in self._payloads.items()}
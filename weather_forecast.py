@@ -0,0 +1,292 @@
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import os
+import shutil
+import time
+from dateutil.tz import tzlocal
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Forecast points are 3 hours apart and reach 5 days ahead: leads 0, 3h, ..., 120h
+LEAD_STEP = pd.Timedelta(hours=3)
+MAX_LEAD = pd.Timedelta(days=5)
+N_LEADS = int(MAX_LEAD / LEAD_STEP) + 1
+
+FORECAST_METRICS = ['temperature', 'humidity', 'rainfall']
+
+# Forecast points as returned by WeatherDataCollector.collect_forecasts
+FORECAST_COLUMNS = ['city', 'issue_time', 'valid_time'] + FORECAST_METRICS
+
+_STEP_NS = LEAD_STEP.value
+
+def issue_time(timestamp) -> pd.Timestamp:
+    """The forecast run a fetch belongs to: its time floored to the 3-hour step
+    
+    Fetches within one step return the same forecast, so they share an issue
+    time (and a slot in the store). Pass UTC times: forecast steps are on
+    UTC 3-hour boundaries, which are not local ones under offsets such as
+    +05:30.
+    """
+    return pd.Timestamp(timestamp).floor(LEAD_STEP)
+
+def to_local(timestamps):
+    """UTC timestamps (Timestamp or DatetimeIndex) as naive local times, like observation dates"""
+    return timestamps.tz_convert(tzlocal()).tz_localize(None)
+
+class ForecastCube:
+    """Forecasts as dense issue time × lead time × city arrays, one per metric
+    
+    ``arrays[metric][i, l, c]`` is the forecast issued at ``issues[i]`` for
+    ``issues[i] + l * LEAD_STEP`` in ``cities[c]`` (NaN where there is none).
+    Arrays loaded from a ``ForecastStore`` are read-only memory maps.
+    """
+    
+    def __init__(self, issues, cities: List[str], arrays: Dict[str, np.ndarray]):
+        self.issues = np.asarray(issues, dtype='datetime64[ns]')
+        self.cities = list(cities)
+        self.arrays = arrays
+    
+    @classmethod
+    def from_points(cls, points: pd.DataFrame) -> 'ForecastCube':
+        """Scatter forecast points (FORECAST_COLUMNS) into the cube; later duplicates win"""
+        issue_values = pd.to_datetime(points['issue_time']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        valid_values = pd.to_datetime(points['valid_time']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        leads = np.rint((valid_values - issue_values) / _STEP_NS).astype(np.int64)
+        keep = (leads >= 0) & (leads < N_LEADS)
+        if not keep.all():
+            logger.warning(f"Dropped {np.count_nonzero(~keep)} forecast points outside the {MAX_LEAD} horizon")
+        
+        issue_codes, issues = pd.factorize(issue_values[keep], sort=True)
+        city_codes, cities = pd.factorize(points['city'].to_numpy()[keep], sort=True)
+        shape = (len(issues), N_LEADS, len(cities))
+        arrays = {}
+        for metric in FORECAST_METRICS:
+            values = np.full(shape, np.nan, dtype=np.float32)
+            values[issue_codes, leads[keep], city_codes] = pd.to_numeric(points[metric], errors='coerce').to_numpy()[keep]
+            arrays[metric] = values
+        return cls(np.asarray(issues).view('datetime64[ns]'), list(cities), arrays)
+    
+    @property
+    def leads(self) -> pd.TimedeltaIndex:
+        return pd.timedelta_range(start=0, periods=N_LEADS, freq=LEAD_STEP)
+    
+    def valid_times(self) -> np.ndarray:
+        """Valid time of every (issue, lead) slot as datetime64[ns]"""
+        return self.issues[:, None] + self.leads.to_numpy()[None, :]
+    
+    def select(self, cities: Optional[List[str]] = None, start=None, end=None) -> 'ForecastCube':
+        """Cube restricted to some cities and to issues in [start, end]"""
+        issue_mask = np.ones(len(self.issues), dtype=bool)
+        if start is not None:
+            issue_mask &= self.issues >= pd.Timestamp(start).to_datetime64()
+        if end is not None:
+            issue_mask &= self.issues <= pd.Timestamp(end).to_datetime64()
+        city_positions = np.arange(len(self.cities)) if cities is None else pd.Index(self.cities).get_indexer(cities)
+        city_positions = city_positions[city_positions >= 0]
+        arrays = {metric: values[issue_mask][:, :, city_positions] for metric, values in self.arrays.items()}
+        return ForecastCube(self.issues[issue_mask], [self.cities[c] for c in city_positions], arrays)
+    
+    def to_frame(self) -> pd.DataFrame:
+        """One row per stored forecast point (the exploded, row-per-point layout)"""
+        issue_idx, lead_idx, city_idx = np.nonzero(~np.isnan(self.arrays['temperature']))
+        frame = pd.DataFrame({
+            'city': np.asarray(self.cities, dtype=object)[city_idx],
+            'issue_time': self.issues[issue_idx],
+            'valid_time': self.issues[issue_idx] + lead_idx * LEAD_STEP.to_timedelta64(),
+            'lead_hours': lead_idx * int(LEAD_STEP / pd.Timedelta(hours=1))
+        })
+        for metric in FORECAST_METRICS:
+            frame[metric] = self.arrays[metric][issue_idx, lead_idx, city_idx]
+        return frame
+    
+    def nbytes(self) -> int:
+        return sum(values.nbytes for values in self.arrays.values()) + self.issues.nbytes
+
+class ForecastStore:
+    """Forecasts kept next to a dataset as ``<base>_forecasts/``, in ForecastCube layout
+    
+    Each metric is one float32 file of (issue, lead, city) slabs, so a new
+    forecast run is appended as a single slab and the files are memory
+    mapped on load. ``header.json`` lists the cities and issue times and is
+    replaced last, so readers never see a partially appended slab. Repeating
+    the latest issue time replaces those cities in its slab; an older issue
+    time or a new city rewrites the files.
+    """
+    
+    def __init__(self, data_file: str):
+        base, _ = os.path.splitext(data_file)
+        self.path = f"{base}_forecasts"
+        self.header_path = os.path.join(self.path, 'header.json')
+    
+    def _metric_path(self, metric: str) -> str:
+        return os.path.join(self.path, f"{metric}.f32")
+    
+    def exists(self) -> bool:
+        return os.path.exists(self.header_path)
+    
+    def header(self) -> Dict:
+        with open(self.header_path) as f:
+            return json.load(f)
+    
+    def _write_header(self, issues: np.ndarray, cities: List[str]):
+        header = {
+            'cities': list(cities),
+            'issues': [str(pd.Timestamp(issue)) for issue in issues],
+            'lead_hours': int(LEAD_STEP / pd.Timedelta(hours=1)),
+            'n_leads': N_LEADS,
+            'metrics': FORECAST_METRICS,
+            'dtype': 'float32'
+        }
+        tmp_path = f"{self.header_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(header, f)
+        os.replace(tmp_path, self.header_path)
+    
+    def load(self) -> ForecastCube:
+        """Memory-mapped forecasts (an empty cube if nothing is stored)"""
+        if not self.exists():
+            return ForecastCube([], [], {metric: np.empty((0, N_LEADS, 0), dtype=np.float32) for metric in FORECAST_METRICS})
+        header = self.header()
+        shape = (len(header['issues']), header['n_leads'], len(header['cities']))
+        arrays = {}
+        for metric in header['metrics']:
+            if shape[0] and shape[2]:
+                arrays[metric] = np.memmap(self._metric_path(metric), dtype=np.float32, mode='r', shape=shape)
+            else:
+                arrays[metric] = np.empty(shape, dtype=np.float32)
+        return ForecastCube(pd.to_datetime(header['issues']).to_numpy(dtype='datetime64[ns]'), header['cities'], arrays)
+    
+    def append(self, points: pd.DataFrame) -> int:
+        """Store forecast points (FORECAST_COLUMNS); returns the number of issue slabs written"""
+        if points.empty:
+            return 0
+        new = ForecastCube.from_points(points)
+        existing = self.load()
+        if len(existing.issues) and set(new.cities) <= set(existing.cities) and new.issues[0] >= existing.issues[-1]:
+            self._append_slabs(existing, new)
+        else:
+            self._rewrite(existing, new)
+        return len(new.issues)
+    
+    def _append_slabs(self, existing: ForecastCube, new: ForecastCube):
+        """Newer runs for known cities: write their slabs after the last one, then publish them with the header
+        
+        A repeat of the latest issue time (e.g. cities fetched later in the
+        same run) replaces those cities in the last slab, in place.
+        """
+        cities = existing.cities
+        positions = pd.Index(cities).get_indexer(new.cities)
+        first = len(existing.issues) - 1 if new.issues[0] == existing.issues[-1] else len(existing.issues)
+        issues = np.concatenate([existing.issues[:first], new.issues])
+        for metric in FORECAST_METRICS:
+            slab = np.full((len(new.issues), N_LEADS, len(cities)), np.nan, dtype=np.float32)
+            if first < len(existing.issues):
+                slab[0] = existing.arrays[metric][first]
+            slab[:, :, positions] = new.arrays[metric]
+            slab_bytes = N_LEADS * len(cities) * slab.itemsize
+            with open(self._metric_path(metric), 'r+b') as f:
+                # Bytes past the header's issue count (from an interrupted append) are discarded first
+                f.truncate(len(existing.issues) * slab_bytes)
+                f.seek(first * slab_bytes)
+                f.write(slab.tobytes())
+        self._write_header(issues, cities)
+    
+    def _rewrite(self, existing: ForecastCube, new: ForecastCube):
+        """Merge on the union of issues and cities and replace every file"""
+        cities = sorted(set(existing.cities) | set(new.cities))
+        issues = np.union1d(existing.issues, new.issues)
+        os.makedirs(self.path, exist_ok=True)
+        for metric in FORECAST_METRICS:
+            merged = np.full((len(issues), N_LEADS, len(cities)), np.nan, dtype=np.float32)
+            for cube in (existing, new):
+                if len(cube.issues) and len(cube.cities):
+                    # A repeated issue time is replaced by the newer fetch
+                    rows = np.searchsorted(issues, cube.issues)
+                    columns = pd.Index(cities).get_indexer(cube.cities)
+                    merged[np.ix_(rows, np.arange(N_LEADS), columns)] = cube.arrays[metric]
+            tmp_path = f"{self._metric_path(metric)}.tmp"
+            merged.tofile(tmp_path)
+            os.replace(tmp_path, self._metric_path(metric))
+        self._write_header(issues, cities)
+        logger.info(f"Rewrote forecast store: {len(issues)} issues × {len(cities)} cities")
+    
+    def storage_report(self) -> Dict:
+        """Bytes on disk against the same forecasts as one CSV row per point"""
+        cube = self.load()
+        stored = sum(os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path)) if self.exists() else 0
+        rows = cube.to_frame()
+        return {
+            'issues': len(cube.issues),
+            'cities': len(cube.cities),
+            'points': len(rows),
+            'bytes': stored,
+            'csv_bytes': len(rows.to_csv(index=False).encode())
+        }
+
+def synthetic_forecasts(n_cities: int, days: int, runs_per_day: int = 8, seed: int = 0,
+                        start: str = '2024-01-01') -> pd.DataFrame:
+    """Forecast points for every city and run, as collect_forecasts returns them"""
+    rng = np.random.default_rng(seed)
+    issues = pd.date_range(start, periods=days * runs_per_day, freq=pd.Timedelta(days=1) / runs_per_day).floor(LEAD_STEP)
+    leads = np.arange(1, N_LEADS)
+    cities = [f'City{i:04d}' for i in range(n_cities)]
+    shape = (len(issues), len(leads), n_cities)
+    issue_grid, lead_grid, city_grid = np.meshgrid(np.arange(len(issues)), leads, np.arange(n_cities), indexing='ij')
+    valid = issues.to_numpy()[issue_grid] + lead_grid * LEAD_STEP.to_timedelta64()
+    return pd.DataFrame({
+        'city': np.asarray(cities, dtype=object)[city_grid.ravel()],
+        'issue_time': issues.to_numpy()[issue_grid.ravel()],
+        'valid_time': valid.ravel(),
+        'temperature': np.round(rng.normal(20, 8, shape), 2).ravel(),
+        'humidity': np.round(np.clip(rng.normal(65, 15, shape), 5, 100)).ravel(),
+        'rainfall': np.round(np.where(rng.random(shape) < 0.3, rng.exponential(1, shape), 0.0), 2).ravel()
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect 5-day/3-hour forecasts and inspect the forecast store")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    fetch_parser = subparsers.add_parser('fetch', help="Fetch forecasts for cities and store them")
+    fetch_parser.add_argument('--cities', default='Bangkok,Tokyo,London,New York,Sydney,Mumbai')
+    fetch_parser.add_argument('--data-file', default='weather_data.csv')
+    
+    report_parser = subparsers.add_parser('report', help="Storage size of the forecast store")
+    report_parser.add_argument('--data-file', default='weather_data.csv')
+    
+    benchmark_parser = subparsers.add_parser('benchmark', help="Store synthetic forecasts and compare with CSV rows")
+    benchmark_parser.add_argument('--cities', type=int, default=200)
+    benchmark_parser.add_argument('--days', type=int, default=30)
+    benchmark_parser.add_argument('--data-file', default='forecast_benchmark.csv')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    
+    if args.command == 'fetch':
+        from weather_collector import WeatherDataCollector
+        cities = [city.strip() for city in args.cities.split(',') if city.strip()]
+        points = WeatherDataCollector().collect_forecasts(cities)
+        slabs = ForecastStore(args.data_file).append(points)
+        print(f"Stored {len(points):,} forecast points ({slabs} issue slab(s)) for {points['city'].nunique()} cities")
+    elif args.command == 'report':
+        print(json.dumps(ForecastStore(args.data_file).storage_report(), indent=2))
+    else:
+        points = synthetic_forecasts(args.cities, args.days)
+        store = ForecastStore(args.data_file)
+        shutil.rmtree(store.path, ignore_errors=True)
+        start = time.perf_counter()
+        # One collection pass per issue time, as the service appends them
+        for _, run in points.groupby('issue_time', sort=True):
+            store.append(run)
+        appended = time.perf_counter() - start
+        start = time.perf_counter()
+        cube = store.load()
+        float(np.nanmean(cube.arrays['temperature']))
+        loaded = time.perf_counter() - start
+        report = store.storage_report()
+        print(f"{report['points']:,} points, {report['issues']} issues × {report['cities']} cities")
+        print(f"  store: {report['bytes'] / 1e6:.1f} MB, CSV rows: {report['csv_bytes'] / 1e6:.1f} MB "
+              f"({report['csv_bytes'] / report['bytes']:.1f}x larger)")
+        print(f"  append {appended * 1000:.0f} ms total, map and scan {loaded * 1000:.1f} ms")
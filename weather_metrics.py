@@ -0,0 +1,175 @@
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Instrumentation is opt-in and fixed at import: WEATHER_METRICS=1 records timing spans
+# and counters, WEATHER_METRICS=alloc also traces the memory each span allocates
+_MODE = os.getenv('WEATHER_METRICS', '').strip().lower()
+ENABLED = _MODE not in ('', '0', 'false', 'off')
+TRACK_ALLOCATIONS = _MODE == 'alloc'
+
+# Shared by every disabled span, so a disabled ``with span(...)`` allocates nothing
+_NULL_SPAN = nullcontext()
+
+class MetricsRegistry:
+    """Process-wide span timings and counters
+    
+    Spans aggregate call count, total/max/last wall time and, when
+    allocations are traced, the net bytes allocated inside the span.
+    Counters are keyed by name and labels.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans: Dict[str, Dict] = {}
+        self._counters: Dict[tuple, float] = {}
+    
+    def record_span(self, name: str, seconds: float, allocated: Optional[int] = None):
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'last_seconds': 0.0}
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['last_seconds'] = seconds
+            if allocated is not None:
+                stats['allocated_bytes'] = stats.get('allocated_bytes', 0) + allocated
+                stats['max_allocated_bytes'] = max(stats.get('max_allocated_bytes', 0), allocated)
+    
+    def increment(self, name: str, value: float = 1, labels: tuple = ()):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def spans(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._spans.items()}
+    
+    def counters(self) -> Dict[str, float]:
+        """Counter values keyed by Prometheus-style series name"""
+        with self._lock:
+            return {_series(name, labels): value for (name, labels), value in sorted(self._counters.items())}
+    
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+    
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        spans = self.spans()
+        for metric, key, help_text in (
+            ('weather_span_calls_total', 'count', 'Calls of each instrumented span'),
+            ('weather_span_seconds_total', 'seconds', 'Wall time spent in each span'),
+            ('weather_span_seconds_max', 'max_seconds', 'Slowest call of each span'),
+            ('weather_span_allocated_bytes_total', 'allocated_bytes', 'Net bytes allocated inside each span')
+        ):
+            samples = [(name, stats[key]) for name, stats in sorted(spans.items()) if key in stats]
+            if samples:
+                kind = 'gauge' if key == 'max_seconds' else 'counter'
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+                lines += [f'{metric}{{span="{name}"}} {value:g}' for name, value in samples]
+        
+        with self._lock:
+            counters = sorted(self._counters.items())
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"weather_{name}_total"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{_series(metric, labels)} {value:g}")
+        return '\n'.join(lines) + '\n'
+
+def _series(name: str, labels: tuple) -> str:
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+registry = MetricsRegistry()
+
+class _Span:
+    __slots__ = ('name', 'start', 'allocated')
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def __enter__(self):
+        self.allocated = tracemalloc.get_traced_memory()[0] if TRACK_ALLOCATIONS else None
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        allocated = None
+        if self.allocated is not None:
+            allocated = max(tracemalloc.get_traced_memory()[0] - self.allocated, 0)
+        registry.record_span(self.name, seconds, allocated)
+        return False
+
+def span(name: str):
+    """Context manager timing a block (a shared no-op when instrumentation is off)"""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name)
+
+def timed(name: Optional[str] = None) -> Callable:
+    """Decorator timing every call of a function; returns it unchanged when instrumentation is off"""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        span_name = name or fn.__qualname__
+        
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def increment(name: str, value: float = 1, **labels):
+    """Add to a counter, e.g. ``increment('cache_requests', cache='figures', result='hit')``"""
+    if ENABLED:
+        registry.increment(name, value, tuple(sorted(labels.items())))
+
+def write_prometheus(path: str):
+    """Write the current metrics atomically in Prometheus text format (e.g. for node_exporter's textfile collector)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(registry.render_prometheus())
+    os.replace(tmp_path, path)
+
+def serve_metrics(port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Serve the metrics at http://host:port/metrics from a background thread"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+if ENABLED and TRACK_ALLOCATIONS and not tracemalloc.is_tracing():
+    tracemalloc.start()
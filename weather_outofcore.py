@@ -0,0 +1,169 @@
+import pandas as pd
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterator, List, Optional, Union
+import logging
+from weather_rollups import ROLLUP_COLUMNS, compute_rollup, merge_rollups, finalize_rollup, summarize_rollups
+
+logger = logging.getLogger(__name__)
+
+# Rollups kept while streaming; together they answer summary statistics and every
+# chart granularity WeatherAnalyzer reads from its rollups. The daily rollup holds
+# one row per city and day, so it stays bounded by the calendar, not the row count.
+OUT_OF_CORE_GRANULARITIES = ['Daily', 'Weekly', 'Monthly', 'Yearly']
+
+# Working memory per raw row while a partition is parsed, grouped and pickled,
+# as a multiple of the parsed DataFrame's own footprint
+PARTITION_OVERHEAD = 4
+
+# Partial rollups are merged once this many have been collected
+MERGE_BATCH = 16
+
+def _aggregate_partition(chunk: pd.DataFrame) -> Dict:
+    """Partial aggregates for one partition (runs in a worker process)"""
+    chunk['date'] = pd.to_datetime(chunk['date'], format='ISO8601')
+    partial = {granularity: compute_rollup(chunk, granularity) for granularity in OUT_OF_CORE_GRANULARITIES}
+    humidity = chunk['humidity']
+    if humidity.notna().any():
+        partial['max_humidity'] = chunk.loc[humidity.idxmax()]
+        partial['min_humidity'] = chunk.loc[humidity.idxmin()]
+    partial['rows'] = len(chunk)
+    return partial
+
+class OutOfCoreAnalyzer:
+    """Summary statistics and rollups for datasets larger than memory
+    
+    Sources are CSV files (paths, glob patterns or directories of CSVs, e.g.
+    per city/month partitions or a compacted ``weather_data.csv``). Each file
+    is streamed in chunks sized to fit ``memory_budget_mb``; chunks are
+    aggregated into mergeable rollups on a process pool with at most one
+    chunk in flight per worker, so peak memory stays within the budget
+    regardless of the dataset size. Rows must already be deduplicated on
+    (city, date), as the dataset store guarantees after compaction.
+    """
+    
+    def __init__(self, sources: Union[str, List[str]], memory_budget_mb: float = 512,
+                 workers: Optional[int] = None):
+        self.paths = self._resolve_sources([sources] if isinstance(sources, str) else sources)
+        if not self.paths:
+            raise ValueError(f"No CSV files found for {sources}")
+        self.memory_budget_mb = memory_budget_mb
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_rows = self._chunk_rows()
+        self._rollups: Optional[Dict[str, pd.DataFrame]] = None
+        self._humidity_extremes = (None, None)
+        self.rows = 0
+    
+    @staticmethod
+    def _resolve_sources(sources: List[str]) -> List[str]:
+        paths = []
+        for source in sources:
+            if os.path.isdir(source):
+                paths.extend(sorted(glob.glob(os.path.join(source, '*.csv'))))
+            elif glob.has_magic(source):
+                paths.extend(sorted(glob.glob(source)))
+            else:
+                paths.append(source)
+        return paths
+    
+    def _chunk_rows(self) -> int:
+        """Rows per chunk so that every in-flight chunk fits in the memory budget"""
+        sample = pd.read_csv(self.paths[0], nrows=1000)
+        bytes_per_row = max(sample.memory_usage(deep=True).sum() / max(len(sample), 1), 1)
+        # One chunk per worker plus the one being read by the parent
+        budget_bytes = self.memory_budget_mb * 1024 * 1024
+        return max(int(budget_bytes / ((self.workers + 1) * bytes_per_row * PARTITION_OVERHEAD)), 1000)
+    
+    def _partitions(self) -> Iterator[pd.DataFrame]:
+        for path in self.paths:
+            yield from pd.read_csv(path, chunksize=self.chunk_rows)
+    
+    def _merge(self, pending: Dict[str, List[pd.DataFrame]]):
+        for granularity, partials in pending.items():
+            if partials:
+                batch = pd.concat(partials, ignore_index=True)
+                self._rollups[granularity] = merge_rollups(self._rollups[granularity], batch)
+                partials.clear()
+    
+    def _collect(self, partial: Dict, order: int, pending: Dict[str, List[pd.DataFrame]], extremes: Dict):
+        self.rows += partial['rows']
+        for granularity in OUT_OF_CORE_GRANULARITIES:
+            pending[granularity].append(partial[granularity])
+        if 'max_humidity' in partial:
+            # Ties go to the earliest partition, matching idxmax/idxmin on the whole dataset
+            for key, better in (('max_humidity', lambda a, b: a > b), ('min_humidity', lambda a, b: a < b)):
+                row = partial[key]
+                current = extremes.get(key)
+                if (current is None or better(row['humidity'], current[1]['humidity'])
+                        or (row['humidity'] == current[1]['humidity'] and order < current[0])):
+                    extremes[key] = (order, row)
+        if len(pending['Yearly']) >= MERGE_BATCH:
+            self._merge(pending)
+    
+    def aggregate(self) -> Dict[str, pd.DataFrame]:
+        """Stream every partition once and build the daily, weekly, monthly and yearly rollups"""
+        if self._rollups is not None:
+            return self._rollups
+        
+        start = time.perf_counter()
+        self._rollups = {g: pd.DataFrame(columns=ROLLUP_COLUMNS) for g in OUT_OF_CORE_GRANULARITIES}
+        pending = {g: [] for g in OUT_OF_CORE_GRANULARITIES}
+        extremes = {}
+        self.rows = 0
+        
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = {}
+            for order, chunk in enumerate(self._partitions()):
+                if len(in_flight) >= self.workers:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._collect(future.result(), in_flight.pop(future), pending, extremes)
+                in_flight[executor.submit(_aggregate_partition, chunk)] = order
+                del chunk
+            for future in list(in_flight):
+                self._collect(future.result(), in_flight.pop(future), pending, extremes)
+        
+        self._merge(pending)
+        self._humidity_extremes = tuple(
+            extremes[key][1] if key in extremes else None for key in ('max_humidity', 'min_humidity')
+        )
+        logger.info(f"Aggregated {self.rows:,} rows from {len(self.paths)} file(s) in "
+                    f"{time.perf_counter() - start:.1f}s ({self.chunk_rows:,} rows per partition, "
+                    f"{self.workers} workers)")
+        return self._rollups
+    
+    def calculate_summary_statistics(self) -> Dict:
+        """Same structure as WeatherAnalyzer.calculate_summary_statistics"""
+        rollups = self.aggregate()
+        max_humidity, min_humidity = self._humidity_extremes
+        return summarize_rollups(rollups['Yearly'], rollups['Monthly'], max_humidity, min_humidity)
+    
+    def query_raw(self, granularity: str, cities: Optional[List[str]] = None) -> pd.DataFrame:
+        """Rollup interface, so the result can back WeatherAnalyzer(df, rollups=...)"""
+        if granularity not in OUT_OF_CORE_GRANULARITIES:
+            raise ValueError(f"Out-of-core rollups cover {OUT_OF_CORE_GRANULARITIES}, not {granularity}")
+        rollup = self.aggregate()[granularity]
+        if cities:
+            rollup = rollup[rollup['city'].isin(cities)]
+        return rollup.reset_index(drop=True)
+    
+    def query(self, granularity: str, cities: Optional[List[str]] = None) -> pd.DataFrame:
+        return finalize_rollup(self.query_raw(granularity, cities))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summary statistics for weather archives larger than memory")
+    parser.add_argument('sources', nargs='+', help="CSV files, glob patterns or directories of CSVs")
+    parser.add_argument('--memory-budget', type=float, default=512, help="Peak working memory in MB")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    
+    analyzer = OutOfCoreAnalyzer(args.sources, memory_budget_mb=args.memory_budget, workers=args.workers)
+    stats = analyzer.calculate_summary_statistics()
+    print(f"Rows: {analyzer.rows:,}")
+    print(f"Overall temperature: {stats['temp_stats']}")
+    print(f"Average humidity: {stats['humidity_stats']['avg_humidity']}%")
+    print(stats['city_statistics'].to_string())
@@ -0,0 +1,115 @@
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Threads used to build independent figures; WEATHER_RENDER_WORKERS=1 builds them one after another
+RENDER_WORKERS = int(os.getenv('WEATHER_RENDER_WORKERS', '0')) or min(4, os.cpu_count() or 1)
+
+# st.pyplot's savefig options, so charts rendered ahead of time look the same
+PYPLOT_SAVEFIG_OPTIONS = {'format': 'png', 'dpi': 200, 'bbox_inches': 'tight'}
+
+def as_built(builders: Dict[str, Callable], workers: Optional[int] = None) -> Iterator[Tuple[str, object]]:
+    """Run independent builders concurrently and yield (name, result) as each one completes
+    
+    Builders run on threads: the pandas/NumPy aggregation behind each chart
+    releases the GIL, and matplotlib figures are standalone ``Figure``
+    objects, so they do not share pyplot state. With one worker (or one
+    builder) they run in order on the calling thread. An exception from a
+    builder is raised when its result is reached.
+    """
+    workers = RENDER_WORKERS if workers is None else workers
+    if workers <= 1 or len(builders) <= 1:
+        for name, build in builders.items():
+            yield name, build()
+        return
+    
+    with ThreadPoolExecutor(max_workers=min(workers, len(builders)), thread_name_prefix='render') as pool:
+        futures = {pool.submit(build): name for name, build in builders.items()}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+def build_all(builders: Dict[str, Callable], workers: Optional[int] = None) -> Dict[str, object]:
+    """Results of every builder, keyed in the builders' order"""
+    results = dict(as_built(builders, workers))
+    return {name: results[name] for name in builders}
+
+def render_png(fig) -> bytes:
+    """Rasterize a matplotlib Figure to PNG (on the builder's thread, instead of in st.pyplot)"""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, **PYPLOT_SAVEFIG_OPTIONS)
+    return buffer.getvalue()
+
+def tab_builders(analyzer, figure_cache, cities, time_aggregation: str = 'Daily', show_trend: bool = True) -> Dict[str, Callable]:
+    """Every chart of the dashboard's three tabs in "Both" mode, as independent builders"""
+    return {
+        'temperature': lambda: figure_cache.figure(analyzer, 'create_temperature_line_chart', cities=cities,
+                                                   time_aggregation=time_aggregation, show_trend=show_trend),
+        'temperature_static': lambda: render_png(analyzer.create_static_temperature_chart(cities=cities, time_aggregation=time_aggregation)),
+        'rainfall': lambda: figure_cache.figure(analyzer, 'create_rainfall_bar_chart', time_aggregation=time_aggregation),
+        'rainfall_static': lambda: render_png(analyzer.create_static_rainfall_chart(time_aggregation=time_aggregation)),
+        'scatter': lambda: figure_cache.figure(analyzer, 'create_humidity_temperature_scatter', cities=cities,
+                                               time_aggregation=time_aggregation),
+        'scatter_static': lambda: render_png(analyzer.create_static_humidity_scatter(cities=cities, time_aggregation=time_aggregation)),
+        'calendar': lambda: figure_cache.figure(analyzer, 'create_calendar_heatmap', city=cities[0],
+                                                metric='temperature', layout='year')
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sequential and concurrent figure construction")
+    parser.add_argument('--cities', type=int, default=6)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--time-aggregation', default='Weekly')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    
+    from weather_analyzer import WeatherAnalyzer
+    from weather_benchmark import synthetic_weather
+    from weather_figures import FigureCache
+    
+    df = synthetic_weather(args.cities, args.days)
+    cities = sorted(df['city'].unique())[:3]
+    print(f"{len(df):,} rows, {args.workers} workers on {os.cpu_count()} CPUs, {args.time_aggregation} aggregation")
+    
+    def timed_run(build, workers):
+        best = float('inf')
+        for _ in range(args.repeat):
+            # Fresh analyzer and cache, so every run pays for aggregation and figure building
+            analyzer = WeatherAnalyzer(df)
+            start = time.perf_counter()
+            per_chart = build(analyzer, workers)
+            best = min(best, time.perf_counter() - start)
+        return best, per_chart
+    
+    def tabs(analyzer, workers):
+        builders = tab_builders(analyzer, FigureCache(), cities, args.time_aggregation)
+        durations = {}
+        
+        def timing(name, build):
+            def run():
+                start = time.perf_counter()
+                result = build()
+                durations[name] = time.perf_counter() - start
+                return result
+            return run
+        build_all({name: timing(name, build) for name, build in builders.items()}, workers)
+        return durations
+    
+    def dashboard(analyzer, workers):
+        analyzer.create_comprehensive_dashboard(cities, workers=workers)
+        return {}
+    
+    for name, build in (('tabs ("Both" mode)', tabs), ('comprehensive dashboard', dashboard)):
+        sequential, per_chart = timed_run(build, 1)
+        concurrent, _ = timed_run(build, args.workers)
+        line = f"  {name}: sequential {sequential * 1000:.0f} ms, concurrent {concurrent * 1000:.0f} ms ({sequential / concurrent:.2f}x)"
+        if per_chart:
+            line += f", slowest chart {max(per_chart.values()) * 1000:.0f} ms, sum {sum(per_chart.values()) * 1000:.0f} ms"
+        print(line)
@@ -0,0 +1,210 @@
+import pandas as pd
+import numpy as np
+import argparse
+import time
+from typing import Dict, Tuple
+import logging
+from weather_rollups import METRICS, ROLLUP_COLUMNS, finalize_rollup
+
+logger = logging.getLogger(__name__)
+
+# Calendar frequencies whose buckets are labelled by their last day (like pd.Grouper(freq='W'/'M'/'Y'));
+# every fixed-width frequency ('10min', 'h', 'D', ...) is labelled by its start
+CALENDAR_FREQUENCIES = {'W', 'M', 'ME', 'Y', 'YE'}
+
+# Named granularities accepted wherever a frequency is
+GRANULARITY_FREQUENCIES = {
+    '10-Minute': '10min',
+    'Hourly': 'h',
+    'Daily': 'D',
+    'Weekly': 'W',
+    'Monthly': 'M',
+    'Yearly': 'Y'
+}
+
+# Granularities finer than a day, which persisted rollups do not cover
+SUB_DAILY_GRANULARITIES = ['10-Minute', 'Hourly']
+
+# Aggregate into a dense (city, bucket) grid when it has at most this many cells per row
+DENSE_GRID_FACTOR = 4
+
+_DAY_NS = 86_400_000_000_000
+
+def is_sub_daily(dates: pd.Series) -> bool:
+    """Whether any timestamp has a time of day (i.e. observations are finer than daily)"""
+    values = dates.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    return bool(len(values)) and bool((values % _DAY_NS).any())
+
+def _city_codes(cities: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Integer city codes in sorted-name order, reusing a categorical's codes without factorizing"""
+    if isinstance(cities.dtype, pd.CategoricalDtype):
+        return cities.cat.codes.to_numpy(), cities.cat.categories
+    codes, names = pd.factorize(cities, sort=True)
+    return codes, names
+
+def _bucket_keys(timestamps: np.ndarray, freq: str) -> np.ndarray:
+    """Integer bucket key per int64-nanosecond timestamp, increasing with time"""
+    if freq in ('M', 'ME', 'Y', 'YE'):
+        unit = 'M' if freq.startswith('M') else 'Y'
+        # Calendar conversion per row is slow; convert each distinct day once and look rows up
+        days = timestamps // _DAY_NS
+        first = days.min()
+        periods = np.arange(first, days.max() + 1).view('datetime64[D]').astype(f'datetime64[{unit}]')
+        return periods.view(np.int64)[days - first]
+    if freq == 'W':
+        # 1970-01-01 was a Thursday; shifting by 3 days makes weeks run Monday to Sunday
+        return (timestamps // _DAY_NS + 3) // 7
+    return timestamps // pd.Timedelta(pd.tseries.frequencies.to_offset(freq)).value
+
+def _bucket_labels(keys: np.ndarray, freq: str) -> np.ndarray:
+    """Label of each bucket key as datetime64[ns]: the last day of calendar periods, else the start"""
+    if freq in ('M', 'ME', 'Y', 'YE'):
+        unit = 'M' if freq.startswith('M') else 'Y'
+        # The start of the next period, minus a day
+        labels = (keys + 1).view(f'datetime64[{unit}]').astype('datetime64[ns]').view(np.int64) - _DAY_NS
+    elif freq == 'W':
+        labels = (keys * 7 + 3) * _DAY_NS
+    else:
+        labels = keys * pd.Timedelta(pd.tseries.frequencies.to_offset(freq)).value
+    return labels.view('datetime64[ns]')
+
+def _aggregate_dense(codes: np.ndarray, keys: np.ndarray, df: pd.DataFrame, n_cities: int) -> Tuple[np.ndarray, np.ndarray, Dict]:
+    """Aggregates scattered into a dense (city, bucket) grid, in any row order"""
+    first = keys.min()
+    n_buckets = int(keys.max() - first) + 1
+    size = n_cities * n_buckets
+    # City-major cell numbers, so observed cells come out ordered by city, then time
+    cells = codes.astype(np.int64) * n_buckets + (keys - first)
+    rows = np.bincount(cells, minlength=size)
+    observed = np.flatnonzero(rows)
+    
+    aggregates = {}
+    for metric in METRICS:
+        values = df[metric].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        if valid.all():
+            aggregates[f'{metric}_sum'] = np.bincount(cells, weights=values, minlength=size)[observed]
+            aggregates[f'{metric}_count'] = rows[observed]
+        else:
+            aggregates[f'{metric}_sum'] = np.bincount(cells, weights=np.where(valid, values, 0.0), minlength=size)[observed]
+            aggregates[f'{metric}_count'] = np.bincount(cells, weights=valid, minlength=size)[observed].astype(np.int64)
+        for part, ufunc in (('min', np.fmin), ('max', np.fmax)):
+            # fmin/fmax skip NaN, so a bucket is NaN only when it has no valid value
+            grid = np.full(size, np.nan)
+            ufunc.at(grid, cells, values)
+            aggregates[f'{metric}_{part}'] = grid[observed]
+    return observed // n_buckets, observed % n_buckets + first, aggregates
+
+def _aggregate_sorted(codes: np.ndarray, keys: np.ndarray, timestamps: np.ndarray,
+                      df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, Dict]:
+    """Aggregates over contiguous (city, bucket) runs after ordering rows by city and time"""
+    code_steps = np.diff(codes)
+    if (code_steps >= 0).all() and (np.diff(timestamps)[code_steps == 0] >= 0).all():
+        order = None
+    elif (np.diff(timestamps) >= 0).all():
+        # A stable sort keeps each city's rows in time order (radix sort for small code types)
+        order = np.argsort(codes, kind='stable')
+    else:
+        order = np.lexsort((timestamps, codes))
+    
+    def ordered(values):
+        return values if order is None else values[order]
+    
+    codes, keys = ordered(codes), ordered(keys)
+    boundary = np.empty(len(keys), dtype=bool)
+    boundary[0] = True
+    np.not_equal(keys[1:], keys[:-1], out=boundary[1:])
+    boundary[1:] |= codes[1:] != codes[:-1]
+    starts = np.flatnonzero(boundary)
+    
+    aggregates = {}
+    for metric in METRICS:
+        values = ordered(df[metric].to_numpy(dtype=np.float64))
+        valid = ~np.isnan(values)
+        aggregates[f'{metric}_sum'] = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        aggregates[f'{metric}_count'] = np.add.reduceat(valid.astype(np.int64), starts)
+        aggregates[f'{metric}_min'] = np.fmin.reduceat(values, starts)
+        aggregates[f'{metric}_max'] = np.fmax.reduceat(values, starts)
+    return codes[starts], keys[starts], aggregates
+
+def resample_rollup(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """Mergeable rollup (sum/count/min/max per metric) of observations at any frequency
+    
+    ``freq`` is a fixed-width pandas frequency ('10min', 'h', 'D', ...), a
+    calendar frequency ('W', 'M', 'Y') or a granularity name ('Hourly',
+    'Daily', ...). Each row gets an integer (city, bucket) key and every
+    aggregate is one vectorized pass over the columns, with no per-group
+    Python work. When the (city, bucket) grid is not much larger than the
+    data, rows are scattered into it with bincount in their existing order;
+    sparse grids (fine buckets over long, patchy records) instead order the
+    rows by city and time, so each bucket is a contiguous run reduced with
+    ``reduceat``. Time-ordered input (as the dataset snapshot is) then only
+    needs a stable sort on the city codes.
+    
+    Temperature and humidity finalize to means and rainfall to totals (see
+    ``weather_rollups.finalize_rollup``); partial rollups of row chunks
+    merge with ``weather_rollups.merge_rollups``.
+    """
+    freq = GRANULARITY_FREQUENCIES.get(freq, freq)
+    if df.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    
+    dates = df['date'] if pd.api.types.is_datetime64_any_dtype(df['date']) else pd.to_datetime(df['date'], format='ISO8601')
+    timestamps = dates.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    codes, names = _city_codes(df['city'])
+    keys = _bucket_keys(timestamps, freq)
+    
+    n_buckets = int(keys.max() - keys.min()) + 1
+    if len(names) * n_buckets <= DENSE_GRID_FACTOR * len(df):
+        bucket_codes, bucket_keys, aggregates = _aggregate_dense(codes, keys, df, len(names))
+    else:
+        bucket_codes, bucket_keys, aggregates = _aggregate_sorted(codes, keys, timestamps, df)
+    
+    if isinstance(df['city'].dtype, pd.CategoricalDtype):
+        city = pd.Categorical.from_codes(bucket_codes, dtype=df['city'].dtype)
+    else:
+        city = np.asarray(names, dtype=object)[bucket_codes]
+    result = pd.DataFrame({'city': city, 'date': _bucket_labels(bucket_keys, freq), **aggregates})
+    return result[ROLLUP_COLUMNS]
+
+def resample(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """Observations rolled up to ``freq``: mean temperature and humidity, total rainfall per city"""
+    return finalize_rollup(resample_rollup(df, freq))
+
+def synthetic_observations(n_cities: int, days: int, interval: str = '10min', seed: int = 0) -> pd.DataFrame:
+    """High-frequency observations for every city, ordered by time like the dataset snapshot"""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2020-01-01', periods=int(pd.Timedelta(days, 'D') / pd.tseries.frequencies.to_offset(interval)), freq=interval)
+    n = len(times) * n_cities
+    return pd.DataFrame({
+        'city': pd.Categorical.from_codes(np.tile(np.arange(n_cities, dtype=np.int16), len(times)),
+                                          categories=[f'City{i:04d}' for i in range(n_cities)]),
+        'date': np.repeat(times.to_numpy(), n_cities),
+        'temperature': rng.normal(20, 8, n).astype(np.float64),
+        'humidity': rng.uniform(10, 100, n),
+        'rainfall': np.where(rng.random(n) < 0.05, rng.exponential(0.5, n), 0.0)
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark resampling of high-frequency observations")
+    parser.add_argument('--cities', type=int, default=100)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--interval', default='10min', help="Observation interval of the synthetic data")
+    parser.add_argument('--freq', nargs='+', default=['h', 'D', 'W', 'M'])
+    parser.add_argument('--compare', action='store_true', help="Also time (and check) the pandas groupby equivalent")
+    args = parser.parse_args()
+    
+    df = synthetic_observations(args.cities, args.days, args.interval)
+    print(f"{len(df):,} observations ({args.cities} cities x {args.days} days every {args.interval})")
+    for freq in args.freq:
+        start = time.perf_counter()
+        rollup = resample_rollup(df, freq)
+        elapsed = time.perf_counter() - start
+        line = f"  {freq:>5}: {len(rollup):>10,} buckets in {elapsed:.2f}s ({len(df) / elapsed / 1e6:.0f}M rows/s)"
+        if args.compare:
+            start = time.perf_counter()
+            grouper = pd.Grouper(key='date', freq={'M': 'ME', 'Y': 'YE'}.get(freq, freq))
+            reference = df.groupby(['city', grouper], observed=True)['temperature'].mean()
+            line += f", pandas groupby mean {time.perf_counter() - start:.2f}s"
+            np.testing.assert_allclose(rollup['temperature_sum'] / rollup['temperature_count'], reference.to_numpy())
+        print(line)
@@ -0,0 +1,278 @@
+import pandas as pd
+import os
+import glob
+from typing import List, Dict, Optional
+import logging
+from weather_metrics import increment
+
+logger = logging.getLogger(__name__)
+
+# Rollup granularities and the period frequency used to bucket them.
+# Bucket labels are the last day of the period, matching pd.Grouper(freq='W'/'M').
+ROLLUP_FREQUENCIES = {
+    'Daily': 'D',
+    'Weekly': 'W',
+    'Monthly': 'M',
+    'Yearly': 'Y'
+}
+
+# Granularities ordered from finest to coarsest
+ROLLUP_ORDER = ['Daily', 'Weekly', 'Monthly', 'Yearly']
+
+METRICS = ['temperature', 'humidity', 'rainfall']
+
+ROLLUP_COLUMNS = ['city', 'date'] + [
+    f'{metric}_{part}' for metric in METRICS for part in ('sum', 'count', 'min', 'max')
+]
+
+def bucket_dates(dates: pd.Series, granularity: str) -> pd.Series:
+    """Map timestamps to the label of the bucket they fall in"""
+    freq = ROLLUP_FREQUENCIES[granularity]
+    if freq == 'D':
+        return dates.dt.normalize()
+    return dates.dt.to_period(freq).dt.end_time.dt.normalize()
+
+def compute_rollup(df: pd.DataFrame, granularity: str) -> pd.DataFrame:
+    """Compute a mergeable rollup (sum/count/min/max per metric) from raw rows"""
+    from weather_resample import resample_rollup
+    return resample_rollup(df, ROLLUP_FREQUENCIES[granularity])
+
+def merge_rollups(existing: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Merge two rollups of the same granularity, combining overlapping buckets"""
+    if existing.empty:
+        return new.reset_index(drop=True)
+    if new.empty:
+        return existing.reset_index(drop=True)
+    
+    combined = pd.concat([existing, new], ignore_index=True)
+    agg_spec = {}
+    for metric in METRICS:
+        agg_spec[f'{metric}_sum'] = 'sum'
+        agg_spec[f'{metric}_count'] = 'sum'
+        agg_spec[f'{metric}_min'] = 'min'
+        agg_spec[f'{metric}_max'] = 'max'
+    
+    merged = combined.groupby(['city', 'date'], sort=True).agg(agg_spec).reset_index()
+    return merged[ROLLUP_COLUMNS]
+
+def combine_cities(rollup: pd.DataFrame, label: str = 'Region') -> pd.DataFrame:
+    """Merge the buckets of several cities into one series labelled ``label`` (e.g. a region)"""
+    agg_spec = {}
+    for metric in METRICS:
+        agg_spec[f'{metric}_sum'] = 'sum'
+        agg_spec[f'{metric}_count'] = 'sum'
+        agg_spec[f'{metric}_min'] = 'min'
+        agg_spec[f'{metric}_max'] = 'max'
+    
+    combined = rollup.groupby('date', sort=True).agg(agg_spec).reset_index()
+    combined.insert(0, 'city', label)
+    return combined[ROLLUP_COLUMNS]
+
+def finalize_rollup(rollup: pd.DataFrame) -> pd.DataFrame:
+    """Turn a rollup into chart-ready rows (mean temperature/humidity, summed rainfall)"""
+    result = rollup[['city', 'date']].copy()
+    result['temperature'] = rollup['temperature_sum'] / rollup['temperature_count']
+    result['humidity'] = rollup['humidity_sum'] / rollup['humidity_count']
+    result['rainfall'] = rollup['rainfall_sum']
+    return result
+
+def summarize_rollups(yearly: pd.DataFrame, monthly: pd.DataFrame,
+                      max_humidity: pd.Series, min_humidity: pd.Series) -> Dict:
+    """Build WeatherAnalyzer's summary statistics from yearly and monthly rollups
+    
+    The humidity extremes are the raw rows holding the highest and lowest
+    humidity, which rollups cannot provide.
+    """
+    stats = {}
+    
+    # Per-city totals come from the yearly rollup, the smallest table that covers them
+    totals = yearly.groupby('city').agg({
+        'temperature_sum': 'sum', 'temperature_count': 'sum',
+        'temperature_min': 'min', 'temperature_max': 'max',
+        'humidity_sum': 'sum', 'humidity_count': 'sum',
+        'humidity_min': 'min', 'humidity_max': 'max',
+        'rainfall_sum': 'sum', 'rainfall_count': 'sum'
+    })
+    
+    # Average temperature per city
+    avg_temp = totals['temperature_sum'] / totals['temperature_count']
+    stats['avg_temp_by_city'] = avg_temp.rename('temperature').round(2)
+    
+    # Temperature statistics
+    stats['temp_stats'] = {
+        'overall_avg': round(totals['temperature_sum'].sum() / totals['temperature_count'].sum(), 2),
+        'overall_max': round(totals['temperature_max'].max(), 2),
+        'overall_min': round(totals['temperature_min'].min(), 2)
+    }
+    
+    # Humidity statistics
+    stats['humidity_stats'] = {
+        'max_humidity': max_humidity,
+        'min_humidity': min_humidity,
+        'avg_humidity': round(totals['humidity_sum'].sum() / totals['humidity_count'].sum(), 2)
+    }
+    
+    # Rainfall statistics
+    rainfall_by_month = monthly.groupby(monthly['date'].dt.to_period('M'))['rainfall_sum'].sum()
+    stats['rainfall_by_month'] = rainfall_by_month.rename_axis('month_year').rename('rainfall').round(2)
+    
+    # City-wise statistics
+    city_stats = pd.DataFrame({
+        ('temperature', 'mean'): avg_temp,
+        ('temperature', 'min'): totals['temperature_min'],
+        ('temperature', 'max'): totals['temperature_max'],
+        ('humidity', 'mean'): totals['humidity_sum'] / totals['humidity_count'],
+        ('humidity', 'min'): totals['humidity_min'],
+        ('humidity', 'max'): totals['humidity_max'],
+        ('rainfall', 'sum'): totals['rainfall_sum'],
+        ('rainfall', 'mean'): totals['rainfall_sum'] / totals['rainfall_count']
+    }).round(2)
+    stats['city_statistics'] = city_stats
+    
+    return stats
+
+def rollup_anomalies(series: pd.DataFrame, metric: str, granularity: str, threshold: float = 3.0) -> pd.DataFrame:
+    """Buckets of a finalized rollup that depart from the city's climatology
+    
+    The climatology of a bucket is the mean and standard deviation of the
+    city's buckets in the same calendar month (the whole record for yearly
+    buckets), so seasonal swings are not reported as anomalies. Results are
+    ordered by the size of the departure in standard deviations.
+    """
+    season = series['date'].dt.month if granularity != 'Yearly' else pd.Series(0, index=series.index)
+    grouped = series.groupby([series['city'], season], observed=True)[metric]
+    expected = grouped.transform('mean')
+    z_score = (series[metric] - expected) / grouped.transform('std')
+    
+    anomalies = pd.DataFrame({
+        'city': series['city'],
+        'date': series['date'],
+        'value': series[metric].round(2),
+        'expected': expected.round(2),
+        'z_score': z_score.round(2)
+    })[z_score.abs() > threshold]
+    order = anomalies['z_score'].abs().sort_values(ascending=False, kind='stable').index
+    return anomalies.loc[order].reset_index(drop=True)
+
+class RollupStore:
+    """Persisted daily/weekly/monthly/yearly rollups kept alongside a dataset file
+    
+    Appends write the rollups of the new rows as small partial tables next
+    to the full ones, so ingest costs O(new data); reads merge them in, and
+    rebuild() (run on compaction) folds them back into the full tables.
+    """
+    
+    def __init__(self, data_file: str):
+        self.data_file = data_file
+        base, _ = os.path.splitext(data_file)
+        self.rollup_dir = f"{base}_rollups"
+        self.partial_dir = os.path.join(self.rollup_dir, 'partials')
+        self._cache: Dict[str, pd.DataFrame] = {}
+    
+    def _path(self, granularity: str) -> str:
+        return os.path.join(self.rollup_dir, f"{granularity.lower()}.csv")
+    
+    def _partial_files(self, granularity: str) -> List[str]:
+        """Partial rollup tables of one granularity in write order"""
+        return sorted(glob.glob(os.path.join(self.partial_dir, f"{granularity.lower()}-*.csv")))
+    
+    def _next_partial_path(self, granularity: str) -> str:
+        partials = self._partial_files(granularity)
+        if partials:
+            last = os.path.basename(partials[-1])
+            seq = int(last[len(granularity) + 1:-len('.csv')]) + 1
+        else:
+            seq = 0
+        return os.path.join(self.partial_dir, f"{granularity.lower()}-{seq:08d}.csv")
+    
+    def exists(self) -> bool:
+        """Check whether every rollup table has been written"""
+        return all(os.path.exists(self._path(g)) for g in ROLLUP_ORDER)
+    
+    def load(self, granularity: str) -> pd.DataFrame:
+        """Load one rollup table merged with its partials (cached in memory after the first read)"""
+        if granularity not in self._cache:
+            path = self._path(granularity)
+            if os.path.exists(path):
+                rollup = pd.read_csv(path, parse_dates=['date'])
+            else:
+                rollup = pd.DataFrame(columns=ROLLUP_COLUMNS)
+            partials = [pd.read_csv(p, parse_dates=['date']) for p in self._partial_files(granularity)]
+            if partials:
+                rollup = merge_rollups(rollup, pd.concat(partials, ignore_index=True))
+            self._cache[granularity] = rollup
+        return self._cache[granularity]
+    
+    @staticmethod
+    def _write_csv(rollup: pd.DataFrame, path: str):
+        tmp_path = f"{path}.tmp"
+        rollup.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    
+    def _write(self, granularity: str, rollup: pd.DataFrame):
+        """Atomically replace one rollup table"""
+        os.makedirs(self.rollup_dir, exist_ok=True)
+        self._write_csv(rollup, self._path(granularity))
+        self._cache[granularity] = rollup
+    
+    def rebuild(self, df: pd.DataFrame):
+        """Recompute every rollup from the full dataset, replacing the partials"""
+        for granularity in ROLLUP_ORDER:
+            for path in self._partial_files(granularity):
+                os.remove(path)
+            self._write(granularity, compute_rollup(df, granularity))
+        logger.info(f"Rebuilt rollups in {self.rollup_dir}")
+    
+    def update(self, new_df: pd.DataFrame):
+        """Write the rollups of newly appended observations as partial tables"""
+        if new_df.empty:
+            return
+        os.makedirs(self.partial_dir, exist_ok=True)
+        for granularity in ROLLUP_ORDER:
+            partial = compute_rollup(new_df, granularity)
+            self._write_csv(partial, self._next_partial_path(granularity))
+            if granularity in self._cache:
+                self._cache[granularity] = merge_rollups(self._cache[granularity], partial)
+        logger.info(f"Wrote partial rollups for {len(new_df)} new records")
+    
+    def query(self, granularity: str, cities: Optional[List[str]] = None) -> pd.DataFrame:
+        """Return chart-ready aggregated rows for a granularity"""
+        rollup = self.load(granularity)
+        if cities:
+            rollup = rollup[rollup['city'].isin(cities)]
+        return finalize_rollup(rollup)
+    
+    def query_raw(self, granularity: str, cities: Optional[List[str]] = None) -> pd.DataFrame:
+        """Return the mergeable rollup table (sums, counts, min, max)"""
+        rollup = self.load(granularity)
+        if cities:
+            rollup = rollup[rollup['city'].isin(cities)]
+        return rollup.reset_index(drop=True)
+
+class InMemoryRollups:
+    """Rollups computed lazily from a DataFrame and kept for the object's lifetime
+    
+    An execution engine (see weather_engines) may be supplied to compute the
+    rollups; ``native`` is the engine's prepared form of ``df``.
+    """
+    
+    def __init__(self, df: pd.DataFrame, engine=None, native=None):
+        self.df = df
+        self.engine = engine
+        self.native = native
+        self._cache: Dict[str, pd.DataFrame] = {}
+    
+    def query_raw(self, granularity: str, cities: Optional[List[str]] = None) -> pd.DataFrame:
+        increment('cache_requests', cache='rollups', result='hit' if granularity in self._cache else 'miss')
+        if granularity not in self._cache:
+            if self.engine is None:
+                self._cache[granularity] = compute_rollup(self.df, granularity)
+            else:
+                self._cache[granularity] = self.engine.rollup(self.native, granularity)
+        rollup = self._cache[granularity]
+        if cities:
+            rollup = rollup[rollup['city'].isin(cities)]
+        return rollup.reset_index(drop=True)
+    
+    def query(self, granularity: str, cities: Optional[List[str]] = None) -> pd.DataFrame:
+        return finalize_rollup(self.query_raw(granularity, cities))
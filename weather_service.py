@@ -0,0 +1,377 @@
+import pandas as pd
+import numpy as np
+import argparse
+import heapq
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Optional
+import logging
+from weather_collector import WeatherDataCollector, load_city_list
+from weather_store import WeatherDataStore
+from weather_shared import get_shared_dataset
+from weather_forecast import ForecastStore
+import weather_metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CITIES = ['Bangkok', 'Tokyo', 'London', 'New York', 'Sydney', 'Mumbai']
+OBSERVATIONS_FILE = 'weather_observations.csv'
+# Share of the polling interval a forecast run may take
+FORECAST_BUDGET_FRACTION = 0.1
+
+class WeatherCollectorService:
+    """Long-running service that polls cities on a schedule and stores every observation
+    
+    Each city gets its own fixed offset inside the polling interval (evenly
+    spread plus random jitter) so requests are smoothed over time instead of
+    bursting at the top of every interval. Observations are buffered and
+    appended to the observation store in batches; the latest stored
+    observation of every city is published next to the health metrics, so
+    readers never scan the store. With a forecast interval,
+    forecasts for every city are collected that often on a separate thread,
+    within a budget of a fraction of the polling interval, and stored in the
+    dataset's ForecastStore.
+    """
+    
+    def __init__(self, cities: List[str], interval: float = 600, jitter: float = 0.5,
+                 flush_interval: float = 60, store: Optional[WeatherDataStore] = None,
+                 collector: Optional[WeatherDataCollector] = None, forecast_interval: Optional[float] = None):
+        self.cities = list(cities)
+        self.interval = interval
+        self.jitter = jitter
+        self.flush_interval = flush_interval
+        self.store = store or WeatherDataStore(OBSERVATIONS_FILE)
+        self.collector = collector or WeatherDataCollector()
+        base, _ = os.path.splitext(self.store.data_file)
+        self.health_file = f"{base}_health.json"
+        self.latest_file = f"{base}_latest.csv"
+        self.metrics_file = f"{base}_metrics.prom"
+        self.forecast_interval = forecast_interval
+        self.forecasts = ForecastStore(self.store.data_file)
+        self._next_forecast = time.monotonic()
+        self._forecast_points_stored = 0
+        
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._forecast_thread: Optional[threading.Thread] = None
+        self._buffer: List[Dict] = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._started_at: Optional[float] = None
+        # Latest stored observation per city, loaded on start
+        self._latest: Optional[pd.DataFrame] = None
+        
+        # Health metrics
+        self._city_status = {city: {'last_success': None, 'last_error': None,
+                                    'consecutive_failures': 0, 'last_lag': None}
+                             for city in self.cities}
+        self._observations_stored = 0
+        self._polls = 0
+    
+    def _initial_schedule(self) -> List:
+        """Spread cities evenly across one interval with random jitter"""
+        now = time.monotonic()
+        slot = self.interval / max(len(self.cities), 1)
+        offsets = np.arange(len(self.cities)) * slot
+        offsets += np.random.uniform(-self.jitter, self.jitter, len(self.cities)) * slot / 2
+        offsets = np.clip(offsets, 0, self.interval)
+        schedule = [(now + float(offset), city) for offset, city in zip(offsets, self.cities)]
+        heapq.heapify(schedule)
+        return schedule
+    
+    def start(self):
+        """Start polling in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._started_at = time.monotonic()
+        if self._latest is None:
+            self._latest = latest_observations(self.store.data_file)
+        self._thread = threading.Thread(target=self._run, name='weather-collector', daemon=True)
+        self._thread.start()
+        if self.forecast_interval:
+            self._forecast_thread = threading.Thread(target=self._run_forecasts, name='weather-forecasts', daemon=True)
+            self._forecast_thread.start()
+        logger.info(f"🛰️ Collector service started for {len(self.cities)} cities (every {self.interval}s)")
+    
+    def stop(self, timeout: float = 30):
+        """Stop polling, wait for the current request and flush buffered observations"""
+        self._stop.set()
+        for thread in (self._thread, self._forecast_thread):
+            if thread:
+                thread.join(timeout)
+        self.flush()
+        self._write_health()
+        logger.info("🛑 Collector service stopped")
+    
+    def run_forever(self):
+        """Run in the foreground until SIGINT/SIGTERM"""
+        def handle_signal(signum, frame):
+            logger.info(f"Received signal {signum}, shutting down...")
+            self._stop.set()
+        
+        signal.signal(signal.SIGINT, handle_signal)
+        signal.signal(signal.SIGTERM, handle_signal)
+        
+        self.start()
+        while not self._stop.is_set():
+            self._stop.wait(1)
+        self.stop()
+    
+    def _run(self):
+        schedule = self._initial_schedule()
+        
+        while not self._stop.is_set():
+            due, city = schedule[0]
+            wait = due - time.monotonic()
+            if wait > 0:
+                # Flush while idle so observations are persisted promptly
+                if time.monotonic() - self._last_flush >= self.flush_interval:
+                    self.flush()
+                    self._write_health()
+                if self._stop.wait(min(wait, self.flush_interval)):
+                    break
+                continue
+            
+            heapq.heappop(schedule)
+            self._poll(city, due)
+            
+            # Keep the city on its fixed offset; skip missed slots instead of bursting
+            next_due = due + self.interval
+            while next_due <= time.monotonic():
+                next_due += self.interval
+            heapq.heappush(schedule, (next_due, city))
+    
+    def _poll(self, city: str, due: float):
+        status = self._city_status[city]
+        status['last_lag'] = round(time.monotonic() - due, 3)
+        self._polls += 1
+        
+        try:
+            observation = self.collector.fetch_current_weather(city)
+        except Exception as e:
+            status['consecutive_failures'] += 1
+            status['last_error'] = str(e)
+            logger.error(f"❌ Poll failed for {city}: {e}")
+            return
+        
+        status['consecutive_failures'] = 0
+        status['last_success'] = observation['date']
+        with self._lock:
+            self._buffer.append(observation)
+    
+    def _run_forecasts(self):
+        # Forecast runs never hold up the observation polls
+        while not self._stop.is_set():
+            if time.monotonic() >= self._next_forecast:
+                self._collect_forecasts()
+            if self._stop.wait(max(self._next_forecast - time.monotonic(), 0)):
+                break
+    
+    def _collect_forecasts(self):
+        """Fetch every city's forecast within a fraction of the polling interval and store the run"""
+        self._next_forecast = time.monotonic() + self.forecast_interval
+        budget = self.interval * FORECAST_BUDGET_FRACTION
+        try:
+            points = self.collector.collect_forecasts(self.cities, time_budget=budget)
+            self.forecasts.append(points)
+        except Exception as e:
+            logger.error(f"❌ Forecast collection failed: {e}")
+            return
+        self._forecast_points_stored += len(points)
+    
+    def flush(self):
+        """Persist buffered observations to the store"""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        self._last_flush = time.monotonic()
+        
+        if not batch:
+            return
+        stored = self.store.append(pd.DataFrame(batch))
+        self._observations_stored += len(batch)
+        if not stored.empty:
+            self._write_latest(stored)
+    
+    def _write_latest(self, stored: pd.DataFrame):
+        """Merge newly stored rows into the latest observation per city and publish it"""
+        merged = stored if self._latest is None else pd.concat([self._latest, stored], ignore_index=True)
+        self._latest = (merged.sort_values('date', kind='stable')
+                        .drop_duplicates(subset='city', keep='last').reset_index(drop=True))
+        tmp_path = f"{self.latest_file}.tmp"
+        self._latest.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.latest_file)
+    
+    def health(self) -> Dict:
+        """Service health and lag metrics"""
+        lags = [s['last_lag'] for s in self._city_status.values() if s['last_lag'] is not None]
+        with self._lock:
+            buffered = len(self._buffer)
+        
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'uptime_seconds': round(time.monotonic() - self._started_at, 1) if self._started_at else 0,
+            'interval_seconds': self.interval,
+            'flush_interval_seconds': self.flush_interval,
+            'cities': len(self.cities),
+            'polls': self._polls,
+            'observations_stored': self._observations_stored,
+            'observations_buffered': buffered,
+            'forecast_points_stored': self._forecast_points_stored,
+            'max_lag_seconds': max(lags) if lags else None,
+            'mean_lag_seconds': round(float(np.mean(lags)), 3) if lags else None,
+            'failing_cities': [city for city, s in self._city_status.items() if s['consecutive_failures'] > 0],
+            'city_status': self._city_status
+        }
+    
+    def _write_health(self):
+        """Publish health metrics for other processes (e.g. the dashboard)"""
+        tmp_path = f"{self.health_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.health(), f, indent=2, default=str)
+        os.replace(tmp_path, self.health_file)
+        if metrics.ENABLED:
+            metrics.write_prometheus(self.metrics_file)
+
+def read_service_health(data_file: str = OBSERVATIONS_FILE) -> Optional[Dict]:
+    """Read the health metrics published by a running collector service"""
+    base, _ = os.path.splitext(data_file)
+    health_file = f"{base}_health.json"
+    if not os.path.exists(health_file):
+        return None
+    with open(health_file) as f:
+        health = json.load(f)
+    
+    # A service that stopped publishing (e.g. crashed) is no longer considered running
+    age = (datetime.now() - datetime.strptime(health['updated_at'], '%Y-%m-%d %H:%M:%S')).total_seconds()
+    health['age_seconds'] = age
+    health['running'] = health['running'] and age <= 3 * health['flush_interval_seconds'] + 5
+    return health
+
+def latest_observations(data_file: str = OBSERVATIONS_FILE) -> Optional[pd.DataFrame]:
+    """Most recent stored observation for every city
+    
+    Read from the file a collector service publishes after each flush; a
+    store without one (e.g. written by a batch collection) is scanned.
+    """
+    base, _ = os.path.splitext(data_file)
+    latest_file = f"{base}_latest.csv"
+    if os.path.exists(latest_file):
+        return pd.read_csv(latest_file, parse_dates=['date'])
+    store = WeatherDataStore(data_file)
+    if not store.exists():
+        return None
+    # The memory-mapped snapshot is ordered by date, so no parsing or sorting is needed
+    df = get_shared_dataset(data_file).frame()
+    latest = df.groupby('city', observed=True, sort=False).tail(1)
+    return latest.assign(city=latest['city'].astype(object)).reset_index(drop=True)
+
+class LiveObservationCache:
+    """Latest observations shared by every dashboard session, refreshed in the background
+    
+    ``get()`` never waits for I/O: it returns the cached observations, possibly
+    stale, and starts a single background refresh once they are older than
+    ``refresh_interval``. A running collector service is the source when
+    available; otherwise the cache fetches from the API itself within a time
+    budget of one interval, least recently updated cities first. Cities not
+    reached in one pass keep their previous values (stale-while-revalidate).
+    """
+    
+    def __init__(self, cities: List[str] = DEFAULT_CITIES, refresh_interval: float = 30,
+                 data_file: str = OBSERVATIONS_FILE, collector: Optional[WeatherDataCollector] = None):
+        self.cities = list(cities)
+        self.refresh_interval = refresh_interval
+        self.data_file = data_file
+        self.collector = collector or WeatherDataCollector()
+        self._lock = threading.Lock()
+        self._observations: Optional[pd.DataFrame] = None
+        self._health: Optional[Dict] = None
+        self._source: Optional[str] = None
+        self._refreshed_at: Optional[float] = None
+        self._refreshing = False
+    
+    def get(self) -> Dict:
+        """Cached observations plus freshness metadata; triggers a refresh when stale"""
+        with self._lock:
+            stale = self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_interval
+            if stale and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, name='live-observations', daemon=True).start()
+            return {
+                'observations': self._observations,
+                'health': self._health,
+                'source': self._source,
+                'age_seconds': None if self._refreshed_at is None else time.monotonic() - self._refreshed_at,
+                'refreshing': self._refreshing
+            }
+    
+    def _fetch(self, previous: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """Fetch from the API, oldest cities first, merged over the previous values"""
+        updated = {} if previous is None else dict(zip(previous['city'], previous['date']))
+        order = sorted(self.cities, key=lambda city: updated.get(city, pd.Timestamp.min))
+        fetched = self.collector.collect_current_weather_all_cities(order, time_budget=self.refresh_interval)
+        fetched = self.collector.clean_data(fetched)
+        if previous is None:
+            return fetched
+        merged = pd.concat([previous, fetched], ignore_index=True)
+        return merged.drop_duplicates(subset='city', keep='last').sort_values('date').reset_index(drop=True)
+    
+    def _refresh(self):
+        observations, source = None, None
+        health = None
+        try:
+            health = read_service_health(self.data_file)
+            if (health and health.get('running')) or not self.collector.api_key:
+                observations, source = latest_observations(self.data_file), 'service'
+            else:
+                observations, source = self._fetch(self._observations), 'api'
+        except Exception as e:
+            logger.error(f"❌ Live observation refresh failed: {e}")
+        finally:
+            with self._lock:
+                if observations is not None:
+                    self._observations = observations
+                    self._source = source
+                self._health = health
+                # A failed refresh is retried after the next interval, keeping the stale values
+                self._refreshed_at = time.monotonic()
+                self._refreshing = False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continuously collect weather observations")
+    parser.add_argument('--cities', help="Comma-separated list of cities")
+    parser.add_argument('--city-file', help="File with one city per line")
+    parser.add_argument('--interval', type=float, default=600, help="Polling interval per city in seconds")
+    parser.add_argument('--jitter', type=float, default=0.5, help="Random jitter as a fraction of each city's slot")
+    parser.add_argument('--output', default=OBSERVATIONS_FILE, help="Observation store file")
+    parser.add_argument('--forecast-interval', type=float, help="Also collect 5-day forecasts every this many seconds (e.g. 10800)")
+    parser.add_argument('--metrics-port', type=int, help="Serve /metrics on this port (requires WEATHER_METRICS=1)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    
+    if args.metrics_port:
+        if metrics.ENABLED:
+            metrics.serve_metrics(args.metrics_port)
+        else:
+            logger.warning("--metrics-port ignored: set WEATHER_METRICS=1 to enable instrumentation")
+    
+    if args.city_file:
+        cities = load_city_list(args.city_file)
+    elif args.cities:
+        cities = [city.strip() for city in args.cities.split(',') if city.strip()]
+    else:
+        cities = DEFAULT_CITIES
+    
+    service = WeatherCollectorService(
+        cities,
+        interval=args.interval,
+        jitter=args.jitter,
+        store=WeatherDataStore(args.output),
+        forecast_interval=args.forecast_interval
+    )
+    service.run_forever()
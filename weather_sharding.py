@@ -0,0 +1,313 @@
+import pandas as pd
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+import logging
+from weather_collector import WeatherDataCollector, load_city_list
+
+logger = logging.getLogger(__name__)
+
+class ShardQueue:
+    """SQLite-backed lease queue of city shards
+    
+    Workers claim a shard by taking a time-limited lease on it. A worker that
+    dies simply stops renewing its lease; once the lease expires the shard is
+    handed to another worker, up to ``max_attempts`` times. Workers on other
+    hosts can join by pointing at the same database file on shared storage
+    (use a filesystem with working POSIX locks).
+    """
+    
+    def __init__(self, db_path: str, lease_seconds: float = 120, max_attempts: int = 3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS shards (
+                    shard_id INTEGER PRIMARY KEY,
+                    cities TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    rows INTEGER,
+                    elapsed REAL,
+                    result_file TEXT,
+                    error TEXT
+                )
+            """)
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+    
+    def create(self, cities: List[str], shard_size: int):
+        """Partition the city list into shards and enqueue them"""
+        shards = [cities[i:i + shard_size] for i in range(0, len(cities), shard_size)]
+        with self._connect() as conn:
+            conn.execute("DELETE FROM shards")
+            conn.executemany(
+                "INSERT INTO shards (shard_id, cities) VALUES (?, ?)",
+                [(i, json.dumps(shard)) for i, shard in enumerate(shards)]
+            )
+        logger.info(f"Queued {len(cities)} cities in {len(shards)} shards")
+    
+    def claim(self, worker: str) -> Optional[Tuple[int, List[str]]]:
+        """Lease the next pending (or abandoned) shard"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("""
+                SELECT shard_id, cities FROM shards
+                WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                  AND attempts < ?
+                ORDER BY shard_id LIMIT 1
+            """, (now, self.max_attempts)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("""
+                UPDATE shards SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE shard_id = ?
+            """, (worker, now + self.lease_seconds, row[0]))
+            conn.execute("COMMIT")
+            return row[0], json.loads(row[1])
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+    
+    def renew(self, shard_id: int, worker: str) -> bool:
+        """Extend a lease; returns False if the lease was lost"""
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                UPDATE shards SET lease_expires = ?
+                WHERE shard_id = ? AND worker = ? AND status = 'leased'
+            """, (time.time() + self.lease_seconds, shard_id, worker))
+            return cursor.rowcount == 1
+    
+    def complete(self, shard_id: int, worker: str, rows: int, elapsed: float, result_file: str):
+        with self._connect() as conn:
+            conn.execute("""
+                UPDATE shards SET status = 'done', rows = ?, elapsed = ?, result_file = ?, error = NULL
+                WHERE shard_id = ? AND worker = ?
+            """, (rows, elapsed, result_file, shard_id, worker))
+    
+    def fail(self, shard_id: int, worker: str, error: str):
+        """Release a shard for retry, or mark it failed after max_attempts"""
+        with self._connect() as conn:
+            conn.execute("""
+                UPDATE shards
+                SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    lease_expires = NULL, error = ?
+                WHERE shard_id = ? AND worker = ?
+            """, (self.max_attempts, error, shard_id, worker))
+    
+    def remaining(self) -> int:
+        """Shards that are not yet done and can still be attempted"""
+        with self._connect() as conn:
+            # Abandoned shards that used up their attempts will never be reclaimed
+            conn.execute("""
+                UPDATE shards SET status = 'failed', error = COALESCE(error, 'lease expired')
+                WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+            """, (time.time(), self.max_attempts))
+            return conn.execute(
+                "SELECT COUNT(*) FROM shards WHERE status IN ('pending', 'leased')"
+            ).fetchone()[0]
+    
+    def stats(self) -> pd.DataFrame:
+        """Per-shard status and throughput"""
+        with self._connect() as conn:
+            stats = pd.read_sql_query("SELECT * FROM shards ORDER BY shard_id", conn)
+        stats['cities'] = stats['cities'].map(lambda c: len(json.loads(c)))
+        stats['rows_per_second'] = (stats['rows'] / stats['elapsed']).round(2)
+        return stats
+
+class _LeaseKeeper:
+    """Renew a shard lease in the background while it is being collected"""
+    
+    def __init__(self, queue: ShardQueue, shard_id: int, worker: str):
+        self.queue = queue
+        self.shard_id = shard_id
+        self.worker = worker
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def _run(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            if not self.queue.renew(self.shard_id, self.worker):
+                logger.warning(f"Lost lease on shard {self.shard_id}")
+                return
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def run_worker(db_path: str, output_dir: str, mode: str = 'current', days: int = 30,
+               api_key: Optional[str] = None, lease_seconds: float = 120,
+               max_attempts: int = 3) -> int:
+    """Claim and collect shards until the queue is drained; returns shards completed"""
+    queue = ShardQueue(db_path, lease_seconds, max_attempts)
+    collector = WeatherDataCollector(api_key)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    os.makedirs(output_dir, exist_ok=True)
+    completed = 0
+    
+    while True:
+        claimed = queue.claim(worker)
+        if claimed is None:
+            if queue.remaining() == 0:
+                break
+            # Other workers still hold leases; wait in case one of them dies
+            time.sleep(min(lease_seconds / 4, 5))
+            continue
+        
+        shard_id, cities = claimed
+        logger.info(f"[{worker}] Collecting shard {shard_id} ({len(cities)} cities)")
+        start = time.perf_counter()
+        
+        try:
+            with _LeaseKeeper(queue, shard_id, worker):
+                if mode == 'historical':
+                    df = collector.collect_historical_data(cities, days)
+                else:
+                    df = collector.collect_current_weather_all_cities(cities)
+        except Exception as e:
+            logger.error(f"[{worker}] Shard {shard_id} failed: {e}")
+            queue.fail(shard_id, worker, str(e))
+            continue
+        
+        elapsed = time.perf_counter() - start
+        result_file = os.path.join(output_dir, f"shard-{shard_id:06d}.csv")
+        tmp_path = f"{result_file}.{os.getpid()}.tmp"
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, result_file)
+        
+        queue.complete(shard_id, worker, len(df), elapsed, result_file)
+        completed += 1
+    
+    return completed
+
+class ShardedCollector:
+    """Collect weather for very large city lists across worker processes"""
+    
+    def __init__(self, cities: List[str], workers: Optional[int] = None, shard_size: int = 50,
+                 work_dir: str = 'sharded_collection', api_key: Optional[str] = None,
+                 lease_seconds: float = 120, max_attempts: int = 3, max_restarts: Optional[int] = None):
+        self.cities = list(cities)
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self.work_dir = work_dir
+        self.api_key = api_key
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Every shard may take down a worker on each of its attempts
+        self.max_restarts = max_restarts if max_restarts is not None else self.workers * max_attempts
+        self.db_path = os.path.join(work_dir, 'queue.db')
+        self.output_dir = os.path.join(work_dir, 'results')
+    
+    def run(self, mode: str = 'current', days: int = 30) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Collect all shards and return (merged data, per-shard stats)"""
+        os.makedirs(self.work_dir, exist_ok=True)
+        queue = ShardQueue(self.db_path, self.lease_seconds, self.max_attempts)
+        queue.create(self.cities, self.shard_size)
+        
+        worker_args = (self.db_path, self.output_dir, mode, days, self.api_key,
+                       self.lease_seconds, self.max_attempts)
+        processes = []
+        start = time.perf_counter()
+        
+        for _ in range(self.workers):
+            process = multiprocessing.Process(target=run_worker, args=worker_args)
+            process.start()
+            processes.append(process)
+        
+        # Replace workers that exit while there is still work left, even if none is alive
+        restarts = 0
+        while queue.remaining() > 0:
+            time.sleep(1)
+            for i, process in enumerate(processes):
+                if process.is_alive() or queue.remaining() == 0:
+                    continue
+                if restarts >= self.max_restarts:
+                    for other in processes:
+                        if other.is_alive():
+                            other.terminate()
+                    raise RuntimeError(f"❌ Workers died {restarts + 1} times with {queue.remaining()} shards "
+                                       f"left; giving up (queue: {self.db_path})")
+                logger.warning(f"Worker {process.pid} exited (exit code {process.exitcode}) with work left, "
+                               f"restarting ({restarts + 1}/{self.max_restarts})")
+                restarts += 1
+                processes[i] = multiprocessing.Process(target=run_worker, args=worker_args)
+                processes[i].start()
+        for process in processes:
+            process.join()
+        
+        elapsed = time.perf_counter() - start
+        stats = queue.stats()
+        merged = self.merge_results(stats)
+        
+        failed = stats[stats['status'] != 'done']
+        if not failed.empty:
+            logger.error(f"❌ {len(failed)} shards failed after {self.max_attempts} attempts: {failed['shard_id'].tolist()}")
+        logger.info(f"✅ Collected {len(merged)} records from {len(self.cities)} cities "
+                    f"in {elapsed:.1f}s ({len(merged) / elapsed:.1f} records/s)")
+        return merged, stats
+    
+    @staticmethod
+    def merge_results(stats: pd.DataFrame) -> pd.DataFrame:
+        """Concatenate the result files of all completed shards"""
+        files = stats.loc[stats['status'] == 'done', 'result_file']
+        frames = [pd.read_csv(path) for path in files if os.path.exists(path)]
+        if not frames:
+            return pd.DataFrame()
+        merged = pd.concat(frames, ignore_index=True)
+        merged['date'] = pd.to_datetime(merged['date'], format='ISO8601')
+        return merged.sort_values('date').reset_index(drop=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded multi-process weather collection")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    run_parser = subparsers.add_parser('run', help="Partition a city list and collect it with local workers")
+    run_parser.add_argument('--city-file', required=True, help="File with one city name or ID per line")
+    run_parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    run_parser.add_argument('--shard-size', type=int, default=50)
+    run_parser.add_argument('--work-dir', default='sharded_collection')
+    run_parser.add_argument('--mode', choices=['current', 'historical'], default='current')
+    run_parser.add_argument('--days', type=int, default=30)
+    run_parser.add_argument('--output', default='weather_data.csv', help="Dataset store to append the merged result to")
+    
+    worker_parser = subparsers.add_parser('worker', help="Join an existing queue (e.g. from another host)")
+    worker_parser.add_argument('--work-dir', default='sharded_collection')
+    worker_parser.add_argument('--mode', choices=['current', 'historical'], default='current')
+    worker_parser.add_argument('--days', type=int, default=30)
+    
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    
+    if args.command == 'run':
+        sharded = ShardedCollector(load_city_list(args.city_file), workers=args.workers,
+                                   shard_size=args.shard_size, work_dir=args.work_dir)
+        df, stats = sharded.run(mode=args.mode, days=args.days)
+        print(stats[['shard_id', 'status', 'worker', 'attempts', 'cities', 'rows', 'elapsed', 'rows_per_second']]
+              .to_string(index=False))
+        if not df.empty:
+            WeatherDataCollector().save_data(df, args.output, append=True)
+    else:
+        done = run_worker(os.path.join(args.work_dir, 'queue.db'), os.path.join(args.work_dir, 'results'),
+                          mode=args.mode, days=args.days)
+        print(f"Completed {done} shards")
@@ -0,0 +1,165 @@
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import date
+from typing import Dict, List, Optional
+import logging
+from weather_store import WeatherDataStore
+
+logger = logging.getLogger(__name__)
+
+class SharedDataset:
+    """Read-only weather dataset shared by every session and process on a host
+    
+    Wraps the store's memory-mapped binary snapshot (see weather_snapshot),
+    which the store keeps current as data is ingested. Every DataFrame
+    returned by ``frame()`` maps the snapshot files without copying, so all
+    Streamlit sessions and worker processes read the same physical pages
+    from the OS page cache; only filtered ``view()`` results are private
+    copies. A snapshot that fell behind the store is rewritten on first use.
+    """
+    
+    def __init__(self, data_file: str = 'weather_data.csv'):
+        self.store = WeatherDataStore(data_file)
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._header: Optional[Dict] = None
+        self._frame: Optional[pd.DataFrame] = None
+    
+    def export(self) -> Dict:
+        """Rewrite the snapshot from the stored rows"""
+        version = self.store.version()
+        return self.store.snapshot.write(self.store.read(), version)
+    
+    def _refresh(self):
+        version = self.store.version()
+        if self._frame is None or self._version != version:
+            header = self.store.snapshot.header()
+            if header is None or header['store_version'] != version:
+                header = self.export()
+            self._frame = self.store.snapshot.load(header)
+            self._header = header
+            self._version = header['store_version']
+    
+    def frame(self) -> pd.DataFrame:
+        """The full dataset backed by shared, read-only memory maps (do not modify in place)"""
+        with self._lock:
+            self._refresh()
+            return self._frame
+    
+    def header(self) -> Dict:
+        """Snapshot header: row count, city dictionary and date range, without scanning the data"""
+        with self._lock:
+            self._refresh()
+            return self._header
+    
+    def view(self, cities: Optional[List[str]] = None, start_date: Optional[date] = None,
+             end_date: Optional[date] = None) -> pd.DataFrame:
+        """Private copy of only the rows matching the filters"""
+        df = self.frame()
+        # Snapshot rows are ordered by date, so the date range is a slice found by binary search
+        dates = df['date'].to_numpy()
+        lo = 0 if start_date is None else np.searchsorted(dates, pd.Timestamp(start_date).to_datetime64())
+        hi = len(df) if end_date is None else np.searchsorted(
+            dates, (pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_datetime64()
+        )
+        window = df.iloc[lo:hi]
+        view = window[window['city'].isin(cities)] if cities else window.copy()
+        view = view.reset_index(drop=True)
+        # Plain strings, so groupbys on the view only see the cities it contains
+        view['city'] = view['city'].astype(object)
+        return view
+
+_shared_datasets: Dict[str, SharedDataset] = {}
+_shared_lock = threading.Lock()
+
+def get_shared_dataset(data_file: str = 'weather_data.csv') -> SharedDataset:
+    """Process-wide SharedDataset for a data file"""
+    with _shared_lock:
+        if data_file not in _shared_datasets:
+            _shared_datasets[data_file] = SharedDataset(data_file)
+        return _shared_datasets[data_file]
+
+def _memory_kb() -> Dict[str, int]:
+    """Resident memory of this process: total and private anonymous pages"""
+    usage = {}
+    path = '/proc/self/smaps_rollup' if os.path.exists('/proc/self/smaps_rollup') else '/proc/self/status'
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('Rss', 'VmRSS', 'Anonymous', 'RssAnon'):
+                usage[{'VmRSS': 'Rss', 'RssAnon': 'Anonymous'}.get(key, key)] = int(value.split()[0])
+    return usage
+
+def _simulated_session(data_file: str, shared: bool, seed: int):
+    """One dashboard session: load the dataset, filter it and compute the key metrics"""
+    from weather_analyzer import WeatherAnalyzer
+    
+    rng = np.random.default_rng(seed)
+    if shared:
+        dataset = get_shared_dataset(data_file)
+        df = dataset.frame()
+        picked = rng.choice(df['city'].cat.categories, size=min(3, len(df['city'].cat.categories)), replace=False)
+        view = dataset.view(picked.tolist())
+    else:
+        df = WeatherDataStore(data_file).read()
+        cities = df['city'].unique()
+        picked = rng.choice(cities, size=min(3, len(cities)), replace=False)
+        view = df[df['city'].isin(picked)]
+    analyzer = WeatherAnalyzer(view)
+    analyzer.calculate_summary_statistics()
+    return df, analyzer
+
+def load_test(data_file: str = 'weather_data.csv', sessions: int = 20, shared: bool = True) -> Dict:
+    """Open N simulated sessions in this process and report resident memory growth per session
+    
+    Sessions are kept alive until the end, as Streamlit keeps every
+    connected session's state.
+    """
+    # One-off costs (imports, the export and mapping) are not charged to the sessions
+    import weather_analyzer
+    if shared:
+        get_shared_dataset(data_file).frame()
+    baseline = _memory_kb()
+    start = time.perf_counter()
+    
+    alive = []
+    threads = [threading.Thread(target=lambda i=i: alive.append(_simulated_session(data_file, shared, i)))
+               for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    after = _memory_kb()
+    return {
+        'mode': 'shared' if shared else 'per-session copy',
+        'sessions': sessions,
+        'seconds': round(time.perf_counter() - start, 2),
+        'rss_growth_per_session_mb': round((after['Rss'] - baseline['Rss']) / sessions / 1024, 2),
+        'private_growth_per_session_mb': round(
+            (after.get('Anonymous', 0) - baseline.get('Anonymous', 0)) / sessions / 1024, 2
+        )
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared-memory weather dataset")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    export_parser = subparsers.add_parser('export', help="Rewrite the dataset's memory-mapped snapshot")
+    export_parser.add_argument('--data-file', default='weather_data.csv')
+    
+    test_parser = subparsers.add_parser('loadtest', help="Measure memory growth per simulated session")
+    test_parser.add_argument('--data-file', default='weather_data.csv')
+    test_parser.add_argument('--sessions', type=int, default=20)
+    test_parser.add_argument('--copy', action='store_true', help="Measure the per-session copy baseline instead")
+    args = parser.parse_args()
+    
+    if args.command == 'export':
+        SharedDataset(args.data_file).export()
+    else:
+        print(json.dumps(load_test(args.data_file, args.sessions, shared=not args.copy), indent=2))
@@ -0,0 +1,176 @@
+import pandas as pd
+import numpy as np
+import glob
+import json
+import os
+import uuid
+from typing import Dict, Optional
+import logging
+from weather_validation import is_validated, stamp
+
+logger = logging.getLogger(__name__)
+
+# Fixed-width metric columns; city is stored as dictionary codes and date as int64 nanoseconds
+NUMERIC_COLUMNS = ['temperature', 'humidity', 'rainfall']
+
+def _code_dtype(n_categories: int) -> np.dtype:
+    """Smallest code dtype, matching what pandas picks for a Categorical (so codes are not copied)"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+def _write_header(header: Dict, path: str):
+    """Write the snapshot header atomically; it is the commit point for column data"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(header, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class DatasetSnapshot:
+    """Memory-mappable binary snapshot of a weather dataset
+    
+    One fixed-width binary file per column (``<base>_snapshot/``) plus a
+    small JSON header with the row count, city dictionary, date range and
+    the store version the snapshot reflects. Rows are ordered by date.
+    Loading maps the files read-only and wraps them as a DataFrame without
+    parsing or copying, so it costs the same for any archive size.
+    """
+    
+    def __init__(self, data_file: str):
+        base, _ = os.path.splitext(data_file)
+        self.snapshot_dir = f"{base}_snapshot"
+        self.header_file = os.path.join(self.snapshot_dir, 'header.json')
+    
+    def _column_path(self, column: str, generation: str) -> str:
+        return os.path.join(self.snapshot_dir, f"{column}-{generation}.bin")
+    
+    def header(self) -> Optional[Dict]:
+        """The current header, or None if no snapshot has been written"""
+        try:
+            with open(self.header_file) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def is_current(self, store_version: str) -> bool:
+        header = self.header()
+        return header is not None and header['store_version'] == store_version
+    
+    @staticmethod
+    def _columns(df: pd.DataFrame, categories: list, code_dtype: np.dtype) -> Dict[str, np.ndarray]:
+        columns = {
+            'city': pd.Categorical(df['city'], categories=categories).codes.astype(code_dtype),
+            'date': df['date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        }
+        columns.update({name: df[name].to_numpy(dtype=np.float64) for name in NUMERIC_COLUMNS})
+        return columns
+    
+    def write(self, df: pd.DataFrame, store_version: str) -> Dict:
+        """Write a complete snapshot of date-ordered, deduplicated rows"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        generation = uuid.uuid4().hex[:12]
+        categories = sorted(df['city'].unique().tolist())
+        columns = self._columns(df, categories, _code_dtype(len(categories)))
+        
+        for name, values in columns.items():
+            with open(self._column_path(name, generation), 'wb') as f:
+                values.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+        
+        header = {
+            'generation': generation,
+            'store_version': store_version,
+            'rows': len(df),
+            'cities': categories,
+            'dtypes': {name: values.dtype.str for name, values in columns.items()},
+            'validated': is_validated(df)
+        }
+        header['start_date'] = df['date'].iloc[0].isoformat() if len(df) else None
+        header['end_date'] = df['date'].iloc[-1].isoformat() if len(df) else None
+        _write_header(header, self.header_file)
+        self._remove_stale_columns(generation)
+        logger.info(f"Wrote snapshot of {len(df):,} records to {self.snapshot_dir}")
+        return header
+    
+    def append(self, df: pd.DataFrame, previous_version: str, store_version: str) -> bool:
+        """Extend the snapshot in place with rows newer than everything in it
+        
+        Returns False when that is not possible (the snapshot does not
+        reflect ``previous_version``, a row is not strictly newer than the
+        snapshot's last date, or the city dictionary outgrows its code
+        width); the snapshot must then be rewritten.
+        """
+        header = self.header()
+        if header is None or header['store_version'] != previous_version:
+            return False
+        if df.empty:
+            header['store_version'] = store_version
+            _write_header(header, self.header_file)
+            return True
+        
+        df = df.sort_values('date', kind='stable')
+        if header['end_date'] and df['date'].iloc[0] <= pd.Timestamp(header['end_date']):
+            return False
+        categories = header['cities'] + sorted(set(df['city']) - set(header['cities']))
+        code_dtype = np.dtype(header['dtypes']['city'])
+        if _code_dtype(len(categories)) != code_dtype:
+            return False
+        
+        # Readers map only header['rows'] rows, so bytes past them are invisible until the header moves
+        for name, values in self._columns(df, categories, code_dtype).items():
+            with open(self._column_path(name, header['generation']), 'r+b') as f:
+                # Drop anything left behind by an append that crashed before its header was written
+                f.truncate(header['rows'] * values.itemsize)
+                f.seek(0, os.SEEK_END)
+                values.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+        
+        header['start_date'] = header['start_date'] or df['date'].iloc[0].isoformat()
+        header['end_date'] = df['date'].iloc[-1].isoformat()
+        header.update({'store_version': store_version, 'rows': header['rows'] + len(df), 'cities': categories})
+        header['validated'] = header.get('validated', False) and is_validated(df)
+        _write_header(header, self.header_file)
+        return True
+    
+    def restamp(self, previous_version: str, store_version: str) -> bool:
+        """Mark an unchanged snapshot as reflecting a new store version (e.g. after compaction)"""
+        return self.append(pd.DataFrame(), previous_version, store_version)
+    
+    def _remove_stale_columns(self, generation: str):
+        for path in glob.glob(os.path.join(self.snapshot_dir, '*.bin')):
+            if not path.endswith(f"-{generation}.bin"):
+                try:
+                    # Processes still mapping old files keep their pages until they reload
+                    os.remove(path)
+                except OSError:
+                    pass
+    
+    def load(self, header: Optional[Dict] = None) -> pd.DataFrame:
+        """Wrap the memory-mapped columns as a read-only DataFrame (city is categorical)
+        
+        The frame is stamped as validated when every row written to the
+        snapshot passed ingest validation.
+        """
+        header = header or self.header()
+        if header is None:
+            raise FileNotFoundError(f"No snapshot found in {self.snapshot_dir}")
+        rows = header['rows']
+        
+        def mapped(name):
+            dtype = header['dtypes'][name]
+            if rows == 0:
+                return np.empty(0, dtype=dtype)
+            return np.memmap(self._column_path(name, header['generation']), dtype=dtype, mode='r', shape=(rows,))
+        
+        data = {
+            'city': pd.Categorical.from_codes(mapped('city'), categories=header['cities']),
+            'date': mapped('date').view('datetime64[ns]')
+        }
+        data.update({name: mapped(name) for name in NUMERIC_COLUMNS})
+        df = pd.DataFrame(data, copy=False)
+        return stamp(df) if header.get('validated', False) else df
@@ -0,0 +1,227 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+import time
+from typing import List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Mean Earth radius (IUGG)
+EARTH_RADIUS_KM = 6371.0088
+
+# Grid cells are this many degrees of latitude and longitude
+DEFAULT_CELL_DEGREES = 1.0
+
+LOCATION_COLUMNS = ['city', 'lat', 'lon']
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km, broadcasting over arrays of degrees"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(values, dtype=np.float64)) for values in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+class CityIndex:
+    """Grid spatial index over city coordinates
+    
+    Cities are bucketed into fixed latitude/longitude cells and stored
+    sorted by cell number, so the cities of a run of adjacent cells in one
+    latitude row are a contiguous slice found by binary search. A bounding
+    box or radius query only computes distances for the cities in the
+    cells it overlaps; longitudes wrap at the antimeridian.
+    """
+    
+    def __init__(self, cities, lat, lon, cell_degrees: float = DEFAULT_CELL_DEGREES):
+        cities = np.asarray(cities, dtype=object)
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        known = ~(np.isnan(lat) | np.isnan(lon))
+        self.cell_degrees = cell_degrees
+        self._rows = int(np.ceil(180 / cell_degrees))
+        self._cols = int(np.ceil(360 / cell_degrees))
+        
+        cells = self._cell(lat[known], lon[known])
+        order = np.argsort(cells, kind='stable')
+        self.cities = cities[known][order]
+        self.lat = lat[known][order]
+        self.lon = lon[known][order]
+        self._cells = cells[order]
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, cell_degrees: float = DEFAULT_CELL_DEGREES) -> 'CityIndex':
+        """Index the latest known coordinates of each city in a frame with city, lat and lon columns"""
+        locations = df[LOCATION_COLUMNS].dropna().drop_duplicates(subset='city', keep='last')
+        return cls(locations['city'].to_numpy(), locations['lat'].to_numpy(), locations['lon'].to_numpy(), cell_degrees)
+    
+    def __len__(self) -> int:
+        return len(self.cities)
+    
+    def _row(self, lat) -> np.ndarray:
+        return np.clip(np.floor((np.asarray(lat) + 90) / self.cell_degrees).astype(np.int64), 0, self._rows - 1)
+    
+    def _col(self, lon) -> np.ndarray:
+        return np.floor((np.asarray(lon) + 180) / self.cell_degrees).astype(np.int64) % self._cols
+    
+    def _cell(self, lat, lon) -> np.ndarray:
+        return self._row(lat) * self._cols + self._col(lon)
+    
+    def _candidates(self, min_lat: float, max_lat: float, lon_ranges: List[Tuple[float, float]]) -> np.ndarray:
+        """Positions of the cities in every cell overlapping the latitude band and longitude ranges"""
+        rows = np.arange(self._row(min_lat), self._row(max_lat) + 1)
+        slices = []
+        for west, east in lon_ranges:
+            first = rows * self._cols + self._col(west)
+            # The eastern edge of the map (lon 180) is the last column, not column 0
+            last = rows * self._cols + min(int(np.floor((east + 180) / self.cell_degrees)), self._cols - 1)
+            starts = np.searchsorted(self._cells, first, side='left')
+            ends = np.searchsorted(self._cells, last, side='right')
+            slices.extend(np.arange(start, end) for start, end in zip(starts, ends) if end > start)
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+    
+    def _frame(self, positions: np.ndarray, distances: Optional[np.ndarray] = None) -> pd.DataFrame:
+        result = pd.DataFrame({'city': self.cities[positions], 'lat': self.lat[positions], 'lon': self.lon[positions]})
+        if distances is not None:
+            result['distance_km'] = distances
+            result = result.sort_values('distance_km', kind='stable')
+        return result.reset_index(drop=True)
+    
+    def in_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> pd.DataFrame:
+        """Cities inside a bounding box; min_lon > max_lon selects a box crossing the antimeridian"""
+        if min_lon <= max_lon:
+            lon_ranges = [(min_lon, max_lon)]
+        else:
+            lon_ranges = [(min_lon, 180.0), (-180.0, max_lon)]
+        positions = self._candidates(min_lat, max_lat, lon_ranges)
+        lat, lon = self.lat[positions], self.lon[positions]
+        inside = (lat >= min_lat) & (lat <= max_lat)
+        if min_lon <= max_lon:
+            inside &= (lon >= min_lon) & (lon <= max_lon)
+        else:
+            inside &= (lon >= min_lon) | (lon <= max_lon)
+        return self._frame(positions[inside])
+    
+    def _radius_candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Cities in the cells overlapping the bounding box of a circle on the sphere"""
+        angle = radius_km / EARTH_RADIUS_KM
+        delta_lat = np.degrees(angle)
+        min_lat, max_lat = lat - delta_lat, lat + delta_lat
+        spread = np.sin(angle) / np.cos(np.radians(lat)) if abs(lat) < 90 else np.inf
+        if min_lat <= -90 or max_lat >= 90 or angle >= np.pi / 2 or spread >= 1:
+            # The circle reaches a pole (or is too wide to bound): every longitude is in range
+            return self._candidates(max(min_lat, -90.0), min(max_lat, 90.0), [(-180.0, 180.0)])
+        delta_lon = np.degrees(np.arcsin(spread))
+        west, east = lon - delta_lon, lon + delta_lon
+        if west < -180:
+            lon_ranges = [(west + 360, 180.0), (-180.0, east)]
+        elif east > 180:
+            lon_ranges = [(west, 180.0), (-180.0, east - 360)]
+        else:
+            lon_ranges = [(west, east)]
+        return self._candidates(min_lat, max_lat, lon_ranges)
+    
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> pd.DataFrame:
+        """Cities within radius_km of a point, nearest first"""
+        positions = self._radius_candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.lat[positions], self.lon[positions])
+        inside = distances <= radius_km
+        return self._frame(positions[inside], distances[inside])
+    
+    def nearest(self, lat: float, lon: float, n: int = 5) -> pd.DataFrame:
+        """The n cities closest to a point, nearest first
+        
+        The search radius starts at one cell and doubles until it holds at
+        least n cities; every city outside it is farther than those inside.
+        """
+        radius_km = np.radians(self.cell_degrees) * EARTH_RADIUS_KM
+        while radius_km < np.pi * EARTH_RADIUS_KM:
+            positions = self._radius_candidates(lat, lon, radius_km)
+            distances = haversine_km(lat, lon, self.lat[positions], self.lon[positions])
+            if np.count_nonzero(distances <= radius_km) >= n:
+                break
+            radius_km *= 2
+        else:
+            positions = np.arange(len(self))
+            distances = haversine_km(lat, lon, self.lat, self.lon)
+        
+        if len(positions) > n:
+            closest = np.argpartition(distances, n - 1)[:n]
+            positions, distances = positions[closest], distances[closest]
+        return self._frame(positions, distances)
+
+class CityLocations:
+    """Coordinates of every city seen in a dataset, kept next to it as ``<base>_cities.csv``"""
+    
+    def __init__(self, data_file: str):
+        base, _ = os.path.splitext(data_file)
+        self.path = f"{base}_cities.csv"
+    
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+    
+    def load(self) -> pd.DataFrame:
+        if not self.exists():
+            return pd.DataFrame(columns=LOCATION_COLUMNS)
+        return pd.read_csv(self.path)
+    
+    def update(self, df: pd.DataFrame):
+        """Record the coordinates of the cities in a batch of observations (no-op without lat/lon columns)"""
+        if not {'lat', 'lon'} <= set(df.columns):
+            return
+        locations = df[LOCATION_COLUMNS].dropna()
+        locations = locations[locations['lat'].between(-90, 90) & locations['lon'].between(-180, 180)]
+        if locations.empty:
+            return
+        
+        known = self.load()
+        merged = pd.concat([known, locations], ignore_index=True) if len(known) else locations
+        merged = merged.drop_duplicates(subset='city', keep='last').sort_values('city').reset_index(drop=True)
+        if merged.equals(known):
+            return
+        tmp_path = f"{self.path}.tmp"
+        merged.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+    
+    def index(self, cell_degrees: float = DEFAULT_CELL_DEGREES) -> CityIndex:
+        return CityIndex.from_frame(self.load(), cell_degrees)
+
+def synthetic_locations(n_cities: int, seed: int = 0) -> pd.DataFrame:
+    """Cities scattered uniformly over the sphere, named like synthetic observations"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'city': [f'City{i:04d}' for i in range(n_cities)],
+        'lat': np.degrees(np.arcsin(rng.uniform(-1, 1, n_cities))),
+        'lon': rng.uniform(-180, 180, n_cities)
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark region queries against a brute-force scan")
+    parser.add_argument('--cities', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--radius-km', type=float, default=250.0)
+    parser.add_argument('--nearest', type=int, default=10)
+    args = parser.parse_args()
+    
+    locations = synthetic_locations(args.cities)
+    start = time.perf_counter()
+    index = CityIndex.from_frame(locations)
+    print(f"Indexed {len(index):,} cities in {(time.perf_counter() - start) * 1000:.1f} ms")
+    
+    points = synthetic_locations(args.queries, seed=1)
+    for name, query, brute in (
+        (f"radius {args.radius_km:g} km",
+         lambda lat, lon: index.within_radius(lat, lon, args.radius_km),
+         lambda lat, lon: np.count_nonzero(haversine_km(lat, lon, locations['lat'], locations['lon']) <= args.radius_km)),
+        (f"nearest {args.nearest}",
+         lambda lat, lon: index.nearest(lat, lon, args.nearest),
+         lambda lat, lon: np.partition(haversine_km(lat, lon, locations['lat'], locations['lon']), args.nearest)[:args.nearest])
+    ):
+        start = time.perf_counter()
+        for lat, lon in zip(points['lat'], points['lon']):
+            query(lat, lon)
+        indexed = (time.perf_counter() - start) / args.queries
+        start = time.perf_counter()
+        for lat, lon in zip(points['lat'], points['lon']):
+            brute(lat, lon)
+        scanned = (time.perf_counter() - start) / args.queries
+        print(f"  {name}: {indexed * 1e6:.0f} us/query indexed, {scanned * 1e6:.0f} us/query full scan")
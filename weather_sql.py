@@ -0,0 +1,481 @@
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import os
+import sqlite3
+import time
+from datetime import date
+from typing import Callable, List, Dict, Optional, Tuple
+import logging
+from weather_rollups import ROLLUP_COLUMNS, finalize_rollup
+
+logger = logging.getLogger(__name__)
+
+# SQLite expressions mapping a timestamp to its bucket label (last day of the period),
+# matching weather_rollups.bucket_dates
+BUCKET_EXPRESSIONS = {
+    'Daily': "date(date)",
+    'Weekly': "date(date, 'weekday 0')",
+    'Monthly': "date(date, 'start of month', '+1 month', '-1 day')",
+    'Yearly': "date(date, 'start of year', '+1 year', '-1 day')"
+}
+
+class SQLiteWeatherBackend:
+    """Embedded SQL storage and query backend for weather observations
+    
+    Observations live in a table clustered on a composite (city, date) key.
+    Summary statistics, rollups and filtered chart inputs are computed with
+    SQL aggregations so only aggregated rows cross into Python. The backend
+    implements the same ``query``/``query_raw`` interface as RollupStore and
+    can be passed to ``WeatherAnalyzer(df, rollups=...)``.
+    """
+    
+    def __init__(self, db_path: str = 'weather_data.db', cities: Optional[List[str]] = None,
+                 start_date: Optional[date] = None, end_date: Optional[date] = None):
+        self.db_path = db_path
+        self.cities = cities
+        self.start_date = start_date
+        self.end_date = end_date
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS observations (
+                city TEXT NOT NULL,
+                date TEXT NOT NULL,
+                temperature REAL,
+                humidity REAL,
+                rainfall REAL,
+                source TEXT,
+                PRIMARY KEY (city, date)
+            ) WITHOUT ROWID
+        """)
+        # Secondary index for date-range scans across all cities
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_observations_date ON observations (date)")
+        # Bookkeeping, e.g. the dataset store version the table mirrors
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    
+    def view(self, cities: Optional[List[str]] = None, start_date: Optional[date] = None,
+             end_date: Optional[date] = None) -> 'SQLiteWeatherBackend':
+        """Backend restricted to a city list and/or date range (shares the database file)
+        
+        ``None`` keeps the current restriction; an empty city list selects no rows.
+        """
+        return SQLiteWeatherBackend(self.db_path, self.cities if cities is None else list(cities),
+                                    start_date or self.start_date, end_date or self.end_date)
+    
+    def row_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM observations").fetchone()[0]
+    
+    def store_version(self) -> Optional[str]:
+        """Version of the dataset store last mirrored by sync_store (None if never)"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'store_version'").fetchone()
+        return row[0] if row else None
+    
+    def _mirrored_layout(self) -> Optional[Dict]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'store_layout'").fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def _record_mirror(self, store_version: str, layout: Optional[Dict]):
+        """Remember the store version and file layout the table reflects (inside the caller's transaction)"""
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('store_version', ?)", (store_version,))
+        if layout is None:
+            self.conn.execute("DELETE FROM meta WHERE key = 'store_layout'")
+        else:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('store_layout', ?)", (json.dumps(layout),))
+    
+    def _insert(self, df: pd.DataFrame, chunk_size: int):
+        """INSERT OR REPLACE the rows in chunks (the caller owns the transaction)"""
+        columns = ['city', 'date', 'temperature', 'humidity', 'rainfall', 'source']
+        for start in range(0, len(df), chunk_size):
+            chunk = df.iloc[start:start + chunk_size]
+            dates = pd.to_datetime(chunk['date']).dt.strftime('%Y-%m-%d %H:%M:%S')
+            source = chunk['source'] if 'source' in chunk else pd.Series(None, index=chunk.index)
+            rows = zip(chunk['city'], dates, chunk['temperature'], chunk['humidity'],
+                       chunk['rainfall'], source)
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO observations ({', '.join(columns)}) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+    
+    def load_dataframe(self, df: pd.DataFrame, chunk_size: int = 500_000):
+        """Insert or replace observations from a DataFrame"""
+        for start in range(0, len(df), chunk_size):
+            with self.conn:
+                self._insert(df.iloc[start:start + chunk_size], chunk_size)
+        logger.info(f"Loaded {len(df)} records into {self.db_path}")
+    
+    def replace_dataframe(self, df: pd.DataFrame, store_version: str, layout: Optional[Dict] = None,
+                          chunk_size: int = 500_000):
+        """Replace every observation with a DataFrame and record the store version it reflects
+        
+        Runs as one transaction, so rows deleted or corrected in the store
+        never linger and readers see either the old or the new table.
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM observations")
+            self._insert(df, chunk_size)
+            self._record_mirror(store_version, layout)
+        logger.info(f"Reloaded {len(df)} records into {self.db_path} (store version {store_version})")
+    
+    def sync_store(self, store, load_frame: Callable[[], pd.DataFrame]) -> str:
+        """Bring the table up to date with a WeatherDataStore; returns 'current', 'appended' or 'reloaded'
+        
+        Segments appended since the last sync are inserted on their own (later
+        rows replace earlier ones, as in the store). After a compaction or a
+        rewrite of the main file the table is reloaded from ``load_frame()``.
+        """
+        version = store.version()
+        if self.store_version() == version:
+            return 'current'
+        layout = store.layout()
+        mirrored = self._mirrored_layout()
+        
+        done = mirrored['segments'] if mirrored else []
+        if mirrored and mirrored['main'] == layout['main'] and layout['segments'][:len(done)] == done:
+            try:
+                new_rows = store.read_segments(layout['segments'][len(done):])
+            except FileNotFoundError:
+                # Compacted since layout() was taken
+                new_rows = None
+            if new_rows is not None:
+                with self.conn:
+                    self._insert(new_rows, 500_000)
+                    self._record_mirror(version, layout)
+                logger.info(f"Appended {len(new_rows)} records to {self.db_path} (store version {version})")
+                return 'appended'
+        
+        self.replace_dataframe(load_frame(), version, layout)
+        return 'reloaded'
+    
+    def overview(self) -> Dict:
+        """Row count, sorted city list and date range (the keys the dashboard reads from the snapshot header)"""
+        totals = self.totals()
+        where, params = self._where()
+        cities = [row[0] for row in self.conn.execute(
+            f"SELECT DISTINCT city FROM observations {where} ORDER BY city", params
+        )]
+        return {'rows': totals['rows'], 'cities': cities,
+                'start_date': totals['start_date'], 'end_date': totals['end_date']}
+    
+    def _where(self, cities: Optional[List[str]] = None) -> Tuple[str, list]:
+        """WHERE clause for the view's city list and date range"""
+        clauses, params = [], []
+        if cities is None:
+            cities = self.cities
+        elif self.cities is not None:
+            cities = [city for city in cities if city in self.cities]
+        if cities is not None:
+            if cities:
+                clauses.append(f"city IN ({', '.join('?' * len(cities))})")
+                params.extend(cities)
+            else:
+                # An empty selection (or no overlap with the view) matches nothing, not everything
+                clauses.append("0")
+        if self.start_date:
+            clauses.append("date >= ?")
+            params.append(f"{self.start_date:%Y-%m-%d} 00:00:00")
+        if self.end_date:
+            clauses.append("date <= ?")
+            params.append(f"{self.end_date:%Y-%m-%d} 23:59:59")
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+    
+    def filtered(self, cities: Optional[List[str]] = None) -> pd.DataFrame:
+        """Raw observations for the view (an index range scan per city)"""
+        where, params = self._where(cities)
+        df = pd.read_sql_query(
+            f"SELECT city, date, temperature, humidity, rainfall, source FROM observations {where} ORDER BY date",
+            self.conn, params=params
+        )
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+    
+    def query_raw(self, granularity: str, cities: Optional[List[str]] = None) -> pd.DataFrame:
+        """Mergeable rollup (sum/count/min/max per metric) computed in SQL"""
+        where, params = self._where(cities)
+        parts = ', '.join(
+            f"SUM({m}) AS {m}_sum, COUNT({m}) AS {m}_count, MIN({m}) AS {m}_min, MAX({m}) AS {m}_max"
+            for m in ('temperature', 'humidity', 'rainfall')
+        )
+        rollup = pd.read_sql_query(
+            f"SELECT city, {BUCKET_EXPRESSIONS[granularity]} AS date, {parts} "
+            f"FROM observations {where} GROUP BY city, 2 ORDER BY city, 2",
+            self.conn, params=params
+        )
+        rollup['date'] = pd.to_datetime(rollup['date'])
+        return rollup[ROLLUP_COLUMNS]
+    
+    def query(self, granularity: str, cities: Optional[List[str]] = None) -> pd.DataFrame:
+        """Chart-ready aggregated rows for a granularity"""
+        return finalize_rollup(self.query_raw(granularity, cities))
+    
+    def _extreme_row(self, column: str, order: str) -> Optional[pd.Series]:
+        where, params = self._where()
+        rows = pd.read_sql_query(
+            f"SELECT city, date, temperature, humidity, rainfall, source FROM observations {where} "
+            f"ORDER BY {column} {order} LIMIT 1",
+            self.conn, params=params
+        )
+        if rows.empty:
+            return None
+        row = rows.iloc[0].copy()
+        row['date'] = pd.Timestamp(row['date'])
+        return row
+    
+    def totals(self) -> Dict:
+        """Row count, date range, humidity range and rainfall totals of the view, in one SQL scan"""
+        where, params = self._where()
+        row = self.conn.execute(
+            f"SELECT COUNT(*), MIN(date), MAX(date), MIN(humidity), MAX(humidity), "
+            f"TOTAL(rainfall), SUM(rainfall > 0) FROM observations {where}",
+            params
+        ).fetchone()
+        return {
+            'rows': row[0],
+            'start_date': pd.Timestamp(row[1]) if row[1] else None,
+            'end_date': pd.Timestamp(row[2]) if row[2] else None,
+            'humidity_min': row[3],
+            'humidity_max': row[4],
+            'rainfall_total': row[5],
+            'rainy_rows': row[6] or 0
+        }
+    
+    def calculate_summary_statistics(self) -> Dict:
+        """Same structure as WeatherAnalyzer.calculate_summary_statistics, computed in SQL"""
+        where, params = self._where()
+        stats = {}
+        
+        city_stats = pd.read_sql_query(f"""
+            SELECT city,
+                   AVG(temperature) AS temp_mean, MIN(temperature) AS temp_min, MAX(temperature) AS temp_max,
+                   AVG(humidity) AS hum_mean, MIN(humidity) AS hum_min, MAX(humidity) AS hum_max,
+                   SUM(rainfall) AS rain_sum, AVG(rainfall) AS rain_mean,
+                   SUM(temperature) AS temp_sum, COUNT(temperature) AS temp_count,
+                   SUM(humidity) AS hum_sum, COUNT(humidity) AS hum_count
+            FROM observations {where}
+            GROUP BY city ORDER BY city
+        """, self.conn, params=params).set_index('city').astype(float)
+        
+        # Average temperature per city
+        stats['avg_temp_by_city'] = city_stats['temp_mean'].rename('temperature').round(2)
+        
+        # Temperature statistics (NaN for a view that selects no rows)
+        with np.errstate(invalid='ignore'):
+            overall_temperature = city_stats['temp_sum'].sum() / city_stats['temp_count'].sum()
+            overall_humidity = city_stats['hum_sum'].sum() / city_stats['hum_count'].sum()
+        stats['temp_stats'] = {
+            'overall_avg': round(overall_temperature, 2),
+            'overall_max': round(city_stats['temp_max'].max(), 2),
+            'overall_min': round(city_stats['temp_min'].min(), 2)
+        }
+        
+        # Humidity statistics
+        stats['humidity_stats'] = {
+            'max_humidity': self._extreme_row('humidity', 'DESC'),
+            'min_humidity': self._extreme_row('humidity', 'ASC'),
+            'avg_humidity': round(overall_humidity, 2)
+        }
+        
+        # Rainfall statistics
+        monthly = pd.read_sql_query(
+            f"SELECT substr(date, 1, 7) AS month_year, SUM(rainfall) AS rainfall FROM observations {where} "
+            f"GROUP BY 1 ORDER BY 1",
+            self.conn, params=params
+        )
+        stats['rainfall_by_month'] = pd.Series(
+            monthly['rainfall'].to_numpy(dtype=float),
+            index=pd.PeriodIndex(monthly['month_year'], freq='M', name='month_year'),
+            name='rainfall'
+        ).round(2)
+        
+        # City-wise statistics
+        stats['city_statistics'] = pd.DataFrame({
+            ('temperature', 'mean'): city_stats['temp_mean'],
+            ('temperature', 'min'): city_stats['temp_min'],
+            ('temperature', 'max'): city_stats['temp_max'],
+            ('humidity', 'mean'): city_stats['hum_mean'],
+            ('humidity', 'min'): city_stats['hum_min'],
+            ('humidity', 'max'): city_stats['hum_max'],
+            ('rainfall', 'sum'): city_stats['rain_sum'],
+            ('rainfall', 'mean'): city_stats['rain_mean']
+        }).round(2)
+        
+        return stats
+    
+    def close(self):
+        self.conn.close()
+
+def _synthetic_chunk(rng: np.random.Generator, cities: np.ndarray, start: int, size: int,
+                     days_per_city: int) -> pd.DataFrame:
+    """Rows [start, start + size) of a synthetic archive ordered by city then day"""
+    index = np.arange(start, start + size)
+    day = index % days_per_city
+    dates = np.datetime64('2000-01-01') + day.astype('timedelta64[D]')
+    return pd.DataFrame({
+        'city': cities[index // days_per_city],
+        'date': dates,
+        'temperature': np.round(rng.normal(20, 8, size), 1),
+        'humidity': np.round(rng.uniform(10, 100, size), 1),
+        'rainfall': np.where(rng.random(size) < 0.3, np.round(rng.exponential(4, size), 1), 0.0),
+        'source': 'synthetic'
+    })
+
+def _frame_totals(df: pd.DataFrame) -> Dict:
+    """pandas equivalent of SQLiteWeatherBackend.totals"""
+    return {
+        'rows': len(df),
+        'start_date': df['date'].min(),
+        'end_date': df['date'].max(),
+        'humidity_min': df['humidity'].min(),
+        'humidity_max': df['humidity'].max(),
+        'rainfall_total': df['rainfall'].sum(),
+        'rainy_rows': int((df['rainfall'] > 0).sum())
+    }
+
+def _merge_totals(a: Optional[Dict], b: Dict) -> Dict:
+    if a is None:
+        return b
+    return {
+        'rows': a['rows'] + b['rows'],
+        'start_date': min(a['start_date'], b['start_date']),
+        'end_date': max(a['end_date'], b['end_date']),
+        'humidity_min': min(a['humidity_min'], b['humidity_min']),
+        'humidity_max': max(a['humidity_max'], b['humidity_max']),
+        'rainfall_total': a['rainfall_total'] + b['rainfall_total'],
+        'rainy_rows': a['rainy_rows'] + b['rainy_rows']
+    }
+
+def benchmark(rows: int, db_path: str = 'benchmark_weather.db', n_cities: int = 2000,
+              chunk_size: int = 1_000_000, pandas_limit: int = 50_000_000, view_cities: int = 3) -> Dict:
+    """Time the backend's dashboard queries against the pandas path on the same rows
+    
+    The SQLite side runs the methods the dashboard calls: totals() and
+    calculate_summary_statistics() over every city, and query_raw() per
+    granularity for a view of the first ``view_cities`` cities. Up to
+    ``pandas_limit`` rows the pandas side is WeatherAnalyzer over one
+    in-memory frame; above it the same results are computed chunk by chunk
+    and merged, so both sides are timed at any size.
+    """
+    from weather_analyzer import WeatherAnalyzer
+    from weather_rollups import ROLLUP_ORDER, compute_rollup, merge_rollups, summarize_rollups
+    from weather_validation import stamp
+    
+    rng = np.random.default_rng(42)
+    cities = np.array([f'City{i:04d}' for i in range(n_cities)])
+    selected = list(cities[:view_cities])
+    days_per_city = max(rows // n_cities, 1)
+    rows = days_per_city * n_cities
+    in_memory = rows <= pandas_limit
+    
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    backend = SQLiteWeatherBackend(db_path)
+    operations = ['totals', 'calculate_summary_statistics'] + [f'query_raw:{g}' for g in ROLLUP_ORDER]
+    pandas_seconds = dict.fromkeys(operations, 0.0)
+    
+    # Chunked pandas state: merged rollups, totals and the rows holding the humidity extremes
+    full_rollups = {g: pd.DataFrame(columns=ROLLUP_COLUMNS) for g in ('Yearly', 'Monthly')}
+    view_rollups = {g: pd.DataFrame(columns=ROLLUP_COLUMNS) for g in ROLLUP_ORDER}
+    totals = extremes = None
+    
+    load_seconds = 0.0
+    frames = []
+    for offset in range(0, rows, chunk_size):
+        chunk = _synthetic_chunk(rng, cities, offset, min(chunk_size, rows - offset), days_per_city)
+        start = time.perf_counter()
+        backend.load_dataframe(chunk)
+        load_seconds += time.perf_counter() - start
+        if in_memory:
+            frames.append(chunk)
+            continue
+        
+        start = time.perf_counter()
+        totals = _merge_totals(totals, _frame_totals(chunk))
+        pandas_seconds['totals'] += time.perf_counter() - start
+        
+        start = time.perf_counter()
+        for granularity, rollup in full_rollups.items():
+            full_rollups[granularity] = merge_rollups(rollup, compute_rollup(chunk, granularity))
+        best = (chunk.loc[chunk['humidity'].idxmax()], chunk.loc[chunk['humidity'].idxmin()])
+        if extremes is None:
+            extremes = best
+        else:
+            # Ties keep the earlier row, as idxmax/idxmin do over the whole frame
+            extremes = (best[0] if best[0]['humidity'] > extremes[0]['humidity'] else extremes[0],
+                        best[1] if best[1]['humidity'] < extremes[1]['humidity'] else extremes[1])
+        pandas_seconds['calculate_summary_statistics'] += time.perf_counter() - start
+        
+        view_chunk = chunk[chunk['city'].isin(selected)]
+        for granularity in ROLLUP_ORDER:
+            start = time.perf_counter()
+            view_rollups[granularity] = merge_rollups(view_rollups[granularity], compute_rollup(view_chunk, granularity))
+            pandas_seconds[f'query_raw:{granularity}'] += time.perf_counter() - start
+    
+    if in_memory:
+        df = stamp(pd.concat(frames, ignore_index=True))
+        del frames
+        start = time.perf_counter()
+        _frame_totals(df)
+        pandas_seconds['totals'] = time.perf_counter() - start
+        start = time.perf_counter()
+        WeatherAnalyzer(df).calculate_summary_statistics()
+        pandas_seconds['calculate_summary_statistics'] = time.perf_counter() - start
+        view = df[df['city'].isin(selected)]
+        for granularity in ROLLUP_ORDER:
+            start = time.perf_counter()
+            compute_rollup(view, granularity)
+            pandas_seconds[f'query_raw:{granularity}'] = time.perf_counter() - start
+    else:
+        start = time.perf_counter()
+        summarize_rollups(full_rollups['Yearly'], full_rollups['Monthly'], *extremes)
+        pandas_seconds['calculate_summary_statistics'] += time.perf_counter() - start
+    
+    sqlite_seconds = {}
+    start = time.perf_counter()
+    backend.totals()
+    sqlite_seconds['totals'] = time.perf_counter() - start
+    start = time.perf_counter()
+    backend.calculate_summary_statistics()
+    sqlite_seconds['calculate_summary_statistics'] = time.perf_counter() - start
+    view_backend = backend.view(selected)
+    for granularity in ROLLUP_ORDER:
+        start = time.perf_counter()
+        view_backend.query_raw(granularity)
+        sqlite_seconds[f'query_raw:{granularity}'] = time.perf_counter() - start
+    view_backend.close()
+    backend.close()
+    
+    return {
+        'rows': rows,
+        'view_cities': selected,
+        'load_seconds': round(load_seconds, 2),
+        'pandas_mode': 'in-memory' if in_memory else f'chunked ({chunk_size:,} rows per chunk, above pandas_limit={pandas_limit:,})',
+        'operations': {
+            operation: {'sqlite_seconds': round(sqlite_seconds[operation], 3),
+                        'pandas_seconds': round(pandas_seconds[operation], 3)}
+            for operation in operations
+        }
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite backend for the weather dataset")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    load_parser = subparsers.add_parser('load', help="Load the dataset store into SQLite")
+    load_parser.add_argument('--input', default='weather_data.csv')
+    load_parser.add_argument('--db', default='weather_data.db')
+    
+    bench_parser = subparsers.add_parser('benchmark', help="Time the backend's dashboard queries against pandas")
+    bench_parser.add_argument('--rows', type=int, default=100_000_000)
+    bench_parser.add_argument('--cities', type=int, default=2000)
+    bench_parser.add_argument('--db', default='benchmark_weather.db')
+    bench_parser.add_argument('--pandas-limit', type=int, default=50_000_000,
+                              help="Largest row count to time pandas on one in-memory frame; larger runs are chunked")
+    
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    
+    if args.command == 'load':
+        from weather_store import WeatherDataStore
+        SQLiteWeatherBackend(args.db).load_dataframe(WeatherDataStore(args.input).read())
+    else:
+        print(json.dumps(benchmark(args.rows, args.db, args.cities, pandas_limit=args.pandas_limit), indent=2))
@@ -0,0 +1,251 @@
+import pandas as pd
+import os
+import json
+import glob
+import hashlib
+from typing import Dict, List
+import logging
+from weather_archive import ColumnarArchive
+from weather_rollups import RollupStore
+from weather_snapshot import DatasetSnapshot
+from weather_spatial import CityLocations
+from weather_validation import QuarantineStore, is_validated, stamp, validate
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMNS = ['city', 'date']
+
+def _atomic_write_csv(df: pd.DataFrame, path: str):
+    """Write a CSV to a temporary file, fsync it and rename it into place"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', newline='') as f:
+        df.to_csv(f, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _atomic_write_json(data: Dict, path: str):
+    """Write a JSON document atomically"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class WeatherDataStore:
+    """Append-only, segment-based weather dataset with periodic compaction
+    
+    The main CSV holds compacted data. Every append is written as a new,
+    immutable segment file next to it, so ingesting new observations costs
+    O(new data) and a crash can never leave a torn main file. Reads merge the
+    main file with all segments and deduplicate on (city, date), keeping the
+    most recently written row. Compaction folds the segments back into the
+    main file once enough of them have accumulated.
+    
+    Every incoming batch is validated before it is stored: rows breaking a
+    rule go to the quarantine file with their reasons, and the manifest
+    records that the stored rows are validated so readers can skip checks.
+    """
+    
+    def __init__(self, data_file: str = 'weather_data.csv', compact_threshold: int = 32):
+        self.data_file = data_file
+        self.compact_threshold = compact_threshold
+        base, _ = os.path.splitext(data_file)
+        self.segment_dir = f"{base}_segments"
+        self.manifest_file = os.path.join(self.segment_dir, 'manifest.json')
+        self.rollups = RollupStore(data_file)
+        self.snapshot = DatasetSnapshot(data_file)
+        self.quarantine = QuarantineStore(data_file)
+        # City coordinates for region queries (the snapshot keeps only the fixed columns)
+        self.locations = CityLocations(data_file)
+        # Compressed columnar copy for long-term storage, written on request
+        self.archive = ColumnarArchive(data_file)
+    
+    def exists(self) -> bool:
+        """Check whether the store holds any data"""
+        return os.path.exists(self.data_file) or bool(self._segment_files())
+    
+    def version(self) -> str:
+        """Signature of the files backing the dataset; changes on every write, append or compaction"""
+        parts = []
+        for path in [self.data_file] + self._segment_files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Not written yet, or a segment removed by a concurrent compaction
+                continue
+            parts.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+        return hashlib.sha1(';'.join(parts).encode()).hexdigest()[:16]
+    
+    def layout(self) -> Dict:
+        """Size/mtime signature of the main file and the sealed segment names in write order"""
+        try:
+            stat = os.stat(self.data_file)
+            main = f"{stat.st_size}:{stat.st_mtime_ns}"
+        except FileNotFoundError:
+            main = None
+        return {'main': main, 'segments': [os.path.basename(path) for path in self._segment_files()]}
+    
+    def read_segments(self, names: List[str]) -> pd.DataFrame:
+        """Rows of the named segments in write order (validated at ingest, not deduplicated)
+        
+        Raises FileNotFoundError if a compaction removed one of them.
+        """
+        frames = [pd.read_csv(os.path.join(self.segment_dir, name)) for name in names]
+        if not frames:
+            return pd.DataFrame(columns=KEY_COLUMNS)
+        df = pd.concat(frames, ignore_index=True)
+        df['date'] = pd.to_datetime(df['date'], format='ISO8601')
+        return df
+    
+    def _segment_files(self) -> List[str]:
+        """Sealed segment files in write order"""
+        return sorted(glob.glob(os.path.join(self.segment_dir, 'segment-*.csv')))
+    
+    def _next_segment_path(self) -> str:
+        segments = self._segment_files()
+        if segments:
+            last = os.path.basename(segments[-1])
+            seq = int(last[len('segment-'):-len('.csv')]) + 1
+        else:
+            seq = 0
+        return os.path.join(self.segment_dir, f"segment-{seq:08d}.csv")
+    
+    def _load_manifest(self) -> Dict:
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file) as f:
+                return json.load(f)
+        # A store without a manifest is either empty or predates validation at ingest
+        return {'watermarks': {}, 'rollups_stale': False, 'validated': not os.path.exists(self.data_file)}
+    
+    def _save_manifest(self, manifest: Dict):
+        os.makedirs(self.segment_dir, exist_ok=True)
+        _atomic_write_json(manifest, self.manifest_file)
+    
+    @staticmethod
+    def _watermarks(df: pd.DataFrame) -> Dict[str, str]:
+        """Latest timestamp stored for each city"""
+        if df.empty:
+            return {}
+        latest = df.groupby('city')['date'].max()
+        return {city: ts.isoformat() for city, ts in latest.items()}
+    
+    def _prepare(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Valid rows of an incoming batch (typed and deduplicated); the rest are quarantined"""
+        if is_validated(df):
+            return df.drop_duplicates(subset=KEY_COLUMNS, keep='last')
+        valid, rejected, _ = validate(df)
+        self.quarantine.append(rejected)
+        return valid
+    
+    def append(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Append new observations as a sealed segment (O(new data))
+        
+        Returns the rows that were stored; rows failing validation are
+        quarantined instead.
+        """
+        if df.empty:
+            return df
+        
+        df = self._prepare(df)
+        if df.empty:
+            return df
+        previous_version = self.version()
+        manifest = self._load_manifest()
+        watermarks = manifest['watermarks']
+        
+        # Rows newer than the city's watermark cannot be duplicates of stored rows
+        known = df['city'].map(watermarks)
+        cutoff = pd.to_datetime(known, format='ISO8601')
+        fresh_mask = known.isna() | (df['date'] > cutoff)
+        fresh = df[fresh_mask]
+        
+        # Rollups miss this batch until its partials are written; a crash in between leaves them marked stale
+        stale = manifest.get('rollups_stale', False)
+        manifest['rollups_stale'] = True
+        self._save_manifest(manifest)
+        
+        os.makedirs(self.segment_dir, exist_ok=True)
+        segment_path = self._next_segment_path()
+        _atomic_write_csv(df, segment_path)
+        self.rollups.update(fresh)
+        
+        # Late or replayed rows may replace stored ones; rollups are rebuilt on compaction
+        manifest['rollups_stale'] = stale or not fresh_mask.all()
+        watermarks.update(self._watermarks(fresh))
+        self._save_manifest(manifest)
+        self.locations.update(df)
+        
+        # Rows newer than the whole snapshot extend it in place; otherwise it is rewritten on compaction
+        if not self.snapshot.append(df, previous_version, self.version()):
+            logger.info("Snapshot is behind the store until the next compaction")
+        
+        logger.info(f"Appended {len(df)} records to {os.path.basename(segment_path)}")
+        
+        if len(self._segment_files()) >= self.compact_threshold:
+            self.compact()
+        return df
+    
+    def rollups_current(self) -> bool:
+        """Whether the rollups exactly reflect the stored data"""
+        return self.rollups.exists() and not self._load_manifest().get('rollups_stale', False)
+    
+    def read(self) -> pd.DataFrame:
+        """Read the main file merged with all segments, deduplicated on (city, date)"""
+        frames = []
+        if os.path.exists(self.data_file):
+            frames.append(pd.read_csv(self.data_file))
+        frames.extend(pd.read_csv(path) for path in self._segment_files())
+        
+        if not frames:
+            raise FileNotFoundError(f"No weather data found at {self.data_file}")
+        
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        df['date'] = pd.to_datetime(df['date'], format='ISO8601')
+        if len(frames) > 1:
+            df = df.drop_duplicates(subset=KEY_COLUMNS, keep='last')
+        df = df.sort_values('date', kind='stable').reset_index(drop=True)
+        return stamp(df) if self._load_manifest().get('validated', False) else df
+    
+    def compact(self):
+        """Fold all sealed segments into the main file"""
+        segments = self._segment_files()
+        if not segments:
+            return
+        
+        previous_version = self.version()
+        df = self.read()
+        if not is_validated(df):
+            # Rows stored before validation at ingest are checked once, here
+            df, rejected, _ = validate(df)
+            self.quarantine.append(rejected)
+        _atomic_write_csv(df, self.data_file)
+        for path in segments:
+            os.remove(path)
+        
+        # Compaction does not change the rows, so a current snapshot only needs its version updated
+        if not (self.snapshot.restamp(previous_version, self.version()) and self.snapshot.header().get('validated')):
+            self.snapshot.write(df, self.version())
+        
+        # Rebuilding here also repairs rollups after late rows or an interrupted append
+        self.rollups.rebuild(df)
+        self._save_manifest({'watermarks': self._watermarks(df), 'rollups_stale': False, 'validated': True})
+        
+        logger.info(f"Compacted {len(segments)} segments into {self.data_file} ({len(df)} records)")
+    
+    def write(self, df: pd.DataFrame):
+        """Replace the whole dataset (used when generating a fresh archive)"""
+        df = self._prepare(df)
+        _atomic_write_csv(df, self.data_file)
+        for path in self._segment_files():
+            os.remove(path)
+        self.rollups.rebuild(df)
+        self.locations.update(df)
+        self.snapshot.write(df.sort_values('date', kind='stable').reset_index(drop=True), self.version())
+        self._save_manifest({'watermarks': self._watermarks(df), 'rollups_stale': False, 'validated': True})
+        logger.info(f"Wrote {len(df)} records to {self.data_file}")
+    
+    def export_archive(self) -> Dict:
+        """Write the whole dataset (main file and segments) to the compressed columnar archive"""
+        return self.archive.write(self.read(), self.version())
@@ -0,0 +1,166 @@
+import argparse
+import json
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+
+class StubWeatherServer:
+    """Local stand-in for the OpenWeatherMap endpoints used by WeatherDataCollector
+    
+    Serves deterministic synthetic data for /data/2.5/weather,
+    /data/2.5/forecast, /geo/1.0/direct and /data/3.0/onecall/day_summary, with optional
+    injected latency and error rate. Point a collector at it with
+    ``WeatherDataCollector(api_key='stub', api_root=server.api_root)``.
+    """
+    
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 error_rate: float = 0.0, unknown_cities=()):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.unknown_cities = set(unknown_cities)
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng(0)
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def api_root(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self) -> 'StubWeatherServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc):
+        self.stop()
+    
+    @staticmethod
+    def _city_seed(city: str) -> int:
+        return zlib.crc32(city.encode())
+    
+    def _coordinates(self, city: str) -> Dict:
+        seed = self._city_seed(city)
+        return {'lat': round((seed % 18000) / 100 - 90, 4), 'lon': round((seed // 18000 % 36000) / 100 - 180, 4)}
+    
+    def _daily_values(self, city: str, day: datetime) -> Dict:
+        """Seasonal temperature/humidity/rainfall that depend only on city and date"""
+        rng = np.random.default_rng(self._city_seed(city) + day.toordinal())
+        base = 10 + self._city_seed(city) % 20
+        seasonal = 8 * np.sin(2 * np.pi * (day.timetuple().tm_yday - 100) / 365.25)
+        temperature = base + seasonal + rng.normal(0, 2)
+        return {
+            'temperature': round(float(temperature), 1),
+            'humidity': round(float(np.clip(rng.normal(65, 15), 5, 100)), 1),
+            'rainfall': round(float(rng.exponential(4)) if rng.random() < 0.3 else 0.0, 1)
+        }
+    
+    def _forecast_points(self, city: str, steps: int = 40) -> List[Dict]:
+        """3-hourly forecast from the next 3-hour mark: the daily values plus a diurnal cycle and noise"""
+        now = time.time()
+        first = (int(now) // 10800 + 1) * 10800
+        points = []
+        for step in range(steps):
+            dt = first + step * 10800
+            valid = datetime.fromtimestamp(dt, timezone.utc)
+            values = self._daily_values(city, valid)
+            rng = np.random.default_rng(self._city_seed(city) + dt // 10800)
+            diurnal = 4 * np.sin(2 * np.pi * (valid.hour - 9) / 24)
+            point = {
+                'dt': dt,
+                'dt_txt': valid.strftime('%Y-%m-%d %H:%M:%S'),
+                'main': {'temp': round(float(values['temperature'] + diurnal + rng.normal(0, 1)), 2),
+                         'humidity': int(np.clip(values['humidity'] + rng.normal(0, 5), 5, 100))}
+            }
+            if values['rainfall']:
+                point['rain'] = {'3h': round(values['rainfall'] / 8 * rng.uniform(0.5, 1.5), 2)}
+            points.append(point)
+        return points
+    
+    def _respond(self, path: str, params: Dict) -> Tuple[int, object]:
+        city = params.get('q', params.get('id', ['']))[0]
+        if path == '/data/2.5/weather':
+            if city in self.unknown_cities:
+                return 404, {'cod': '404', 'message': 'city not found'}
+            values = self._daily_values(city, datetime.now())
+            return 200, {
+                'name': city,
+                'coord': self._coordinates(city),
+                'main': {'temp': values['temperature'], 'humidity': values['humidity']},
+                'rain': {'1h': values['rainfall']} if values['rainfall'] else {}
+            }
+        if path == '/data/2.5/forecast':
+            if city in self.unknown_cities:
+                return 404, {'cod': '404', 'message': 'city not found'}
+            return 200, {'city': {'name': city, 'coord': self._coordinates(city)}, 'list': self._forecast_points(city)}
+        if path == '/geo/1.0/direct':
+            if city in self.unknown_cities:
+                return 200, []
+            return 200, [dict(name=city, **self._coordinates(city))]
+        if path == '/data/3.0/onecall/day_summary':
+            lat, lon = float(params['lat'][0]), float(params['lon'][0])
+            day = datetime.strptime(params['date'][0], '%Y-%m-%d')
+            values = self._daily_values(f"{lat},{lon}", day)
+            t = values['temperature']
+            return 200, {
+                'lat': lat, 'lon': lon, 'date': params['date'][0],
+                'temperature': {'min': t - 4, 'max': t + 4, 'morning': t - 2,
+                                'afternoon': t + 3, 'evening': t + 1, 'night': t - 2},
+                'humidity': {'afternoon': values['humidity']},
+                'precipitation': {'total': values['rainfall']}
+            }
+        return 404, {'cod': '404', 'message': 'unknown endpoint'}
+    
+    def _make_handler(self):
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def do_GET(self):
+                with stub._lock:
+                    stub.request_count += 1
+                    fail = stub.error_rate and stub._rng.random() < stub.error_rate
+                if stub.latency:
+                    time.sleep(stub.latency)
+                
+                parsed = urlparse(self.path)
+                if fail:
+                    status, payload = 500, {'cod': '500', 'message': 'injected error'}
+                else:
+                    status, payload = stub._respond(parsed.path, parse_qs(parsed.query))
+                
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        
+        return Handler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stub of the OpenWeatherMap API")
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help="Injected latency per request in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    args = parser.parse_args()
+    
+    server = StubWeatherServer(port=args.port, latency=args.latency, error_rate=args.error_rate)
+    print(f"Stub API listening on {server.api_root}")
+    server._server.serve_forever()
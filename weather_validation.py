@@ -0,0 +1,191 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import logging
+from weather_metrics import increment
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMNS = ['city', 'date']
+
+# Columns of the quarantine file: the observation fields, then why and when each row was rejected
+QUARANTINE_COLUMNS = ['city', 'date', 'temperature', 'humidity', 'rainfall', 'lat', 'lon', 'source',
+                      'reasons', 'quarantined_at']
+
+# Plausible ranges for a single observation
+TEMPERATURE_RANGE = (-90.0, 60.0)
+# Readings in this band are far outside Celsius but typical in Kelvin (-93 to 67 °C)
+KELVIN_RANGE = (180.0, 340.0)
+HUMIDITY_RANGE = (0.0, 100.0)
+MAX_RAINFALL = 1000.0
+
+# Observations dated further ahead than this are rejected (clock skew allowance)
+FUTURE_TOLERANCE = pd.Timedelta(days=1)
+
+# Validation rules, in bit order; a row's violations are stored as a bitmask
+RULES = [
+    'missing_city',
+    'invalid_date',
+    'future_date',
+    'missing_temperature',
+    'temperature_kelvin',
+    'temperature_out_of_range',
+    'missing_humidity',
+    'humidity_out_of_range',
+    'rainfall_negative',
+    'rainfall_out_of_range',
+    'duplicate'
+]
+
+# DataFrame.attrs key marking a frame whose rows have all passed validation
+VALIDATED_ATTR = 'weather_validated'
+
+def stamp(df: pd.DataFrame) -> pd.DataFrame:
+    """Mark a frame as validated (dates are datetime64, metrics numeric, no rule violations)"""
+    df.attrs[VALIDATED_ATTR] = True
+    return df
+
+def is_validated(df: pd.DataFrame) -> bool:
+    return bool(df.attrs.get(VALIDATED_ATTR, False))
+
+def violation_masks(df: pd.DataFrame, now: Optional[pd.Timestamp] = None) -> Tuple[np.ndarray, pd.DataFrame]:
+    """Bitmask of rule violations per row (see RULES) and the rows with coerced types
+    
+    Every rule is a vectorized comparison over whole columns; there is no
+    per-row Python work.
+    """
+    coerced = df.copy()
+    dates = coerced['date']
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format='ISO8601', errors='coerce')
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert(None)
+    coerced['date'] = dates
+    for column in ('temperature', 'humidity', 'rainfall'):
+        coerced[column] = pd.to_numeric(coerced[column], errors='coerce')
+    
+    temperature = coerced['temperature'].to_numpy(dtype=np.float64)
+    humidity = coerced['humidity'].to_numpy(dtype=np.float64)
+    rainfall = coerced['rainfall'].to_numpy(dtype=np.float64)
+    date_values = dates.to_numpy(dtype='datetime64[ns]')
+    now = now if now is not None else pd.Timestamp.now()
+    
+    # String checks run once per distinct city name, not once per row
+    codes, names = pd.factorize(coerced['city'])
+    blank_names = np.asarray(pd.Index(names).astype(str).str.strip() == '', dtype=bool)
+    missing_city = (codes < 0) | np.append(blank_names, False)[codes]
+    
+    kelvin = (temperature >= KELVIN_RANGE[0]) & (temperature <= KELVIN_RANGE[1])
+    # Later rows win, as in the store, so only the rows they supersede are flagged
+    keys = pd.DataFrame({'city': codes, 'date': date_values.view(np.int64)})
+    duplicate = keys.duplicated(keep='last').to_numpy()
+    checks = {
+        'missing_city': missing_city,
+        'invalid_date': np.isnat(date_values),
+        'future_date': date_values > (now + FUTURE_TOLERANCE).to_datetime64(),
+        'missing_temperature': np.isnan(temperature),
+        'temperature_kelvin': kelvin,
+        'temperature_out_of_range': ~kelvin & ((temperature < TEMPERATURE_RANGE[0]) | (temperature > TEMPERATURE_RANGE[1])),
+        'missing_humidity': np.isnan(humidity),
+        'humidity_out_of_range': (humidity < HUMIDITY_RANGE[0]) | (humidity > HUMIDITY_RANGE[1]),
+        'rainfall_negative': rainfall < 0,
+        'rainfall_out_of_range': rainfall > MAX_RAINFALL,
+        'duplicate': duplicate
+    }
+    
+    masks = np.zeros(len(df), dtype=np.uint16)
+    for bit, rule in enumerate(RULES):
+        masks |= checks[rule].astype(np.uint16) << bit
+    return masks, coerced
+
+def describe(masks: np.ndarray) -> np.ndarray:
+    """Comma-separated rule names for each bitmask"""
+    unique, inverse = np.unique(masks, return_inverse=True)
+    names = np.array([','.join(rule for bit, rule in enumerate(RULES) if mask >> bit & 1) for mask in unique], dtype=object)
+    return names[inverse.ravel()]
+
+def validate(df: pd.DataFrame, now: Optional[pd.Timestamp] = None) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, int]]:
+    """Split observations into valid rows and rejected rows with their reasons
+    
+    Returns the valid rows (typed, stamped as validated), the rejected rows
+    as received plus a ``reasons`` column, and the violation count per rule.
+    Missing rainfall is not a violation; it counts as no rain.
+    """
+    masks, coerced = violation_masks(df, now)
+    rejected = masks != 0
+    counts = {rule: int(np.count_nonzero(masks >> bit & 1)) for bit, rule in enumerate(RULES)}
+    counts = {rule: count for rule, count in counts.items() if count}
+    
+    valid = coerced[~rejected]
+    valid = valid.assign(rainfall=valid['rainfall'].fillna(0.0))
+    quarantined = df[rejected].assign(reasons=describe(masks[rejected]))
+    
+    if len(quarantined):
+        for rule, count in counts.items():
+            increment('rows_quarantined', count, reason=rule)
+        logger.warning(f"Rejected {len(quarantined)} of {len(df)} rows: "
+                       + ', '.join(f"{rule}={count}" for rule, count in counts.items()))
+    return stamp(valid), quarantined, counts
+
+class QuarantineStore:
+    """Append-only CSV of rejected observations with their reasons, kept next to a dataset file"""
+    
+    def __init__(self, data_file: str):
+        base, _ = os.path.splitext(data_file)
+        self.path = f"{base}_quarantine.csv"
+    
+    def _header(self) -> Optional[List[str]]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return f.readline().rstrip('\n').split(',')
+    
+    def append(self, rejected: pd.DataFrame):
+        """Append rejected rows under the fixed QUARANTINE_COLUMNS header (other columns are dropped)"""
+        if rejected.empty:
+            return
+        header = self._header()
+        if header is not None and header != QUARANTINE_COLUMNS:
+            # Files written before the schema was fixed are migrated once
+            self.read().to_csv(self.path, index=False)
+            header = QUARANTINE_COLUMNS
+        rows = rejected.assign(quarantined_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        rows = rows.reindex(columns=QUARANTINE_COLUMNS)
+        rows.to_csv(self.path, mode='a', header=header is None, index=False)
+    
+    def read(self) -> pd.DataFrame:
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=QUARANTINE_COLUMNS)
+        return pd.read_csv(self.path).reindex(columns=QUARANTINE_COLUMNS)
+    
+    def summary(self) -> Dict[str, int]:
+        """Rejected row count per rule"""
+        reasons = self.read()['reasons'].dropna().str.split(',').explode()
+        return reasons.value_counts().to_dict()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate weather observations and inspect the quarantine")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    check_parser = subparsers.add_parser('check', help="Validate a CSV of observations without storing it")
+    check_parser.add_argument('file')
+    
+    report_parser = subparsers.add_parser('report', help="Summarize rows quarantined for a dataset")
+    report_parser.add_argument('--data-file', default='weather_data.csv')
+    args = parser.parse_args()
+    
+    if args.command == 'check':
+        raw = pd.read_csv(args.file)
+        valid, quarantined, counts = validate(raw)
+        print(f"{len(valid):,} valid, {len(quarantined):,} rejected")
+        for rule, count in counts.items():
+            print(f"  {rule}: {count:,}")
+    else:
+        quarantine = QuarantineStore(args.data_file)
+        summary = quarantine.summary()
+        print(f"Quarantine: {quarantine.path}")
+        for rule, count in summary.items():
+            print(f"  {rule}: {count:,}")
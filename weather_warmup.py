@@ -0,0 +1,251 @@
+import pandas as pd
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import logging
+from weather_figures import FigureCache
+from weather_shared import get_shared_dataset
+from weather_store import WeatherDataStore
+from weather_rollups import ROLLUP_ORDER, InMemoryRollups
+from weather_sql import SQLiteWeatherBackend
+from weather_validation import stamp
+
+logger = logging.getLogger(__name__)
+
+# The dashboard's default view: the first few cities over the whole date range
+DEFAULT_CITY_COUNT = 3
+DEFAULT_TIME_AGGREGATION = 'Daily'
+DEFAULT_SHOW_TREND = True
+
+# Query backend behind the dashboard: 'pandas' (shared dataset and rollups) or 'sqlite'
+QUERY_BACKEND = os.getenv('WEATHER_BACKEND', 'pandas').lower()
+
+# Warm-up steps per query backend, in the order they run
+STEPS = ['data', 'rollups', 'analyzer', 'statistics', 'figures']
+SQLITE_STEPS = ['data', 'sqlite', 'analyzer', 'statistics', 'figures']
+
+class DashboardWarmup:
+    """Precomputes the dashboard's default view in a background thread
+    
+    Maps the shared dataset, loads the rollups, builds the analyzer for the
+    default filters and renders every default chart into the figure cache,
+    so the first session after a deploy is served from warm caches. With
+    the 'sqlite' backend the SQLite table is synced with the store instead
+    and the default view is built from SQL aggregates, without mapping the
+    dataset. The figure cache, the rollups and the SQLite sync are owned
+    here and shared by all sessions of the process. Progress is reported by
+    ``status()``.
+    """
+    
+    def __init__(self, data_file: str = 'weather_data.csv', figure_cache: Optional[FigureCache] = None,
+                 backend: str = QUERY_BACKEND, db_path: str = 'weather_data.db'):
+        self.data_file = data_file
+        self.figure_cache = figure_cache or FigureCache()
+        self.backend = backend
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._sql_lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._rollups: Optional[Tuple[str, object]] = None
+        self._started_at = None
+        self._finished_at = None
+        self._steps = {step: {'state': 'pending'} for step in self.step_names}
+    
+    def start(self) -> 'DashboardWarmup':
+        """Start warming up in a daemon thread (once; later calls do nothing)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='dashboard-warmup', daemon=True)
+                self._thread.start()
+        return self
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the warm-up has finished (or the timeout passes); True if it finished"""
+        return self._done.wait(timeout)
+    
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+    
+    @property
+    def ready(self) -> bool:
+        """Finished with no failed step"""
+        return self.finished and all(step['state'] in ('done', 'skipped') for step in self._steps.values())
+    
+    def status(self) -> Dict:
+        """Overall state ('idle', 'warming', 'ready' or 'failed'), elapsed time and per-step progress"""
+        with self._lock:
+            steps = {name: dict(step) for name, step in self._steps.items()}
+            started, finished = self._started_at, self._finished_at
+        if started is None:
+            state = 'idle'
+        elif finished is None:
+            state = 'warming'
+        else:
+            state = 'ready' if self.ready else 'failed'
+        elapsed = None if started is None else (finished or time.monotonic()) - started
+        return {'state': state, 'seconds': None if elapsed is None else round(elapsed, 3), 'steps': steps}
+    
+    def _set_step(self, name: str, **fields):
+        with self._lock:
+            self._steps[name].update(fields)
+    
+    def rollups(self, df: Optional[pd.DataFrame] = None):
+        """Rollups for the current store version, loaded once per version for all sessions
+        
+        Persisted rollups are used when they are current; otherwise rollups
+        are computed in memory from the dataset and the persisted ones are
+        left for the next compaction to repair.
+        """
+        store = WeatherDataStore(self.data_file)
+        version = store.version()
+        with self._lock:
+            if self._rollups is None or self._rollups[0] != version:
+                if store.rollups_current():
+                    rollups = store.rollups
+                else:
+                    rollups = InMemoryRollups(df if df is not None else get_shared_dataset(self.data_file).frame())
+                self._rollups = (version, rollups)
+            return self._rollups[1]
+    
+    @property
+    def step_names(self) -> List[str]:
+        return SQLITE_STEPS if self.backend == 'sqlite' else STEPS
+    
+    def sql_backend(self) -> SQLiteWeatherBackend:
+        """SQLite backend mirroring the store, synced once per store version for all sessions
+        
+        Appended segments are inserted on their own; the shared dataset is
+        only read to reload the table after a compaction.
+        """
+        store = WeatherDataStore(self.data_file)
+        backend = SQLiteWeatherBackend(self.db_path)
+        with self._sql_lock:
+            backend.sync_store(store, lambda: get_shared_dataset(self.data_file).frame())
+        return backend
+    
+    def default_view(self) -> Tuple[List[str], pd.DataFrame]:
+        """Cities and rows of the dashboard's default filters, selected exactly as the filter form does"""
+        dataset = get_shared_dataset(self.data_file)
+        header = dataset.header()
+        cities = header['cities'][:DEFAULT_CITY_COUNT]
+        start_date = pd.Timestamp(header['start_date']).date()
+        end_date = pd.Timestamp(header['end_date']).date()
+        return cities, dataset.view(cities, start_date, end_date)
+    
+    def run(self):
+        """Run every step in the calling thread"""
+        # Imported here so plotting libraries load inside the warm-up, not at import time
+        from weather_analyzer import WeatherAnalyzer
+        
+        with self._lock:
+            self._started_at = time.monotonic()
+        context = {}
+        
+        def data():
+            if not WeatherDataStore(self.data_file).exists():
+                # The first session generates the dataset; there is nothing to precompute yet
+                return 'skipped'
+            if self.backend != 'sqlite':
+                context['frame'] = get_shared_dataset(self.data_file).frame()
+        
+        def sqlite():
+            context['backend'] = self.sql_backend()
+        
+        def rollups():
+            tables = self.rollups(context['frame'])
+            for granularity in ROLLUP_ORDER:
+                tables.query_raw(granularity)
+        
+        def analyzer():
+            if self.backend == 'sqlite':
+                # Same filters and inputs as the dashboard's SQLite path
+                overview = context['backend'].overview()
+                cities = overview['cities'][:DEFAULT_CITY_COUNT]
+                view = context['backend'].view(cities, overview['start_date'].date(), overview['end_date'].date())
+                context['view'] = view
+                context['analyzer'] = WeatherAnalyzer(stamp(view.query('Daily')), rollups=view)
+            else:
+                cities, view = self.default_view()
+                context['analyzer'] = WeatherAnalyzer(view, rollups=self.rollups(context['frame']))
+            context['cities'] = cities
+            context['analyzer'].fingerprint()
+        
+        def statistics():
+            if self.backend == 'sqlite':
+                context['view'].calculate_summary_statistics()
+                context['view'].totals()
+            else:
+                context['analyzer'].calculate_summary_statistics()
+        
+        def figures():
+            cities, analyzer = context['cities'], context['analyzer']
+            charts = [
+                ('create_temperature_line_chart', {'cities': cities, 'time_aggregation': DEFAULT_TIME_AGGREGATION,
+                                                   'show_trend': DEFAULT_SHOW_TREND}),
+                ('create_rainfall_bar_chart', {'time_aggregation': DEFAULT_TIME_AGGREGATION}),
+                ('create_humidity_temperature_scatter', {'cities': cities, 'time_aggregation': DEFAULT_TIME_AGGREGATION})
+            ]
+            if cities:
+                charts.append(('create_calendar_heatmap', {'city': cities[0], 'metric': 'temperature', 'layout': 'year'}))
+            for chart, params in charts:
+                self.figure_cache.figure(analyzer, chart, **params)
+        
+        steps = {'data': data, 'sqlite': sqlite, 'rollups': rollups, 'analyzer': analyzer,
+                 'statistics': statistics, 'figures': figures}
+        skipped = False
+        try:
+            for name in self.step_names:
+                if skipped:
+                    self._set_step(name, state='skipped')
+                    continue
+                self._set_step(name, state='running')
+                start = time.perf_counter()
+                try:
+                    result = steps[name]()
+                except Exception as e:
+                    logger.exception(f"Warm-up step {name} failed")
+                    self._set_step(name, state='failed', error=str(e), seconds=round(time.perf_counter() - start, 3))
+                    break
+                skipped = result == 'skipped'
+                self._set_step(name, state='skipped' if skipped else 'done', seconds=round(time.perf_counter() - start, 3))
+        finally:
+            with self._lock:
+                self._finished_at = time.monotonic()
+            self._done.set()
+        status = self.status()
+        logger.info(f"Dashboard warm-up {status['state']} in {status['seconds']}s")
+
+_warmups: Dict[str, DashboardWarmup] = {}
+_warmups_lock = threading.Lock()
+
+def get_warmup(data_file: str = 'weather_data.csv') -> DashboardWarmup:
+    """Process-wide warm-up (and its shared caches) for a data file"""
+    with _warmups_lock:
+        if data_file not in _warmups:
+            _warmups[data_file] = DashboardWarmup(data_file)
+        return _warmups[data_file]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the dashboard warm-up and a first render against warm caches")
+    parser.add_argument('--data-file', default='weather_data.csv')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    
+    warmup = DashboardWarmup(args.data_file)
+    warmup.run()
+    print(json.dumps(warmup.status(), indent=2))
+    
+    # What a session does for the default view once the caches are warm
+    from weather_analyzer import WeatherAnalyzer
+    start = time.perf_counter()
+    cities, view = warmup.default_view()
+    analyzer = WeatherAnalyzer(view, rollups=warmup.rollups())
+    analyzer.calculate_summary_statistics()
+    warmup.figure_cache.figure(analyzer, 'create_temperature_line_chart', cities=cities,
+                               time_aggregation=DEFAULT_TIME_AGGREGATION, show_trend=DEFAULT_SHOW_TREND)
+    print(f"Default view after warm-up: {(time.perf_counter() - start) * 1000:.1f} ms")